@@ -1,4 +1,18 @@
+import logging
+import time
+from functools import partial
+
 from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+logger = logging.getLogger(__name__)
+
+PUBLIC_TENANT = "public"
+STATS_PREFIX = "cache-stats"
+STAT_EVENTS = ("hits", "misses", "invalidations")
+
+_registered_prefixes: set[str] = set()
 
 
 def cache_get(key: str):
@@ -16,3 +30,119 @@ def cache_delete(key: str):
 def cache_key(prefix: str, *parts: str):
     joined = ":".join(str(p) for p in parts if p is not None)
     return f"{prefix}:{joined}" if joined else prefix
+
+
+# -- versioned namespaces ----------------------------------------------------
+#
+# Every (prefix, tenant) pair owns a version counter that is baked into its
+# keys. Invalidating a namespace just bumps the counter: old entries become
+# unreachable and expire on their own, nothing else in the cache is touched.
+
+
+def namespace_version(prefix: str, tenant: str) -> int:
+    key = cache_key(prefix, "ns", tenant)
+    version = cache.get(key)
+    if version is None:
+        version = _fresh_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_namespace(prefix: str, tenant: str):
+    key = cache_key(prefix, "ns", tenant)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter was evicted; restart from the clock so stale versions are never reused.
+        cache.set(key, _fresh_version(), None)
+    record_event(prefix, "invalidations")
+
+
+def versioned_key(prefix: str, tenant: str, *parts: str) -> str:
+    return cache_key(prefix, tenant, f"v{namespace_version(prefix, tenant)}", *parts)
+
+
+def invalidate_tenant(prefix: str, tenant_id=None):
+    """Drop `prefix` entries for one tenant and for the unscoped namespace that spans all tenants.
+
+    The bump waits for the surrounding transaction to commit, so a concurrent
+    reader cannot re-cache the old rows under the new version.
+    """
+    transaction.on_commit(partial(_bump_tenant, prefix, tenant_id))
+
+
+def _bump_tenant(prefix: str, tenant_id):
+    try:
+        for tenant in {str(tenant_id) if tenant_id else PUBLIC_TENANT, PUBLIC_TENANT}:
+            bump_namespace(prefix, tenant)
+    except Exception as e:
+        # A cache outage must not fail the write; entries still expire via their timeout.
+        logger.error(f"Cache invalidation for {prefix} failed: {e}")
+
+
+def resolve_tenant(instance, path: str):
+    """Follow a lookup path such as ``"round__trip__tenant_id"`` on a model instance."""
+    value = instance
+    for attr in path.split("__"):
+        value = getattr(value, attr, None)
+        if value is None:
+            return None
+    return value
+
+
+def register_cache_invalidation(sender, prefixes, tenant_path: str = "tenant_id"):
+    """Invalidate the cached `prefixes` for the owning tenant whenever `sender` is saved or deleted.
+
+    Queryset ``update()`` and ``bulk_create()`` bypass these signals; callers
+    doing bulk writes must call :func:`invalidate_tenant` themselves.
+    """
+
+    def _invalidate(sender, instance, **kwargs):
+        tenant_id = resolve_tenant(instance, tenant_path)
+        for prefix in prefixes:
+            invalidate_tenant(prefix, tenant_id)
+
+    uid = f"cache-invalidation:{sender}:{','.join(prefixes)}"
+    post_save.connect(_invalidate, sender=sender, weak=False, dispatch_uid=uid)
+    post_delete.connect(_invalidate, sender=sender, weak=False, dispatch_uid=uid)
+
+
+def _fresh_version() -> int:
+    return time.time_ns() // 1000
+
+
+# -- counters -----------------------------------------------------------------
+
+
+def record_event(prefix: str, event: str):
+    """Increment the shared hit/miss/invalidation counter for `prefix`."""
+    _register_prefix(prefix)
+    key = cache_key(STATS_PREFIX, prefix, event)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def cache_stats() -> dict:
+    """Counters for every prefix that has recorded an event, e.g. ``{"trip": {"hits": 3, ...}}``."""
+    prefixes = cache.get(cache_key(STATS_PREFIX, "prefixes")) or []
+    keys = {cache_key(STATS_PREFIX, p, e): (p, e) for p in prefixes for e in STAT_EVENTS}
+    values = cache.get_many(list(keys))
+    stats = {p: dict.fromkeys(STAT_EVENTS, 0) for p in prefixes}
+    for key, value in values.items():
+        prefix, event = keys[key]
+        stats[prefix][event] = value
+    return stats
+
+
+def _register_prefix(prefix: str):
+    if prefix in _registered_prefixes:
+        return
+    key = cache_key(STATS_PREFIX, "prefixes")
+    prefixes = cache.get(key) or []
+    if prefix not in prefixes:
+        cache.set(key, sorted({*prefixes, prefix}), None)
+    _registered_prefixes.add(prefix)
@@ -0,0 +1,94 @@
+"""Conditional GET helpers (ETag / Last-Modified) for DRF views."""
+
+import hashlib
+import json
+from calendar import timegm
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def data_etag(data) -> str:
+    """Strong ETag for an already serialized payload."""
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def not_modified_response(request, etag: str | None = None, last_modified=None):
+    """Return a 304 response if the client's validators still match, otherwise None."""
+    timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+    return get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def set_validators(response, etag: str | None = None, last_modified=None):
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(timegm(last_modified.utctimetuple()))
+    return response
+
+
+class ConditionalGetMixin:
+    """Answer list/detail GETs with 304 Not Modified before anything is serialized.
+
+    The validator is one aggregate over the filtered queryset: the newest
+    ``updated_at`` and the row count, plus the same pair for every relation in
+    ``conditional_related`` whose rows are rendered in the payload (so adding,
+    editing or removing a nested bus also changes the ETag). The tenant and
+    query string are folded into the ETag so pages and tenants never share one.
+
+    ``Last-Modified`` is only sent for details without ``conditional_related``:
+    the newest ``updated_at`` does not move when a row leaves a list or a nested
+    relation, so clients revalidating by date alone would get stale 304s.
+    """
+
+    conditional_timestamp_field = "updated_at"
+    conditional_related: tuple[str, ...] = ()
+
+    def _validator_aggregates(self) -> dict:
+        field = self.conditional_timestamp_field
+        aggregates = {"max_0": Max(field), "count_0": Count("pk", distinct=True)}
+        for i, relation in enumerate(self.conditional_related, start=1):
+            aggregates[f"max_{i}"] = Max(f"{relation}__{field}")
+            aggregates[f"count_{i}"] = Count(relation, distinct=True)
+        return aggregates
+
+    def compute_validators(self, queryset, request, detail: bool = False):
+        """Return ``(etag, last_modified)`` for `queryset`, or ``(None, None)`` when it is empty.
+
+        ``last_modified`` is None unless `detail` is set and no related rows are rendered.
+        """
+        values = queryset.order_by().aggregate(**self._validator_aggregates())
+        if not values["count_0"]:
+            return None, None
+
+        last_modified = values["max_0"] if detail and not self.conditional_related else None
+        tenant_id = getattr(getattr(request, "user", None), "tenant_id", None)
+        etag = data_etag([tenant_id, sorted(request.query_params.lists()), sorted(values.items())])
+        return etag, last_modified
+
+    def _conditional(self, queryset, request, render, detail: bool = False):
+        etag, last_modified = self.compute_validators(queryset, request, detail=detail)
+        if etag is not None:
+            not_modified = not_modified_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+        response = render()
+        if etag is not None and response.status_code == 200:
+            set_validators(response, etag=etag, last_modified=last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._conditional(queryset, request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return self._conditional(
+            queryset, request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs),
+            detail=True,
+        )
@@ -0,0 +1,169 @@
+"""Streaming spreadsheet exports.
+
+XLSX files are written with openpyxl's write-only mode into a spooled temp
+file (kept in memory up to ``SPOOL_MAX_SIZE``, then on disk) and returned as a
+``FileResponse``. ``?format=csv`` streams the same rows straight from the
+queryset iterators without building a workbook at all.
+"""
+
+import codecs
+import csv
+import hashlib
+import io
+import tempfile
+import zipfile
+from collections.abc import Iterable
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import groupby
+from operator import attrgetter
+
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header, quote_etag
+
+from common.conditional import not_modified_response
+
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+
+@dataclass
+class Sheet:
+    title: str
+    header: list
+    rows: Iterable
+    # 1-based columns written as text cells (e.g. phone numbers keep their leading zero).
+    text_columns: tuple[int, ...] = ()
+
+
+def rows_per_key(queryset, field: str, keys: Iterable):
+    """Yield ``(key, rows)`` for each of `keys` from one query ordered by `field` in the same order.
+
+    The rows stream from ``queryset.iterator()`` and are split with
+    ``itertools.groupby``; keys without rows get an empty iterator. Each group is
+    only valid until the next one is requested, which is how the writers above
+    consume sheets.
+    """
+    groups = groupby(queryset.iterator(), key=attrgetter(field))
+    current = next(groups, None)
+    for key in keys:
+        if current is not None and current[0] == key:
+            yield key, current[1]
+            current = next(groups, None)
+        else:
+            yield key, iter(())
+
+
+def xlsx_response(filename: str, sheets: Iterable[Sheet]) -> FileResponse:
+    import openpyxl  # lazy import
+    from openpyxl.cell import WriteOnlyCell
+
+    wb = openpyxl.Workbook(write_only=True)
+    for sheet in sheets:
+        ws = wb.create_sheet(title=sheet.title[:31])
+        ws.append(sheet.header)
+        for row in sheet.rows:
+            if sheet.text_columns:
+                row = list(row)
+                for col in sheet.text_columns:
+                    cell = WriteOnlyCell(ws, value=row[col - 1])
+                    cell.number_format = "@"
+                    row[col - 1] = cell
+            ws.append(row)
+    if not wb.worksheets:
+        wb.create_sheet(title="Sheet1")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    wb.save(spool)
+    spool.seek(0)
+    return FileResponse(spool, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_response(filename: str, sheets: Iterable[Sheet], sheet_column: str | None = None) -> StreamingHttpResponse:
+    """Stream every sheet as one CSV; with `sheet_column` each row is prefixed by its sheet title."""
+    writer = csv.writer(_Echo())
+
+    def lines():
+        # BOM so Excel opens the UTF-8 (Vietnamese) text correctly.
+        yield codecs.BOM_UTF8.decode()
+        header_written = False
+        for sheet in sheets:
+            if not header_written:
+                yield writer.writerow(([sheet_column] if sheet_column else []) + list(sheet.header))
+                header_written = True
+            for row in sheet.rows:
+                yield writer.writerow(([sheet.title] if sheet_column else []) + list(row))
+
+    response = StreamingHttpResponse(lines(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = content_disposition_header(True, filename)
+    return response
+
+
+class SpreadsheetExportMixin:
+    """Answer an export view with XLSX by default or CSV for ``?format=csv``."""
+
+    export_format_param = "format"
+
+    def perform_content_negotiation(self, request, force=False):
+        # DRF reads ?format= as a renderer override; here it selects the file type instead.
+        return super().perform_content_negotiation(request, force=True)
+
+    def export_response(self, request, basename: str, sheets: Iterable[Sheet], sheet_column: str | None = None):
+        if request.query_params.get(self.export_format_param) == "csv":
+            return csv_response(f"{basename}.csv", sheets, sheet_column=sheet_column)
+        return xlsx_response(f"{basename}.xlsx", sheets)
+
+
+def workbook_bytes(wb) -> bytes:
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def workbook_etag(data: bytes) -> str:
+    """ETag over the workbook parts, ignoring the save timestamps openpyxl writes,
+    so every process that builds the same template agrees on the validator."""
+    digest = hashlib.sha1()
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for name in sorted(archive.namelist()):
+            if name == "docProps/core.xml":
+                continue
+            digest.update(name.encode())
+            digest.update(archive.read(name))
+    return quote_etag(digest.hexdigest())
+
+
+@lru_cache(maxsize=128)
+def _cached_template(view_class, key: tuple) -> tuple[bytes, str]:
+    data = view_class.build_template(*key)
+    return data, workbook_etag(data)
+
+
+class TemplateDownloadMixin:
+    """Serve an import template built once per process and per ``template_key``.
+
+    Subclasses implement ``build_template(*key) -> bytes`` as a staticmethod and
+    may override ``template_key`` (e.g. the trip's date range for rounds).
+    Responses carry an ``ETag`` so browsers revalidate instead of re-downloading.
+    """
+
+    template_filename = "template.xlsx"
+
+    @staticmethod
+    def build_template(*key) -> bytes:
+        raise NotImplementedError
+
+    def template_response(self, request, *key):
+        data, etag = _cached_template(type(self), key)
+        response = not_modified_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(data, content_type=XLSX_CONTENT_TYPE)
+            response["Content-Disposition"] = content_disposition_header(True, self.template_filename)
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
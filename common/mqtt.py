@@ -0,0 +1,307 @@
+"""Shared, per-process MQTT publisher.
+
+Every worker process keeps one long-lived paho client connected to the broker.
+Callers enqueue messages with :func:`publish`; a background thread drains the
+bounded queue and hands them to the client, so the request thread never pays
+for URL parsing, the TCP/TLS/WebSocket handshake or authentication.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import paho.mqtt.client as mqtt
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def parse_broker_url(url: str) -> dict:
+    """Split MQTT_URL (e.g. ``wss://mqtt.toolhub.app:8084``) into connection options."""
+    secure = url.startswith("wss") or url.startswith("mqtts")
+    transport = "websockets" if url.startswith("ws") else "tcp"
+
+    address = url.split("://", 1)[-1].rstrip("/")
+    if ":" in address:
+        host, port = address.rsplit(":", 1)
+        port = int(port)
+    else:
+        host = address
+        port = 8883 if secure else 1883
+
+    return {"host": host, "port": port, "tls": secure, "transport": transport}
+
+
+class MQTTPublisher:
+    """Long-lived MQTT client fed by a bounded in-memory queue."""
+
+    def __init__(
+        self,
+        url: str,
+        username: str = "",
+        password: str = "",
+        max_queue_size: int = 1000,
+        keepalive: int = 60,
+        min_reconnect_delay: int = 1,
+        max_reconnect_delay: int = 60,
+    ):
+        self.url = url
+        self.username = username
+        self.password = password
+        self.keepalive = keepalive
+        self.min_reconnect_delay = min_reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._connected = threading.Event()
+        self._lock = threading.Lock()
+        self._client = None
+        self._worker = None
+
+        self._stats_lock = threading.Lock()
+        self._published = 0
+        self._failed = 0
+        self._dropped = 0
+        self._latency_total_ms = 0.0
+        self._latency_max_ms = 0.0
+        self._latency_last_ms = 0.0
+
+    # -- public API -------------------------------------------------------
+
+    def publish(self, topic: str, payload, qos: int = 0) -> bool:
+        """Enqueue a message; returns False when the queue is full and the message is dropped."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((topic, _encode(payload), qos, time.monotonic()))
+        except queue.Full:
+            with self._stats_lock:
+                self._dropped += 1
+            logger.error("MQTT outbound queue full, dropping message for topic: %s", topic)
+            return False
+        return True
+
+    def publish_sync(self, topic: str, payload, qos: int = 0, timeout: float = 5.0) -> bool:
+        """Publish on the shared connection and wait for the client to hand it off."""
+        self._ensure_started()
+        return self._send(topic, _encode(payload), qos, time.monotonic(), timeout)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Block until the queue has been drained (or the timeout expires)."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stop(self):
+        with self._lock:
+            if self._worker is not None:
+                self._queue.put(_STOP)
+                self._worker.join(timeout=5)
+                self._worker = None
+            self._teardown_client()
+
+    def metrics(self) -> dict:
+        with self._stats_lock:
+            published = self._published
+            return {
+                "connected": self._connected.is_set(),
+                "queue_depth": self._queue.qsize(),
+                "queue_capacity": self._queue.maxsize,
+                "published": published,
+                "failed": self._failed,
+                "dropped": self._dropped,
+                "latency_ms": {
+                    "last": round(self._latency_last_ms, 2),
+                    "avg": round(self._latency_total_ms / published, 2) if published else 0.0,
+                    "max": round(self._latency_max_ms, 2),
+                },
+            }
+
+    # -- internals --------------------------------------------------------
+
+    def _ensure_started(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            # The worker died: release the old client's socket and network thread first.
+            self._teardown_client()
+            self._client = self._build_client()
+            self._worker = threading.Thread(
+                target=self._drain, name="mqtt-publisher", daemon=True
+            )
+            self._worker.start()
+
+    def _teardown_client(self):
+        if self._client is not None:
+            try:
+                self._client.loop_stop()
+                self._client.disconnect()
+            except Exception as exc:
+                logger.warning("Failed to stop MQTT client cleanly: %s", exc)
+            self._client = None
+        self._connected.clear()
+
+    def _build_client(self):
+        options = parse_broker_url(self.url)
+        client = mqtt.Client(
+            callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
+            transport=options["transport"],
+        )
+        if self.username and self.password:
+            client.username_pw_set(self.username, self.password)
+        if options["tls"]:
+            client.tls_set()
+        client.reconnect_delay_set(
+            min_delay=self.min_reconnect_delay, max_delay=self.max_reconnect_delay
+        )
+        client.on_connect = self._on_connect
+        client.on_disconnect = self._on_disconnect
+        client.connect_async(options["host"], options["port"], keepalive=self.keepalive)
+        client.loop_start()
+        return client
+
+    def _on_connect(self, client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            logger.error("MQTT connection refused: %s", reason_code)
+            return
+        self._connected.set()
+        logger.info("MQTT publisher connected to %s", self.url)
+
+    def _on_disconnect(self, client, userdata, flags, reason_code, properties):
+        self._connected.clear()
+        logger.warning("MQTT publisher disconnected (%s), reconnecting", reason_code)
+
+    def _drain(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                topic, payload, qos, enqueued_at = item
+                self._send(topic, payload, qos, enqueued_at, self.max_reconnect_delay)
+            finally:
+                self._queue.task_done()
+
+    def _send(self, topic, payload, qos, enqueued_at, timeout) -> bool:
+        if not self._connected.wait(timeout):
+            self._record_failure()
+            logger.error("MQTT broker unavailable, failed to publish to topic: %s", topic)
+            return False
+
+        try:
+            info = self._client.publish(topic, payload=payload, qos=qos)
+            if qos > 0:
+                info.wait_for_publish(timeout)
+            if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                raise RuntimeError(mqtt.error_string(info.rc))
+        except Exception as exc:
+            self._record_failure()
+            logger.error("Failed to publish to MQTT topic %s: %s", topic, exc)
+            return False
+
+        self._record_success((time.monotonic() - enqueued_at) * 1000)
+        return True
+
+    def _record_success(self, latency_ms: float):
+        with self._stats_lock:
+            self._published += 1
+            self._latency_last_ms = latency_ms
+            self._latency_total_ms += latency_ms
+            self._latency_max_ms = max(self._latency_max_ms, latency_ms)
+
+    def _record_failure(self):
+        with self._stats_lock:
+            self._failed += 1
+
+
+class InMemoryBroker:
+    """Stand-in broker selected with ``MQTT_URL=memory://``; keeps messages in a list for tests."""
+
+    def __init__(self):
+        self.messages: list[tuple[str, str, int]] = []
+        self.available = True
+
+    def publish(self, topic: str, payload, qos: int = 0) -> bool:
+        return self.publish_sync(topic, payload, qos)
+
+    def publish_sync(self, topic: str, payload, qos: int = 0, timeout: float = 5.0) -> bool:
+        if not self.available:
+            return False
+        self.messages.append((topic, _encode(payload), qos))
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        return True
+
+    def stop(self):
+        pass
+
+    def metrics(self) -> dict:
+        return {"connected": self.available, "queue_depth": 0, "published": len(self.messages)}
+
+
+def _encode(payload):
+    if isinstance(payload, (str, bytes, bytearray)):
+        return payload
+    return json.dumps(payload, default=str)
+
+
+_publisher = None
+_publisher_key = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    """Return this process's publisher, or None when MQTT_URL is not configured.
+
+    The instance is keyed by pid so forked gunicorn workers never share the
+    master's socket, and by URL so ``memory://`` can be swapped in for tests.
+    """
+    global _publisher, _publisher_key  # pylint: disable=global-statement
+
+    if not settings.MQTT_URL:
+        return None
+
+    key = (os.getpid(), settings.MQTT_URL)
+    if _publisher is None or _publisher_key != key:
+        with _publisher_lock:
+            if _publisher is None or _publisher_key != key:
+                if _publisher is not None and _publisher_key[0] == key[0]:
+                    _publisher.stop()
+                if settings.MQTT_URL.startswith("memory://"):
+                    _publisher = InMemoryBroker()
+                else:
+                    _publisher = MQTTPublisher(
+                        settings.MQTT_URL,
+                        username=settings.MQTT_USERNAME,
+                        password=settings.MQTT_PASSWORD,
+                        max_queue_size=settings.MQTT_PUBLISH_QUEUE_SIZE,
+                        keepalive=settings.MQTT_KEEPALIVE,
+                    )
+                _publisher_key = key
+    return _publisher
+
+
+def publish(topic: str, payload, qos: int = 0) -> bool:
+    """Queue a message on the shared broker connection without blocking the caller."""
+    publisher = get_publisher()
+    if publisher is None:
+        logger.warning("MQTT_URL not configured, skipping publish to %s", topic)
+        return False
+    return publisher.publish(topic, payload, qos)
+
+
+def metrics() -> dict:
+    publisher = get_publisher()
+    if publisher is None:
+        return {"configured": False}
+    return {"configured": True, **publisher.metrics()}
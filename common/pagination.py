@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
 from rest_framework.response import Response
 
 
@@ -17,3 +25,131 @@ class CustomPagination(PageNumberPagination):
                 },
             }
         )
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination on ``(<timestamp>, id)`` that keeps the CustomPagination envelope.
+
+    The cursor carries the last row's timestamp *and* id, and the next page is
+    ``ts < t OR (ts = t AND id < i)`` (mirrored for ascending order), so rows
+    sharing a timestamp never need an OFFSET. No ``COUNT(*)`` is issued unless
+    the client asks for it with ``?with_count=1``.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "limit"
+    max_page_size = 500
+    count_query_param = "with_count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.request = request
+        self._queryset = queryset
+
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor.reverse)
+        position = self._decode_position(cursor.position) if cursor and cursor.position else None
+
+        ts_field = self.ordering[0].lstrip("-")
+        descending = self.ordering[0].startswith("-") != self.reverse
+        prefix = "-" if descending else ""
+        queryset = queryset.order_by(f"{prefix}{ts_field}", f"{prefix}pk")
+        if position is not None:
+            ts, pk = position
+            op = "lt" if descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{ts_field}__{op}": ts}) | Q(**{ts_field: ts, f"pk__{op}": pk})
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def _encode_position(self, instance) -> str:
+        ts_field = self.ordering[0].lstrip("-")
+        if isinstance(instance, dict):
+            ts, pk = instance[ts_field], instance["id"]
+        else:
+            ts, pk = getattr(instance, ts_field), instance.pk
+        return f"{ts.isoformat()}|{pk}"
+
+    def _decode_position(self, position: str):
+        try:
+            ts, pk = position.rsplit("|", 1)
+            parsed = parse_datetime(ts)
+            if parsed is None:
+                raise ValueError(ts)
+            return parsed, int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._encode_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._encode_position(self.page[0])))
+
+    def get_paginated_response(self, data):
+        pagination = {
+            "limit": self.page_size,
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+        }
+        if self.request.query_params.get(self.count_query_param) in ("1", "true"):
+            pagination["total_items"] = self._queryset.count()
+        return Response({"data": data, "pagination": pagination})
+
+
+class SelectablePagination(BasePagination):
+    """Page-number pagination by default, keyset pagination on request.
+
+    Clients switch with ``?pagination=cursor`` (or by following a ``?cursor=``
+    link). Subclasses pick the keyset ordering through ``cursor_ordering`` and
+    may flip ``default_mode`` to ``"cursor"`` for tables that are too large to
+    count on every request.
+    """
+
+    mode_query_param = "pagination"
+    default_mode = "page"
+    cursor_ordering = KeysetPagination.ordering
+    page_pagination_class = CustomPagination
+    cursor_pagination_class = KeysetPagination
+
+    def __init__(self):
+        self._delegate = None
+
+    def _wants_cursor(self, request) -> bool:
+        if "cursor" in request.query_params:
+            return True
+        return request.query_params.get(self.mode_query_param, self.default_mode) == "cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self._wants_cursor(request):
+            self._delegate = self.cursor_pagination_class()
+            self._delegate.ordering = self.cursor_ordering
+        else:
+            self._delegate = self.page_pagination_class()
+        return self._delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self._delegate.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_pagination_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_pagination_class().get_schema_operation_parameters(view)
@@ -0,0 +1,106 @@
+"""Batching of model signal side effects for imports and bulk edits.
+
+Inside ``with batched_signals():`` receivers stop doing per-row work:
+
+* ``pre_save`` receivers of rows not loaded in this process read the previous
+  values of a whole group of rows (e.g. every TripBus of the trip) with one
+  SELECT via :func:`track_previous_values` instead of re-fetching each row;
+* side effects go through :func:`defer`, which collects values under a key and
+  runs the flush callback once per key when the block exits (one coalesced
+  notification per user, one RoundBus sync per trip).
+
+Outside a batch :func:`defer` runs the callback immediately, so receivers
+behave exactly as before for single saves. Deferred work is dropped if the
+block raises.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_current_batch: ContextVar["SignalBatch | None"] = ContextVar("signal_batch", default=None)
+
+
+class SignalBatch:
+    def __init__(self):
+        self._snapshots = {}
+        self._pending = {}
+
+    def snapshot(self, key, loader) -> dict:
+        """Return the cached ``{pk: previous values}`` map for `key`, loading it once with `loader()`."""
+        if key not in self._snapshots:
+            self._snapshots[key] = loader()
+        return self._snapshots[key]
+
+    def defer(self, key, value, flush):
+        """Collect `value` under `key`; ``flush(values)`` runs once for the key when the batch exits."""
+        self._pending.setdefault(key, (flush, []))[1].append(value)
+
+    def flush(self):
+        while self._pending:
+            key = next(iter(self._pending))
+            flush, values = self._pending.pop(key)
+            flush(values)
+
+
+def current_batch() -> SignalBatch | None:
+    return _current_batch.get()
+
+
+def track_previous_values(instance, group_field: str, fields: tuple[str, ...]):
+    """Make ``instance.has_changed()`` answer for `fields` against the row as stored before this save.
+
+    Instances loaded from the database already remember them (see common.tracking);
+    for others the stored row is read. In a batch the rows sharing ``group_field``
+    (e.g. all TripBuses of the trip) are read with one SELECT and then kept current
+    as the batch saves them. New rows are left untracked: every field counts as changed.
+    """
+    if instance.pk is None or instance.tracked_values(fields) is not None:
+        return
+
+    model = type(instance)
+    batch = _current_batch.get()
+    if batch is None:
+        old = model._default_manager.filter(pk=instance.pk).values_list(*fields).first()
+    else:
+        group = getattr(instance, group_field)
+        previous = batch.snapshot(
+            (model._meta.label, group),
+            lambda: {
+                pk: tuple(values)
+                for pk, *values in model._default_manager.filter(**{group_field: group}).values_list("pk", *fields)
+            },
+        )
+        if instance.pk not in previous:
+            # Created earlier in this batch, after the group was loaded.
+            previous[instance.pk] = model._default_manager.filter(pk=instance.pk).values_list(*fields).first()
+        old = previous[instance.pk]
+        previous[instance.pk] = tuple(getattr(instance, field) for field in fields)
+    if old is not None:
+        instance.remember_values(dict(zip(fields, old)))
+
+
+def defer(key, value, flush):
+    """Run ``flush([value])`` now, or coalesce it with the same `key` in the active batch."""
+    batch = _current_batch.get()
+    if batch is None:
+        flush([value])
+    else:
+        batch.defer(key, value, flush)
+
+
+@contextmanager
+def batched_signals():
+    """Defer and coalesce signal side effects until the block exits; nested blocks join the outer one."""
+    batch = _current_batch.get()
+    if batch is not None:
+        yield batch
+        return
+
+    batch = SignalBatch()
+    token = _current_batch.set(batch)
+    try:
+        yield batch
+    finally:
+        _current_batch.reset(token)
+    # Saves made while flushing run their receivers normally.
+    batch.flush()
@@ -0,0 +1,69 @@
+"""In-memory change tracking for model fields.
+
+``pre_save`` receivers used to re-read the row just to compare a couple of
+foreign keys. Models mixing in :class:`FieldTrackerMixin` remember the values of
+``tracked_fields`` as loaded from the database (and as last saved), so
+:meth:`~FieldTrackerMixin.has_changed` needs no query.
+
+The stored values are only replaced once ``save()`` has returned, so inside
+``pre_save`` and ``post_save`` receivers ``has_changed()`` still compares
+against the row as it was before this save.
+"""
+
+
+class FieldTrackerMixin:
+    """Remember `tracked_fields` (attnames, e.g. ``"manager_id"``) as loaded or last saved."""
+
+    tracked_fields: tuple[str, ...] = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Deferred fields (``.only()``) are not tracked; callers fall back to a query for them.
+        instance._tracked_values = {
+            name: getattr(instance, name) for name in cls.tracked_fields if name in field_names
+        }
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        saved = self.tracked_fields if update_fields is None else self._tracked_attnames(update_fields)
+        self.remember_values({name: getattr(self, name) for name in saved})
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        reloaded = self.tracked_fields if fields is None else self._tracked_attnames(fields)
+        deferred = self.get_deferred_fields()
+        self.remember_values({name: getattr(self, name) for name in reloaded if name not in deferred})
+
+    def _tracked_attnames(self, names) -> list[str]:
+        """Tracked attnames among `names`, which may use field names (``"manager"``) or attnames."""
+        names = set(names)
+        return [
+            field.attname
+            for field in self._meta.concrete_fields
+            if field.attname in self.tracked_fields and (field.name in names or field.attname in names)
+        ]
+
+    def remember_values(self, values: dict):
+        """Record `values` (``{attname: value}``) as the database state of this row."""
+        stored = getattr(self, "_tracked_values", None)
+        if stored is None:
+            stored = self._tracked_values = {}
+        stored.update(values)
+
+    def tracked_values(self, fields) -> tuple | None:
+        """Stored values of `fields`, or None when they are not all known in memory."""
+        stored = getattr(self, "_tracked_values", None)
+        if stored is None or any(name not in stored for name in fields):
+            return None
+        return tuple(stored[name] for name in fields)
+
+    def has_changed(self, field: str) -> bool:
+        """Whether `field` differs from the value loaded from (or last saved to) the database."""
+        stored = getattr(self, "_tracked_values", None)
+        if stored is None or field not in stored:
+            # Unsaved instance (or untracked field): everything counts as changed.
+            return True
+        return stored[field] != getattr(self, field)
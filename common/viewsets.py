@@ -1,67 +1,204 @@
+import hashlib
+import logging
+
 from django.core.cache import cache
 from rest_framework import viewsets
+from rest_framework.permissions import BasePermission
 from rest_framework.response import Response
 
-from common.cache import cache_key
+from common.cache import (
+    PUBLIC_TENANT,
+    invalidate_tenant,
+    record_event,
+    resolve_tenant,
+    versioned_key,
+)
+from common.conditional import data_etag, not_modified_response, set_validators
+from core.permissions import get_role_name
+
+logger = logging.getLogger(__name__)
+
 
+class CacheNamespaceMixin:
+    """Shared key helpers for the cached view mixins.
 
-class CachedModelViewSet(viewsets.ModelViewSet):
-    """ModelViewSet with simple cache for list/retrieve and cache clear on write."""
+    ``cache_prefix`` names the resource namespace; writes must bump it via
+    :func:`common.cache.invalidate_tenant` (usually through
+    :func:`common.cache.register_cache_invalidation`).
+    """
 
+    cache_prefix = None
     cache_timeout = 300
+    # Lookup path from the model to its owning tenant id, e.g. "trip__tenant_id".
+    cache_tenant_field = "tenant_id"
 
     def _cache_prefix(self) -> str:
-        return getattr(self, "basename", self.__class__.__name__.lower())
+        # ViewSetMixin.as_view() resets basename to None unless a router supplies one.
+        return self.cache_prefix or getattr(self, "basename", None) or self.__class__.__name__.lower()
 
     def _tenant_part(self, request) -> str:
         tenant_id = getattr(getattr(request, "user", None), "tenant_id", None)
-        return str(tenant_id) if tenant_id else "public"
+        return str(tenant_id) if tenant_id else PUBLIC_TENANT
 
-    def list(self, request, *args, **kwargs):
-        key = cache_key(self._cache_prefix(), "list", self._tenant_part(request))
+    def _cache_get(self, key: str):
         cached = cache.get(key)
+        record_event(self._cache_prefix(), "misses" if cached is None else "hits")
+        return cached
+
+
+class CachedListMixin(CacheNamespaceMixin):
+    """Opt-in cache for ``list()`` on generic views and viewsets.
+
+    Set ``cache_list = True`` and a ``cache_prefix`` shared by every view that
+    reads the same resource. Entries are keyed by tenant, the caller's
+    permission scope and a hash of the canonicalized query string, so each
+    page, limit and filter combination gets its own entry.
+    """
+
+    cache_list = False
+
+    def _scope_part(self, request) -> str:
+        user = getattr(request, "user", None)
+        if not user or not user.is_authenticated:
+            return "anon"
+        return f"{get_role_name(user) or '-'}:{int(user.is_staff)}{int(user.is_superuser)}"
+
+    def _params_part(self, request) -> str:
+        params = sorted(
+            (key, sorted(v for v in request.query_params.getlist(key) if v != ""))
+            for key in request.query_params
+        )
+        canonical = "&".join(f"{key}={','.join(values)}" for key, values in params if values)
+        return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+    def list_cache_key(self, request) -> str:
+        return versioned_key(
+            self._cache_prefix(),
+            self._tenant_part(request),
+            "list",
+            self._scope_part(request),
+            self._params_part(request),
+        )
+
+    def build_list_response(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        if not self.cache_list:
+            return self.build_list_response(request, *args, **kwargs)
+
+        try:
+            key = self.list_cache_key(request)
+            cached = self._cache_get(key)
+        except Exception as e:
+            logger.error(f"List cache lookup failed, serving uncached: {e}")
+            return self.build_list_response(request, *args, **kwargs)
         if cached is not None:
             return Response(cached)
 
+        response = self.build_list_response(request, *args, **kwargs)
+        if response.status_code == 200:
+            try:
+                cache.set(key, response.data, self.cache_timeout)
+            except Exception as e:
+                logger.error(f"List cache store failed: {e}")
+        return response
+
+
+class CachedRetrieveMixin(CacheNamespaceMixin):
+    """Opt-in, tenant-isolated cache for ``retrieve()`` with ETag support.
+
+    Entries live in the requesting tenant's namespace and record the owner
+    tenant of the object, which is re-checked on every hit so a cached body
+    is never handed to another tenant. Views whose permission classes do
+    object-level checks are never served from cache because those checks
+    need the real instance.
+    """
+
+    cache_retrieve = False
+
+    def detail_cache_key(self, request, pk) -> str:
+        return versioned_key(self._cache_prefix(), self._tenant_part(request), "detail", str(pk))
+
+    def _has_object_permission_checks(self) -> bool:
+        return any(
+            type(permission).has_object_permission is not BasePermission.has_object_permission
+            for permission in self.get_permissions()
+        )
+
+    def _owner_matches(self, request, owner_tenant) -> bool:
+        tenant_id = getattr(getattr(request, "user", None), "tenant_id", None)
+        return not tenant_id or owner_tenant == tenant_id
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if not self.cache_retrieve or pk is None or self._has_object_permission_checks():
+            return super().retrieve(request, *args, **kwargs)
+
+        key = None
+        try:
+            key = self.detail_cache_key(request, pk)
+            entry = self._cache_get(key)
+        except Exception as e:
+            logger.error(f"Detail cache lookup failed, serving uncached: {e}")
+            entry = None
+
+        if entry is None or not self._owner_matches(request, entry["tenant"]):
+            instance = self.get_object()
+            entry = {
+                "tenant": resolve_tenant(instance, self.cache_tenant_field),
+                "data": self.get_serializer(instance).data,
+            }
+            entry["etag"] = data_etag(entry["data"])
+            if key is not None:
+                try:
+                    cache.set(key, entry, self.cache_timeout)
+                except Exception as e:
+                    logger.error(f"Detail cache store failed: {e}")
+
+        not_modified = not_modified_response(request, etag=entry["etag"])
+        if not_modified is not None:
+            return not_modified
+        return set_validators(Response(entry["data"]), etag=entry["etag"])
+
+
+class CachedModelViewSet(CachedListMixin, CachedRetrieveMixin, viewsets.ModelViewSet):
+    """ModelViewSet with simple cache for list/retrieve and per-tenant invalidation on write.
+
+    Keys live in a versioned ``(prefix, tenant)`` namespace, so a write only
+    bumps the namespace of the tenant that owns the object (plus the unscoped
+    ``public`` namespace, whose lists span every tenant) instead of clearing
+    the whole cache.
+    """
+
+    cache_list = True
+    cache_retrieve = True
+
+    def build_list_response(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
 
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
-            data = self.get_paginated_response(serializer.data).data
-        else:
-            serializer = self.get_serializer(queryset, many=True)
-            data = {"data": serializer.data}
-
-        cache.set(key, data, self.cache_timeout)
-        return Response(data)
-
-    def retrieve(self, request, *args, **kwargs):
-        pk = kwargs.get(self.lookup_field or "pk")
-        key = cache_key(self._cache_prefix(), "detail", str(pk) if pk is not None else "")
-        cached = cache.get(key)
-        if cached is not None:
-            return Response(cached)
+            return self.get_paginated_response(serializer.data)
 
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        data = serializer.data
-        cache.set(key, data, self.cache_timeout)
-        return Response(data)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response({"data": serializer.data})
 
-    def _clear_cache(self):
-        cache.clear()
+    def _invalidate_cache(self, instance=None):
+        tenant_id = resolve_tenant(instance, self.cache_tenant_field) if instance is not None else None
+        invalidate_tenant(self._cache_prefix(), tenant_id or getattr(self.request.user, "tenant_id", None))
 
     def perform_create(self, serializer):
         instance = serializer.save()
-        self._clear_cache()
+        self._invalidate_cache(instance)
         return instance
 
     def perform_update(self, serializer):
         instance = serializer.save()
-        self._clear_cache()
+        self._invalidate_cache(instance)
         return instance
 
     def perform_destroy(self, instance):
         instance.delete()
-        self._clear_cache()
+        self._invalidate_cache(instance)
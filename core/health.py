@@ -8,6 +8,9 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
+from common import mqtt
+from common.cache import cache_stats
+
 logger = logging.getLogger(__name__)
 
 
@@ -66,4 +69,16 @@ def health_check(_request):
         health_status["status"] = "unhealthy"
         status_code = 503
 
+    # Cache hit/miss/invalidation counters per CachedModelViewSet prefix (informational)
+    try:
+        health_status["cache_stats"] = cache_stats()
+    except Exception as e:
+        logger.error(f"Cache stats collection failed: {e}")
+
+    # MQTT publisher queue depth / latency (informational, never fails the check)
+    try:
+        health_status["mqtt"] = mqtt.metrics()
+    except Exception as e:
+        logger.error(f"MQTT metrics collection failed: {e}")
+
     return JsonResponse(health_status, status=status_code)
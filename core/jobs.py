@@ -0,0 +1,211 @@
+"""DB-backed background jobs for long imports and exports.
+
+Views mix in :class:`BackgroundJobMixin` and call :meth:`defer_to_job` at the
+top of their handler. When the client passes ``?async=1`` the upload and the
+request parameters are stored in a :class:`~core.models.Job` row and a 202 is
+returned with the polling URL. ``manage.py run_workers`` later replays the
+same view as the requesting user, off the gunicorn request path, and stores
+its JSON body or file download on the job.
+"""
+
+import json
+import logging
+import re
+from contextvars import ContextVar
+from datetime import timedelta
+from urllib.parse import unquote, urlencode
+
+from django.core.files.base import ContentFile, File
+from django.db import transaction
+from django.test.client import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.models import Job
+
+logger = logging.getLogger(__name__)
+
+ASYNC_QUERY_PARAM = "async"
+_current_job: ContextVar[Job | None] = ContextVar("current_job", default=None)
+
+
+class BackgroundJobMixin:
+    """Let an import/export view run as a background job when asked with ``?async=1``."""
+
+    def defer_to_job(self, request):
+        """Queue the request and return a 202 response, or None to handle it inline."""
+        if request.query_params.get(ASYNC_QUERY_PARAM) not in ("1", "true"):
+            return None
+
+        job = enqueue(self, request)
+        return Response(
+            {
+                "job_id": job.id,
+                "status": job.status,
+                "status_url": reverse("job-detail", args=[job.id]),
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+def enqueue(view, request) -> Job:
+    query = [(k, v) for k, values in request.query_params.lists() if k != ASYNC_QUERY_PARAM for v in values]
+    params = {
+        "method": request.method,
+        "path": request.path,
+        "query": query,
+        "kwargs": view.kwargs,
+        "data": {},
+    }
+    input_file = None
+    if request.method != "GET":
+        params["data"] = {k: values for k, values in request.data.lists() if k not in request.FILES}
+        field, input_file = next(iter(request.FILES.items()), (None, None))
+        params["file_field"] = field
+        params["file_name"] = getattr(input_file, "name", "")
+
+    user = request.user if request.user.is_authenticated else None
+    job = Job(
+        kind=f"{type(view).__module__}.{type(view).__qualname__}",
+        params=params,
+        created_by=user,
+        tenant_id=getattr(user, "tenant_id", None),
+    )
+    if input_file is not None:
+        job.input_file.save(input_file.name, input_file, save=False)
+    job.save()
+    logger.info("Queued job %s (%s)", job.id, job.kind)
+    return job
+
+
+def set_progress(percent: int):
+    """Record progress for the job currently being executed; a no-op during normal requests."""
+    job = _current_job.get()
+    if job is None:
+        return
+    job.progress = max(0, min(100, int(percent)))
+    Job.objects.filter(pk=job.pk).update(progress=job.progress)
+
+
+def claim_next() -> Job | None:
+    """Lock the oldest queued job and mark it running; concurrent workers skip locked rows."""
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.Status.QUEUED)
+            .order_by("id")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = Job.Status.RUNNING
+        job.started_at = timezone.now()
+        job.attempts += 1
+        job.save(update_fields=["status", "started_at", "attempts"])
+    return job
+
+
+def run(job: Job) -> Job:
+    """Execute `job` by replaying its view and store the outcome."""
+    token = _current_job.set(job)
+    try:
+        response = _replay(job)
+        _store_response(job, response)
+    except Exception as exc:
+        logger.exception("Job %s failed", job.id)
+        job.status = Job.Status.FAILED
+        job.error = str(exc)
+    finally:
+        _current_job.reset(token)
+        if job.input_file:
+            job.input_file.close()
+
+    job.finished_at = timezone.now()
+    if job.status == Job.Status.SUCCEEDED:
+        job.progress = 100
+    job.save(update_fields=["status", "progress", "result", "result_file", "error", "finished_at"])
+    return job
+
+
+def requeue_stale(stale_after: timedelta, max_attempts: int = 3) -> int:
+    """Recover jobs whose worker died mid-run: requeue them, or fail them after `max_attempts`."""
+    cutoff = timezone.now() - stale_after
+    stale = Job.objects.filter(status=Job.Status.RUNNING, started_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=Job.Status.FAILED, error="Worker stopped before the job finished", finished_at=timezone.now()
+    )
+    requeued = stale.update(status=Job.Status.QUEUED, progress=0)
+    return failed + requeued
+
+
+def purge(retention: timedelta) -> int:
+    """Delete finished jobs older than `retention` together with their stored files."""
+    cutoff = timezone.now() - retention
+    deleted = 0
+    for job in Job.objects.filter(finished_at__lt=cutoff).iterator():
+        job.input_file.delete(save=False)
+        job.result_file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return deleted
+
+
+def _replay(job: Job):
+    params = job.params
+    path = params["path"]
+    if params.get("query"):
+        path = f"{path}?{urlencode(params['query'])}"
+
+    factory = RequestFactory()
+    if params["method"] == "GET":
+        request = factory.get(path)
+    else:
+        data = dict(params.get("data") or {})
+        if job.input_file:
+            job.input_file.open("rb")
+            data[params.get("file_field") or "file"] = File(job.input_file.file, name=params.get("file_name"))
+        request = factory.generic(params["method"], path) if not data else factory.post(path, data)
+
+    # Same forced-auth hook DRF's test client uses: the job runs with the requester's permissions.
+    request._force_auth_user = job.created_by
+    view = import_string(job.kind).as_view()
+    return view(request, **params.get("kwargs", {}))
+
+
+_FILENAME_RE = re.compile(r'filename="?([^";]+)"?')
+_FILENAME_STAR_RE = re.compile(r"filename\*=utf-8''([^;]+)", re.IGNORECASE)
+
+
+def _store_response(job: Job, response):
+    if hasattr(response, "render") and not response.is_rendered:
+        response.render()
+
+    if response.status_code >= 400:
+        job.status = Job.Status.FAILED
+        data = getattr(response, "data", None)
+        if isinstance(data, dict):
+            job.error = str(data.get("detail", data))
+        else:
+            job.error = response.content.decode(errors="replace")
+        return
+
+    job.status = Job.Status.SUCCEEDED
+    disposition = response.get("Content-Disposition", "")
+    if "attachment" in disposition:
+        match = _FILENAME_STAR_RE.search(disposition)
+        if match:
+            filename = unquote(match.group(1))
+        else:
+            match = _FILENAME_RE.search(disposition)
+            filename = match.group(1) if match else f"job-{job.id}"
+        content = b"".join(response.streaming_content) if response.streaming else response.content
+        job.result_file.save(filename, ContentFile(content), save=False)
+        job.result = {"filename": filename, "content_type": response.get("Content-Type", "")}
+    elif response.get("Content-Type", "").startswith("application/json"):
+        # Store what the client would have received (dates, decimals already rendered).
+        job.result = json.loads(response.content or b"null")
+    else:
+        job.result = getattr(response, "data", None)
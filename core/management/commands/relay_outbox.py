@@ -0,0 +1,115 @@
+import logging
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from common import mqtt
+from core import outbox
+from core.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Relay pending outbox messages to the MQTT broker in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when the outbox is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the outbox once and exit instead of polling forever.",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=10,
+            help="Dead-letter a message after this many failed publishes so it stops blocking its key.",
+        )
+        parser.add_argument(
+            "--retention-hours",
+            type=int,
+            default=24,
+            help="Delete published messages older than this many hours.",
+        )
+
+    def handle(self, *args, **options):
+        publisher = mqtt.get_publisher()
+        if publisher is None:
+            raise CommandError("MQTT_URL is not configured.")
+
+        batch_size = options["batch_size"]
+        total = 0
+        while True:
+            sent, pending = self.relay_batch(publisher, batch_size, options["max_attempts"])
+            total += sent
+            if pending:
+                continue
+
+            self.purge(options["retention_hours"])
+            if options["once"]:
+                break
+            outbox.wait_for_messages(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"Relayed {total} outbox message(s)."))
+
+    def relay_batch(self, publisher, batch_size: int, max_attempts: int = 10) -> tuple[int, bool]:
+        """Publish one batch; returns (sent, more_pending)."""
+        sent = 0
+        with transaction.atomic():
+            batch = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(published_at__isnull=True, dead_at__isnull=True)
+                .order_by("id")[:batch_size]
+            )
+            if not batch:
+                return 0, False
+
+            blocked_keys = set()
+            delivered = []
+            failed = []
+            for msg in batch:
+                # Keep per-key ordering: once a message fails, later ones with the same key wait.
+                if msg.ordering_key and msg.ordering_key in blocked_keys:
+                    continue
+                try:
+                    published = publisher.publish_sync(msg.topic, msg.payload, msg.qos)
+                    error = "Broker unavailable or publish failed"
+                except Exception as e:
+                    published = False
+                    error = f"{type(e).__name__}: {e}"
+                if published:
+                    msg.published_at = timezone.now()
+                    delivered.append(msg)
+                    continue
+
+                msg.attempts += 1
+                msg.last_error = error
+                failed.append(msg)
+                if msg.attempts >= max_attempts:
+                    # Poison message: park it so later messages with the same key can go out.
+                    msg.dead_at = timezone.now()
+                    logger.error(f"Outbox message {msg.id} ({msg.topic}) dead after {msg.attempts} attempts: {error}")
+                elif msg.ordering_key:
+                    blocked_keys.add(msg.ordering_key)
+
+            OutboxMessage.objects.bulk_update(delivered, ["published_at"])
+            OutboxMessage.objects.bulk_update(failed, ["attempts", "last_error", "dead_at"])
+            sent = len(delivered)
+
+        if failed and not delivered:
+            # Nothing got through; back off instead of hammering a dead broker.
+            return sent, False
+        return sent, len(batch) == batch_size
+
+    def purge(self, retention_hours: int):
+        cutoff = timezone.now() - timedelta(hours=retention_hours)
+        OutboxMessage.objects.filter(published_at__lt=cutoff).delete()
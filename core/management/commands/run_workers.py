@@ -0,0 +1,88 @@
+import multiprocessing
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = "Run background import/export jobs queued with ?async=1."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=2,
+            help="Number of worker processes to fork.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when no job is queued.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run every queued job in this process and exit instead of polling forever.",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=30,
+            help="Requeue jobs left running for more than this many minutes (worker crashed).",
+        )
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=7,
+            help="Delete finished jobs and their files older than this many days.",
+        )
+
+    def handle(self, *args, **options):
+        jobs.requeue_stale(timedelta(minutes=options["stale_after"]))
+        jobs.purge(timedelta(days=options["retention_days"]))
+
+        if options["once"] or options["processes"] <= 1:
+            done = self.work(options)
+            self.stdout.write(self.style.SUCCESS(f"Ran {done} job(s)."))
+            return
+
+        # Forked children must not share the parent's database sockets.
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=self.work, args=(options,), name=f"job-worker-{i}")
+            for i in range(options["processes"])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} job worker(s).")
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+
+    def work(self, options) -> int:
+        done = 0
+        while True:
+            self.close_stale_connections()
+            job = jobs.claim_next()
+            if job is not None:
+                job = jobs.run(job)
+                done += 1
+                self.stdout.write(f"Job {job.id} {job.status}.")
+                continue
+
+            if options["once"]:
+                return done
+            time.sleep(options["interval"])
+
+    def close_stale_connections(self):
+        # A caller's open transaction (e.g. a test running --once) owns the connection; leave it alone.
+        if not any(connection.in_atomic_block for connection in connections.all()):
+            close_old_connections()
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.1 on 2026-10-17 11:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('topic', models.CharField(max_length=255)),
+                ('payload', models.JSONField()),
+                ('qos', models.PositiveSmallIntegerField(default=0)),
+                ('ordering_key', models.CharField(blank=True, help_text="Messages sharing a key (e.g. 'trip:12') are delivered in insertion order", max_length=100)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('published_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['published_at', 'id'], name='core_outbox_publish_e7ecea_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 12:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='dead_at',
+            field=models.DateTimeField(blank=True, help_text='Set when the relay gave up after --max-attempts; the message no longer blocks its key', null=True),
+        ),
+    ]
@@ -1,3 +1,81 @@
-# from django.db import models
+from django.db import models
 
-# Create your models here.
+
+class OutboxMessage(models.Model):
+    """Broker event waiting to be relayed by `manage.py relay_outbox`."""
+
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=255)
+    payload = models.JSONField()
+    qos = models.PositiveSmallIntegerField(default=0)
+    ordering_key = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="Messages sharing a key (e.g. 'trip:12') are delivered in insertion order",
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(null=True, blank=True)
+    dead_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Set when the relay gave up after --max-attempts; the message no longer blocks its key",
+    )
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["published_at", "id"]),
+        ]
+
+    def __str__(self) -> str:
+        state = "sent" if self.published_at else "dead" if self.dead_at else "pending"
+        return f"{self.topic} ({state})"
+
+
+class Job(models.Model):
+    """Import/export request queued by `?async=1` and executed by `manage.py run_workers`."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=255, help_text="Dotted path of the view that runs the job")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.QUEUED)
+    params = models.JSONField(default=dict, help_text="Method, path, query, form data and URL kwargs to replay")
+    input_file = models.FileField(upload_to="jobs/input/%Y/%m/", blank=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    result = models.JSONField(null=True, blank=True)
+    result_file = models.FileField(upload_to="jobs/result/%Y/%m/", blank=True)
+    error = models.TextField(blank=True)
+    tenant = models.ForeignKey(
+        "accounts.Tenant",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+    created_by = models.ForeignKey(
+        "accounts.User",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["status", "id"]),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} #{self.id} ({self.status})"
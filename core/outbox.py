@@ -0,0 +1,71 @@
+"""Transactional outbox for MQTT events.
+
+Views call :func:`enqueue` / :func:`enqueue_many` instead of publishing to the
+broker. Messages are inserted in the caller's transaction, so they commit or
+roll back together with the business rows, and the ``relay_outbox`` management
+command delivers them to the broker in batches. On PostgreSQL the commit also
+wakes a relay waiting in :func:`wait_for_messages` (LISTEN/NOTIFY); elsewhere
+the relay simply polls.
+"""
+
+import logging
+import select
+import time
+from functools import partial
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from core.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "core_outbox"
+
+
+def message(topic: str, payload, *, key: str = "", qos: int = 0) -> OutboxMessage:
+    return OutboxMessage(topic=topic, payload=payload, qos=qos, ordering_key=key)
+
+
+def enqueue_many(messages: list[OutboxMessage], using=None):
+    """Store the messages with a single INSERT in the current transaction."""
+    if not messages:
+        return
+    OutboxMessage.objects.using(using).bulk_create(messages)
+    logger.info("Stored %s outbox message(s)", len(messages))
+    transaction.on_commit(partial(_wake_relay, using or DEFAULT_DB_ALIAS), using=using)
+
+
+def enqueue(topic: str, payload, *, key: str = "", qos: int = 0, using=None):
+    enqueue_many([message(topic, payload, key=key, qos=qos)], using=using)
+
+
+def _wake_relay(using: str):
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"NOTIFY {CHANNEL}")
+    except Exception as e:
+        # The relay still finds the rows on its next poll.
+        logger.error(f"Failed to wake the outbox relay: {e}")
+
+
+def wait_for_messages(timeout: float, using=None):
+    """Block up to `timeout` seconds, returning early when a transaction enqueues messages (PostgreSQL only)."""
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.vendor != "postgresql":
+        time.sleep(timeout)
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"LISTEN {CHANNEL}")
+    raw = connection.connection
+    if hasattr(raw, "notifies") and callable(raw.notifies):
+        # psycopg 3
+        for _ in raw.notifies(timeout=timeout, stop_after=1):
+            pass
+        return
+    if select.select([raw], [], [], timeout) != ([], [], []):
+        raw.poll()
+        raw.notifies.clear()
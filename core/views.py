@@ -31,3 +31,72 @@ class IndexPageAPIView(APIView):
             "active_page": "index",
         }
         return Response(context)
+
+
+def _visible_job(request, pk):
+    from core.models import Job
+
+    qs = Job.objects.all()
+    if not request.user.is_superuser:
+        qs = qs.filter(created_by=request.user)
+    return qs.filter(pk=pk).first()
+
+
+class JobDetailView(APIView):
+    """GET /api/jobs/<id>/ — poll a background import/export job."""
+
+    from rest_framework import permissions
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        summary="Background job status",
+        description="Status, progress (0-100), JSON result or error of a job queued with ?async=1.",
+        tags=["Jobs"],
+    )
+    def get(self, request, pk):
+        from django.urls import reverse
+        from rest_framework import status
+
+        job = _visible_job(request, pk)
+        if job is None:
+            return Response({"detail": "Không tìm thấy tác vụ."}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            "id": job.id,
+            "kind": job.kind.rsplit(".", 1)[-1],
+            "status": job.status,
+            "progress": job.progress,
+            "result": job.result,
+            "error": job.error,
+            "download_url": reverse("job-download", args=[job.id]) if job.result_file else None,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        })
+
+
+class JobDownloadView(APIView):
+    """GET /api/jobs/<id>/download/ — fetch the file produced by an export job."""
+
+    from rest_framework import permissions
+    permission_classes = [permissions.IsAuthenticated]
+
+    @extend_schema(
+        summary="Download background job result",
+        tags=["Jobs"],
+    )
+    def get(self, request, pk):
+        from django.http import FileResponse
+        from rest_framework import status
+
+        job = _visible_job(request, pk)
+        if job is None or not job.result_file:
+            return Response({"detail": "Không tìm thấy tệp kết quả."}, status=status.HTTP_404_NOT_FOUND)
+
+        result = job.result or {}
+        return FileResponse(
+            job.result_file.open("rb"),
+            as_attachment=True,
+            filename=result.get("filename") or job.result_file.name.rsplit("/", 1)[-1],
+            content_type=result.get("content_type") or None,
+        )
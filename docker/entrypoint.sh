@@ -1,9 +1,17 @@
 #!/bin/sh
+# Usage: entrypoint.sh [web|run_workers|relay_outbox|deliver_notifications|prune_notifications] [options...]
+# Run one container per mode from the same image; extra arguments go to the management command.
 set -e
 
+MODE="${1:-web}"
+[ $# -gt 0 ] && shift
+
 DB_HOST="${DB_HOST:-postgres}"
 DB_PORT="${DB_PORT:-5432}"
 
+# The file log handlers fail to start if the directory is missing.
+mkdir -p logs
+
 if [ -n "$DB_HOST" ]; then
   echo "Waiting for Postgres at ${DB_HOST}:${DB_PORT}..."
   until pg_isready -h "$DB_HOST" -p "$DB_PORT" >/dev/null 2>&1; do
@@ -11,6 +19,20 @@ if [ -n "$DB_HOST" ]; then
   done
 fi
 
+case "$MODE" in
+  web)
+    ;;
+  run_workers|relay_outbox|deliver_notifications|prune_notifications)
+    echo "Starting ${MODE}..."
+    exec python manage.py "$MODE" "$@"
+    ;;
+  *)
+    echo "Unknown mode '${MODE}'" >&2
+    echo "Expected one of: web, run_workers, relay_outbox, deliver_notifications, prune_notifications" >&2
+    exit 64
+    ;;
+esac
+
 echo "Applying database migrations..."
 python manage.py migrate --noinput
 
@@ -2,6 +2,13 @@ from drf_spectacular.utils import extend_schema
 from rest_framework import filters, generics, permissions
 from rest_framework.views import APIView
 
+from common.exports import (
+    Sheet,
+    SpreadsheetExportMixin,
+    TemplateDownloadMixin,
+    workbook_bytes,
+)
+from core.jobs import BackgroundJobMixin
 from core.permissions import IsAdminOrTourManagerOrReadOnly, TenantScopedMixin
 from fleet.models import Bus
 from fleet.serializers import BusSerializer
@@ -90,7 +97,7 @@ class BusDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
 BUS_COLUMNS = ["STT", "Biển số", "Mã xe", "Sức chứa", "Mô tả"]
 
 
-class BusImportView(TenantScopedMixin, APIView):
+class BusImportView(BackgroundJobMixin, TenantScopedMixin, APIView):
     """POST /api/v1/buses/import/"""
 
     permission_classes = [permissions.IsAuthenticated]
@@ -104,6 +111,10 @@ class BusImportView(TenantScopedMixin, APIView):
         tags=["Buses"],
     )
     def post(self, request, *args, **kwargs):
+        queued = self.defer_to_job(request)
+        if queued is not None:
+            return queued
+
         uploaded_file = request.FILES.get("file")
         if not uploaded_file:
             from rest_framework import status
@@ -154,81 +165,52 @@ class BusImportView(TenantScopedMixin, APIView):
         return Response({"detail": f"Imported {imported_count} buses successfully."}, status=status.HTTP_201_CREATED)
 
 
-class BusExportView(TenantScopedMixin, APIView):
+class BusExportView(BackgroundJobMixin, SpreadsheetExportMixin, TenantScopedMixin, APIView):
     """GET /api/v1/buses/export/"""
 
     permission_classes = [permissions.IsAuthenticated]
 
     @extend_schema(
         summary="Export buses to Excel",
-        description="Download all buses as a .xlsx file.",
+        description="Download all buses as a .xlsx file, or as CSV with ?format=csv.",
         tags=["Buses"],
     )
     def get(self, request, *args, **kwargs):
-        import io
+        queued = self.defer_to_job(request)
+        if queued is not None:
+            return queued
 
-        import openpyxl
-        from django.http import HttpResponse
+        def rows():
+            buses = self.apply_tenant_filter(Bus.objects.all().order_by("registration_number"), "tenant_id")
+            for idx, bus in enumerate(buses.iterator(), start=1):
+                yield [idx, bus.registration_number, bus.bus_code, bus.capacity, bus.description]
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Buses"
-        ws.append(BUS_COLUMNS)
+        return self.export_response(request, "buses", [Sheet("Buses", BUS_COLUMNS, rows())])
 
-        qs = Bus.objects.all().order_by("registration_number")
-        buses = self.apply_tenant_filter(qs, "tenant_id")
-        for idx, bus in enumerate(buses, start=1):
-            ws.append([
-                idx,
-                bus.registration_number,
-                bus.bus_code,
-                bus.capacity,
-                bus.description
-            ])
-
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-
-        response = HttpResponse(
-            buf.read(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        response["Content-Disposition"] = 'attachment; filename="buses.xlsx"'
-        return response
-
-
-class BusTemplateDownloadView(APIView):
+
+class BusTemplateDownloadView(TemplateDownloadMixin, APIView):
     """GET /api/v1/buses/import/template/"""
 
     permission_classes = [permissions.IsAuthenticated]
+    template_filename = "bus_import_template.xlsx"
 
-    @extend_schema(
-        summary="Download bus import template",
-        description="Download a blank .xlsx template for importing buses.",
-        tags=["Buses"],
-    )
-    def get(self, request, *args, **kwargs):
-        import io
-
+    @staticmethod
+    def build_template() -> bytes:
         import openpyxl
-        from django.http import HttpResponse
 
         wb = openpyxl.Workbook()
         ws = wb.active
         ws.title = "Sheet1"
         ws.append(BUS_COLUMNS)
+        return workbook_bytes(wb)
 
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-
-        response = HttpResponse(
-            buf.read(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        response["Content-Disposition"] = 'attachment; filename="bus_import_template.xlsx"'
-        return response
+    @extend_schema(
+        summary="Download bus import template",
+        description="Download a blank .xlsx template for importing buses.",
+        tags=["Buses"],
+    )
+    def get(self, request, *args, **kwargs):
+        return self.template_response(request)
 
 
 class BusBulkDeleteView(BusListCreateView):
@@ -0,0 +1,135 @@
+"""Batched Firebase Cloud Messaging delivery.
+
+Pushes are grouped by (title, body) and sent with ``send_each_for_multicast``,
+at most :data:`MAX_TOKENS_PER_CALL` tokens per HTTP call. Tokens that Firebase
+reports as unregistered or invalid are collected and pruned with one DELETE.
+
+The transport is chosen with ``FCM_TRANSPORT``: ``firebase`` (default) or
+``fake``, an offline stand-in that records calls so delivery can be tested and
+load-tested without Google.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import firebase_admin
+from django.conf import settings
+from firebase_admin import credentials, exceptions, messaging
+
+logger = logging.getLogger(__name__)
+
+MAX_TOKENS_PER_CALL = 500
+
+
+def get_firebase_app():
+    if not firebase_admin._apps:  # pylint: disable=protected-access
+        cred_path = os.getenv("FIREBASE_CREDENTIALS", "firebase-key.json")
+        if os.path.exists(cred_path):
+            cred = credentials.Certificate(cred_path)
+            firebase_admin.initialize_app(cred)
+            return True
+
+        logger.warning(f"Firebase credentials not found at {cred_path}")
+        return False
+    return True
+
+
+def is_invalid_token_error(error) -> bool:
+    """True when the token itself is dead (app uninstalled, token expired or from another project)."""
+    if isinstance(error, (messaging.UnregisteredError, messaging.SenderIdMismatchError)):
+        return True
+    return isinstance(error, exceptions.InvalidArgumentError) and "registration token" in str(error)
+
+
+class FirebaseTransport:
+    @property
+    def available(self) -> bool:
+        return get_firebase_app()
+
+    def send_multicast(self, tokens: list[str], title: str, body: str) -> set[str]:
+        """Send one multicast call; returns the tokens Firebase rejected as invalid."""
+        response = messaging.send_each_for_multicast(
+            messaging.MulticastMessage(
+                notification=messaging.Notification(title=title, body=body),
+                tokens=tokens,
+            )
+        )
+        invalid = set()
+        for token, result in zip(tokens, response.responses):
+            if result.success:
+                continue
+            if is_invalid_token_error(result.exception):
+                invalid.add(token)
+            else:
+                logger.error(f"FCM push failed for {token[:10]}: {result.exception}")
+        logger.info(f"FCM multicast: {response.success_count}/{len(tokens)} sent")
+        return invalid
+
+
+class FakeTransport:
+    """Stand-in selected with ``FCM_TRANSPORT=fake``; keeps calls in a list instead of calling Google."""
+
+    available = True
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: list[tuple[list[str], str, str]] = []
+        self.invalid_tokens: set[str] = set()
+
+    def send_multicast(self, tokens: list[str], title: str, body: str) -> set[str]:
+        if self.latency:
+            time.sleep(self.latency)
+        self.calls.append((list(tokens), title, body))
+        return self.invalid_tokens.intersection(tokens)
+
+    @property
+    def sent(self) -> int:
+        return sum(len(tokens) for tokens, _, _ in self.calls)
+
+
+_transport = None
+_transport_key = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """Return this process's transport; re-created when ``FCM_TRANSPORT`` changes (tests swap in ``fake``)."""
+    global _transport, _transport_key  # pylint: disable=global-statement
+
+    key = (os.getpid(), settings.FCM_TRANSPORT)
+    if _transport is None or _transport_key != key:
+        with _transport_lock:
+            if _transport is None or _transport_key != key:
+                if settings.FCM_TRANSPORT == "fake":
+                    _transport = FakeTransport(latency=settings.FCM_FAKE_LATENCY)
+                else:
+                    _transport = FirebaseTransport()
+                _transport_key = key
+    return _transport
+
+
+def send_pushes(pushes: list[tuple[str, str, str]]) -> set[str]:
+    """Deliver ``(token, title, body)`` pushes; returns every token reported invalid.
+
+    Pushes with the same title and body share multicast calls.
+    """
+    transport = get_transport()
+    if not pushes or not transport.available:
+        return set()
+
+    groups: dict[tuple[str, str], dict[str, None]] = {}
+    for token, title, body in pushes:
+        groups.setdefault((title, body), {})[token] = None
+
+    invalid = set()
+    for (title, body), unique_tokens in groups.items():
+        tokens = list(unique_tokens)
+        for start in range(0, len(tokens), MAX_TOKENS_PER_CALL):
+            chunk = tokens[start:start + MAX_TOKENS_PER_CALL]
+            try:
+                invalid |= transport.send_multicast(chunk, title, body)
+            except Exception as e:
+                logger.error(f"FCM multicast of {len(chunk)} token(s) failed: {e}")
+    return invalid
@@ -0,0 +1,44 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from notifications.services import deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Send push (FCM) and email for notifications created since the last run, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=200)
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when nothing is pending.",
+        )
+        parser.add_argument(
+            "--stale-after",
+            type=int,
+            default=10,
+            help="Claim again batches left undelivered for more than this many minutes (worker crashed).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Deliver everything pending once and exit instead of polling forever.",
+        )
+
+    def handle(self, *args, **options):
+        claim_timeout = timedelta(minutes=options["stale_after"])
+        total = 0
+        while True:
+            delivered, pending = deliver_pending(options["batch_size"], claim_timeout)
+            total += delivered
+            if pending:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+
+        self.stdout.write(self.style.SUCCESS(f"Delivered {total} notification(s)."))
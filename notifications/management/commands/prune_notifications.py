@@ -0,0 +1,113 @@
+import gzip
+import json
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from notifications.models import Notification
+from notifications.services import reset_unread_count
+
+# Notifications that are "the same" for compaction.
+DUPLICATE_FIELDS = ("user_id", "type", "title", "message", "reference_type", "reference_id")
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete (or archive) read notifications older than --days in batches and collapse "
+        "identical delivered notifications from the last --compact-days for the same reference "
+        "into one row with a repeat_count."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=90, help="Prune read notifications older than this.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--archive",
+            metavar="PATH",
+            help="Append pruned rows as gzipped JSON lines to PATH before deleting them.",
+        )
+        parser.add_argument("--no-compact", action="store_true", help="Only prune, do not collapse duplicates.")
+        parser.add_argument(
+            "--compact-days",
+            type=int,
+            default=7,
+            help="Only collapse duplicates created within this many days (bounds the GROUP BY).",
+        )
+        parser.add_argument(
+            "--every-hours",
+            type=float,
+            default=0,
+            help="Keep running and prune again every N hours (0 = run once).",
+        )
+
+    def handle(self, *args, **options):
+        if options["days"] < 0 or options["compact_days"] < 0 or options["batch_size"] < 1:
+            raise CommandError("--days and --compact-days must be >= 0 and --batch-size >= 1.")
+
+        while True:
+            now = timezone.now()
+            pruned = self.prune(now - timedelta(days=options["days"]), options["batch_size"], options["archive"])
+            collapsed = 0 if options["no_compact"] else self.compact(now - timedelta(days=options["compact_days"]))
+            action = "Archived and deleted" if options["archive"] else "Deleted"
+            self.stdout.write(self.style.SUCCESS(
+                f"{action} {pruned} read notification(s); collapsed {collapsed} duplicate(s)."
+            ))
+            if not options["every_hours"]:
+                break
+            time.sleep(options["every_hours"] * 3600)
+
+    def prune(self, cutoff, batch_size: int, archive_path: str | None) -> int:
+        stale = Notification.objects.filter(is_read=True, created_at__lt=cutoff).order_by("id")
+        total = 0
+        while True:
+            with transaction.atomic():
+                if archive_path:
+                    rows = list(stale.values()[:batch_size])
+                    ids = [row["id"] for row in rows]
+                else:
+                    ids = list(stale.values_list("id", flat=True)[:batch_size])
+                if not ids:
+                    return total
+                if archive_path:
+                    self.archive(archive_path, rows)
+                Notification.objects.filter(id__in=ids).delete()
+            total += len(ids)
+
+    def archive(self, path: str, rows: list[dict]):
+        # Each call adds a gzip member; `zcat` / gzip.open read the concatenation as one stream.
+        with gzip.open(path, "at", encoding="utf-8") as archive:
+            for row in rows:
+                archive.write(json.dumps(row, default=str, ensure_ascii=False) + "\n")
+
+    def compact(self, since) -> int:
+        # Undelivered rows are left alone: the worker still has to send each of them.
+        candidates = Notification.objects.filter(created_at__gte=since, delivered_at__isnull=False)
+        groups = (
+            candidates.order_by()
+            .values(*DUPLICATE_FIELDS)
+            .annotate(
+                rows=Count("id"),
+                keep_id=Max("id"),
+                total=Sum("repeat_count"),
+                unread=Count("id", filter=Q(is_read=False)),
+            )
+            .filter(rows__gt=1)
+        )
+        removed = 0
+        for group in list(groups):
+            duplicates = {field: group[field] for field in DUPLICATE_FIELDS}
+            with transaction.atomic():
+                # Keep the newest row; it stays unread if any of the collapsed ones was.
+                Notification.objects.filter(id=group["keep_id"]).update(
+                    repeat_count=group["total"],
+                    is_read=group["unread"] == 0,
+                )
+                deleted, _ = candidates.filter(**duplicates, id__lt=group["keep_id"]).delete()
+                if group["unread"]:
+                    reset_unread_count(group["user_id"])
+            removed += deleted
+        return removed
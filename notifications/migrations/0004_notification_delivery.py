@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-17 12:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_existing_delivered(apps, schema_editor):
+    # Existing rows were delivered synchronously by the old post_save handler.
+    Notification = apps.get_model('notifications', 'Notification')
+    Notification.objects.update(delivered_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_delivered, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('delivered_at__isnull', True)), fields=['id'], name='notification_undelivered'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_unread_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='repeat_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -10,10 +10,24 @@ class Notification(models.Model):
     reference_type = models.CharField(max_length=100, null=True, blank=True)
     reference_id = models.CharField(max_length=100, null=True, blank=True)
     is_read = models.BooleanField(default=False)
+    # Identical notifications for the same reference collapsed by `manage.py prune_notifications`.
+    repeat_count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set by `manage.py deliver_notifications` when it takes the row, and once push and email have been sent.
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notification_user_keyset'),
+            models.Index(fields=['user', 'is_read', 'created_at'], name='notification_user_unread'),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(delivered_at__isnull=True),
+                name='notification_undelivered',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.title}"
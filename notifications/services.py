@@ -1,72 +1,134 @@
-import json
 import logging
-import os
+from datetime import timedelta
+from functools import partial
 
-import firebase_admin
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Q
 from django.template.loader import render_to_string
+from django.utils import timezone
 from django.utils.html import strip_tags
-from firebase_admin import credentials, messaging
-from paho.mqtt import publish
+
+from common.cache import cache_key
+from common.signals import defer
+from core import outbox
+
+from . import fcm
 
 logger = logging.getLogger(__name__)
 
+# Messages handed to the SMTP connection per send_messages() call.
+EMAIL_MESSAGES_PER_CALL = 100
 
-def publish_mqtt_notification(notification_id):
-    try:
-        from .models import Notification
-        notification = Notification.objects.get(id=notification_id)
-
-        user_id = notification.user.id
-        topic = f"notifications/user_{user_id}"
-
-        payload = {
-            'type': 'new_notification',
-            'data': {
-                'id': str(notification.id),
-                'type': notification.type,
-                'title': notification.title,
-                'message': notification.message,
-                'reference_type': notification.reference_type,
-                'reference_id': str(notification.reference_id) if notification.reference_id else "",
-                'is_read': notification.is_read,
-                'created_at': notification.created_at.isoformat()
-            }
-        }
-
-        if not settings.MQTT_URL:
-            logger.warning("MQTT_URL not configured, skipping publish")
-            return
-
-        mqtt_url = settings.MQTT_URL.replace("wss://", "").replace("ws://", "")
-        if ":" in mqtt_url:
-            host, port = mqtt_url.rsplit(":", 1)
-            port = int(port)
-        else:
-            host = mqtt_url
-            port = 8883 if settings.MQTT_URL.startswith("wss") else 1883
-
-        auth = None
-        if settings.MQTT_USERNAME and settings.MQTT_PASSWORD:
-            auth = {
-                "username": settings.MQTT_USERNAME,
-                "password": settings.MQTT_PASSWORD,
-            }
-
-        publish.single(
-            topic,
-            payload=json.dumps(payload),
-            hostname=host,
-            port=port,
-            auth=auth,
-            tls={} if settings.MQTT_URL.startswith("wss") else None,
-            transport="websockets" if settings.MQTT_URL.startswith("ws") else "tcp",
+# A claimed batch not marked delivered by then (worker died mid-send) is claimed again.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+UNREAD_PREFIX = "notifications-unread"
+# Counters drift only on cache races; expiring them bounds how long a wrong badge can last.
+UNREAD_TIMEOUT = 60 * 60
+
+
+def notification_payload(notification) -> dict:
+    return {
+        'id': str(notification.id),
+        'type': notification.type,
+        'title': notification.title,
+        'message': notification.message,
+        'reference_type': notification.reference_type,
+        'reference_id': str(notification.reference_id) if notification.reference_id else "",
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat()
+    }
+
+
+def publish_notifications(notifications):
+    """Queue the in-app (MQTT) events through the outbox; they are stored when the transaction commits."""
+    outbox.enqueue_many([
+        outbox.message(
+            f"notifications/user_{notification.user_id}",
+            {'type': 'new_notification', 'data': notification_payload(notification)},
+            key=f"user:{notification.user_id}",
         )
+        for notification in notifications
+        if notification.user.receive_in_app_notifications
+    ])
+
+
+def fan_out_notifications(users, title, message, type='INFO', reference_type="", reference_id=""):
+    """Create one notification per user with a single INSERT.
 
-        logger.info(f"Published MQTT notification to {topic}")
+    MQTT events go through the outbox; push and email are left to
+    `manage.py deliver_notifications` (see :func:`deliver_pending`), so the
+    request never waits on Firebase or SMTP.
+    """
+    from .models import Notification
+
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            user=user,
+            title=title,
+            message=message,
+            type=type,
+            reference_type=reference_type,
+            reference_id=reference_id
+        )
+        for user in users
+    ])
+    publish_notifications(notifications)
+    adjust_unread_counts(notifications)
+    return notifications
+
+
+def unread_count(user_id) -> int:
+    """Unread notifications of a user, from the cached counter or one indexed COUNT."""
+    from .models import Notification
+
+    key = cache_key(UNREAD_PREFIX, user_id)
+    try:
+        count = cache.get(key)
     except Exception as e:
-        logger.error(f"Failed to publish MQTT notification: {str(e)}")
+        logger.error(f"Failed to read unread counter for user {user_id}: {e}")
+        count = None
+    if count is not None:
+        return max(count, 0)
+
+    count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+    try:
+        cache.add(key, count, UNREAD_TIMEOUT)
+    except Exception as e:
+        logger.error(f"Failed to cache unread counter for user {user_id}: {e}")
+    return count
+
+
+def adjust_unread_counts(notifications, delta: int = 1):
+    """Add `delta` to the counter of each notification's user once the transaction commits."""
+    deltas = {}
+    for notification in notifications:
+        deltas[notification.user_id] = deltas.get(notification.user_id, 0) + delta
+    if deltas:
+        transaction.on_commit(partial(_apply_unread_deltas, deltas))
+
+
+def reset_unread_count(user_id):
+    """Forget the counter after a bulk change; the next read recounts from the database."""
+    transaction.on_commit(partial(_apply_unread_deltas, {user_id: None}))
+
+
+def _apply_unread_deltas(deltas):
+    for user_id, delta in deltas.items():
+        key = cache_key(UNREAD_PREFIX, user_id)
+        try:
+            if delta is None:
+                cache.delete(key)
+            else:
+                cache.incr(key, delta)
+        except ValueError:
+            # Not cached: nothing to keep in sync, unread_count() will count.
+            pass
+        except Exception as e:
+            logger.error(f"Failed to update unread counter for user {user_id}: {e}")
 
 
 def notify_users_by_role(tenant_id, roles, title, message, reference_type="", reference_id=""):
@@ -75,84 +137,166 @@ def notify_users_by_role(tenant_id, roles, title, message, reference_type="", re
     """
     from accounts.models import User
 
-    from .models import Notification
-
     users = User.objects.filter(role__name__in=roles, is_active=True)
     if tenant_id:
         users = users.filter(tenant_id=tenant_id)
 
-    for user in users:
-        Notification.objects.create(
-            user=user,
-            title=title,
-            message=message,
-            type='INFO',
-            reference_type=reference_type,
-            reference_id=reference_id
-        )
+    return fan_out_notifications(
+        users.only('id', 'receive_in_app_notifications'),
+        title,
+        message,
+        reference_type=reference_type,
+        reference_id=reference_id,
+    )
+
+
+def _joined_message(messages):
+    # Keep order, drop repeats: a batch often produces the same line for several rows.
+    return "\n".join(dict.fromkeys(messages))
+
 
+def _coalesce(items):
+    """Merge queued notification kwargs into one; the reference is kept only if all items share it."""
+    merged = {**items[0], "message": _joined_message(item["message"] for item in items)}
+    if len({item["reference_id"] for item in items}) > 1:
+        merged["reference_id"] = ""
+    return merged
 
-def get_firebase_app():
-    if not firebase_admin._apps:  # pylint: disable=protected-access
-        cred_path = os.getenv("FIREBASE_CREDENTIALS", "firebase-key.json")
-        if os.path.exists(cred_path):
-            cred = credentials.Certificate(cred_path)
-            firebase_admin.initialize_app(cred)
-            return True
 
-        logger.warning(f"Firebase credentials not found at {cred_path}")
-        return False
-    return True
+def _create_coalesced_notifications(items):
+    from .models import Notification
+
+    Notification.objects.create(**_coalesce(items))
+
+
+def queue_notification(user, title, message, type="INFO", reference_type="", reference_id=""):
+    """Create a notification, or merge it with the others for the same user and title inside ``batched_signals()``."""
+    key = ("notification", user.pk, title, type, reference_type)
+    item = {
+        "user": user,
+        "title": title,
+        "message": message,
+        "type": type,
+        "reference_type": reference_type,
+        "reference_id": reference_id,
+    }
+    defer(key, item, _create_coalesced_notifications)
+
 
+def _notify_roles_coalesced(items):
+    notify_users_by_role(**_coalesce(items))
 
-def send_firebase_push_notification(user_id, title, message):
-    if not get_firebase_app():
-        return
 
+def queue_role_notification(tenant_id, roles, title, message, reference_type="", reference_id=""):
+    """`notify_users_by_role`, coalesced per tenant, roles and title inside ``batched_signals()``."""
+    key = ("role-notification", tenant_id, tuple(roles), title, reference_type)
+    item = {
+        "tenant_id": tenant_id,
+        "roles": roles,
+        "title": title,
+        "message": message,
+        "reference_type": reference_type,
+        "reference_id": reference_id,
+    }
+    defer(key, item, _notify_roles_coalesced)
+
+
+def deliver_notifications(notifications):
+    """Send push and email for already created notifications; FCM devices are read with one query."""
     from .models import FCMDevice
-    devices = FCMDevice.objects.filter(user_id=user_id)
-    if not devices.exists():
-        return
 
-    for device in devices:
-        try:
-            msg = messaging.Message(
-                notification=messaging.Notification(
-                    title=title,
-                    body=message,
-                ),
-                token=device.token,
-            )
-            messaging.send(msg)
-            logger.info(f"FCM push sent to {device.token[:10]}...")
-        except Exception as e:
-            logger.error(f"FCM push failed for {device.token[:10]}: {e}")
-            # Xóa token nếu bị lỗi (do đã hết hạn hoặc user uninstall app)
-            if "Requested entity was not found" in str(e) or "The registration token is not a valid FCM registration token" in str(e):
-                device.delete()
+    push_user_ids = {n.user_id for n in notifications if n.user.receive_device_notifications}
+    tokens_by_user = {}
+    if push_user_ids:
+        for user_id, token in FCMDevice.objects.filter(user_id__in=push_user_ids).values_list('user_id', 'token'):
+            tokens_by_user.setdefault(user_id, []).append(token)
 
+    pushes = [
+        (token, notification.title, notification.message)
+        for notification in notifications
+        for token in tokens_by_user.get(notification.user_id, ())
+    ]
+    invalid = fcm.send_pushes(pushes)
+    if invalid:
+        # Xóa token hết hạn hoặc của app đã gỡ cài đặt
+        FCMDevice.objects.filter(token__in=invalid).delete()
+        logger.info(f"Pruned {len(invalid)} invalid FCM token(s)")
 
-def send_email_notification(email, title, message):
-    if not email:
-        return
+    send_email_notifications(
+        (notification.user.email, notification.title, notification.message)
+        for notification in notifications
+        if notification.user.receive_email_notifications and notification.user.email
+    )
 
-    try:
-        subject = f"[GoTrip] {title}"
-        context = {
-            'title': title,
-            'message': message,
-        }
-        html_content = render_to_string('notifications/email_notification.html', context)
-        text_content = strip_tags(html_content)
 
+def deliver_pending(batch_size: int = 200, claim_timeout: timedelta = CLAIM_TIMEOUT) -> tuple[int, bool]:
+    """Deliver one batch of undelivered notifications; returns (delivered, more_pending).
+
+    The batch is claimed (``claimed_at``) in a short transaction and sent with no
+    locks held; ``delivered_at`` is set afterwards, so a slow FCM/SMTP call never
+    holds row locks and a failure only re-sends once the claim has gone stale.
+    """
+    from .models import Notification
+
+    claimed_at = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(delivered_at__isnull=True)
+            .filter(Q(claimed_at__isnull=True) | Q(claimed_at__lt=claimed_at - claim_timeout))
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0, False
+        Notification.objects.filter(id__in=ids).update(claimed_at=claimed_at)
+
+    batch = list(Notification.objects.select_related('user').filter(id__in=ids).order_by('id'))
+    deliver_notifications(batch)
+
+    with transaction.atomic():
+        Notification.objects.filter(id__in=ids, delivered_at__isnull=True).update(delivered_at=timezone.now())
+    return len(ids), len(ids) == batch_size
+
+
+EMAIL_TEMPLATE = 'notifications/email_notification.html'
+
+
+def render_email(title, message) -> tuple[str, str]:
+    """(text, html) bodies of a notification email."""
+    html_content = render_to_string(EMAIL_TEMPLATE, {'title': title, 'message': message})
+    return strip_tags(html_content), html_content
+
+
+def send_email_notifications(emails):
+    """Send ``(email, title, message)`` items over one SMTP connection.
+
+    Each distinct (title, message) is rendered once; a role notification sent
+    to 20 managers renders the template a single time.
+    """
+    rendered = {}
+    messages = []
+    for email, title, message in emails:
+        if (title, message) not in rendered:
+            rendered[title, message] = render_email(title, message)
+        text_content, html_content = rendered[title, message]
         msg = EmailMultiAlternatives(
-            subject=subject,
+            subject=f"[GoTrip] {title}",
             body=text_content,
             from_email=settings.DEFAULT_FROM_EMAIL,
             to=[email],
         )
         msg.attach_alternative(html_content, "text/html")
-        msg.send(fail_silently=True)
-        logger.info(f"Email notification sent to {email}")
+        messages.append(msg)
+    if not messages:
+        return 0
+
+    sent = 0
+    try:
+        with get_connection(fail_silently=True) as connection:
+            for start in range(0, len(messages), EMAIL_MESSAGES_PER_CALL):
+                sent += connection.send_messages(messages[start:start + EMAIL_MESSAGES_PER_CALL]) or 0
     except Exception as e:
-        logger.error(f"Failed to send email notification to {email}: {e}")
+        logger.error(f"Failed to send {len(messages)} email notification(s): {e}")
+    logger.info(f"Email notifications: {sent}/{len(messages)} sent")
+    return sent
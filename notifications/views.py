@@ -1,27 +1,53 @@
-from rest_framework import viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
+from common.pagination import SelectablePagination
+
 from .models import Notification
 from .serializers import NotificationSerializer
+from .services import adjust_unread_counts, reset_unread_count, unread_count
+
+SUMMARY_LIMIT = 5
+MAX_SUMMARY_LIMIT = 20
+
+
+class NotificationPagination(SelectablePagination):
+    cursor_ordering = ("-created_at", "-id")
 
 
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Unread badge count (cached per user) and the latest `limit` notifications (default 5, max 20)."""
+        try:
+            limit = min(max(int(request.query_params.get('limit', SUMMARY_LIMIT)), 0), MAX_SUMMARY_LIMIT)
+        except ValueError:
+            return Response({"detail": "limit phải là số nguyên"}, status=status.HTTP_400_BAD_REQUEST)
+
+        latest = self.get_queryset().order_by('-created_at', '-id')[:limit] if limit else []
+        return Response({
+            'unread_count': unread_count(request.user.id),
+            'latest': self.get_serializer(latest, many=True).data,
+        })
+
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        if Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True):
+            adjust_unread_counts([notification], delta=-1)
         return Response({'status': 'read'})
 
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
-        self.get_queryset().update(is_read=True)
+        self.get_queryset().filter(is_read=False).update(is_read=True)
+        reset_unread_count(request.user.id)
         return Response({'status': 'all_read'})
 
     @action(detail=False, methods=['post'])
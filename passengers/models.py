@@ -1,5 +1,7 @@
 from django.db import models
 
+from common.tracking import FieldTrackerMixin
+
 
 class Passenger(models.Model):
     id = models.BigAutoField(primary_key=True)
@@ -112,7 +114,9 @@ class PassengerBusAssignment(models.Model):
         return f"{self.passenger} -> {self.imported_bus} (draft)"
 
 
-class PassengerTransfer(models.Model):
+class PassengerTransfer(FieldTrackerMixin, models.Model):
+    tracked_fields = ("to_trip_bus_id", "from_trip_bus_id")
+
     id = models.BigAutoField(primary_key=True)
     passenger = models.ForeignKey(
         Passenger,
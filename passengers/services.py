@@ -0,0 +1,241 @@
+import time
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from common.cache import invalidate_tenant
+from passengers.models import ImportedBus, Passenger, PassengerBusAssignment
+
+IMPORT_SKIP_SHEETS = {"Quản lý xe"}
+# Keep IN (...) lists well below SQLite's and Postgres' bound-parameter limits.
+LOOKUP_CHUNK_SIZE = 900
+
+
+@dataclass
+class ImportRow:
+    name: str
+    phone: str
+    extra_info: str
+    note: str
+    row: int = 0
+
+
+@dataclass
+class ImportSheet:
+    name: str
+    sequence: int
+    rows: list[ImportRow] = field(default_factory=list)
+
+
+def _cell(row, index: int) -> str:
+    value = row[index] if len(row) > index else None
+    text = str(value).strip() if value else ""
+    return "" if text.lower() == "none" else text
+
+
+def parse_import_sheets(workbook) -> list[ImportSheet]:
+    """Read every bus sheet (STT | Họ và tên | Số điện thoại | Thông tin thêm | Ghi chú), skipping blank rows."""
+    sheets = []
+    for seq, sheet_name in enumerate(workbook.sheetnames, start=1):
+        if sheet_name in IMPORT_SKIP_SHEETS:
+            continue
+        sheet = ImportSheet(name=sheet_name, sequence=seq)
+        for row_number, row in enumerate(workbook[sheet_name].iter_rows(min_row=2, values_only=True), start=2):
+            if not row:
+                continue
+            # The name column is taken verbatim; only the optional columns treat "none" as blank.
+            name = str(row[1]).strip() if len(row) > 1 and row[1] else ""
+            if not name:
+                continue
+            sheet.rows.append(
+                ImportRow(
+                    name=name, phone=_cell(row, 2), extra_info=_cell(row, 3), note=_cell(row, 4), row=row_number
+                )
+            )
+        if sheet.rows:
+            sheets.append(sheet)
+    return sheets
+
+
+def chunked(values, size: int = LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def first_by(queryset, lookup: str, values) -> dict:
+    """Map each `lookup` value to its first row in `queryset` (by name, then id), querying in chunks."""
+    found = {}
+    for chunk in chunked(values):
+        for obj in queryset.filter(**{f"{lookup}__in": chunk}).order_by("name", "id"):
+            found.setdefault(getattr(obj, lookup), obj)
+    return found
+
+
+def _existing_trip_passengers(trip, lookup: str, values) -> dict:
+    queryset = Passenger.objects.filter(tenant_id=trip.tenant_id, bus_assignments__trip=trip)
+    return first_by(queryset, lookup, values)
+
+
+def check_import(tenant_id, sheets: list[ImportSheet]) -> dict:
+    """Preview an import: rows whose phone already belongs to a differently named
+    passenger of the tenant, and phones repeated inside the file itself."""
+    phones = {row.phone for sheet in sheets for row in sheet.rows if row.phone}
+    existing = first_by(Passenger.objects.filter(tenant_id=tenant_id), "phone", phones)
+
+    valid_passengers = []
+    conflicts = []
+    seen = {}
+    for sheet in sheets:
+        for row in sheet.rows:
+            row_data = {
+                "name": row.name,
+                "phone": row.phone,
+                "extra_info": row.extra_info,
+                "note": row.note,
+                "sheet_name": sheet.name,
+            }
+            if row.phone:
+                seen.setdefault(row.phone, []).append({"sheet_name": sheet.name, "row": row.row, "name": row.name})
+
+            passenger = existing.get(row.phone) if row.phone else None
+            if passenger and passenger.name != row.name:
+                conflicts.append({
+                    "imported": row_data,
+                    "existing": {"id": passenger.id, "name": passenger.name, "phone": passenger.phone},
+                })
+            else:
+                valid_passengers.append(row_data)
+
+    duplicates = [{"phone": phone, "rows": found} for phone, found in seen.items() if len(found) > 1]
+    return {"valid_passengers": valid_passengers, "conflicts": conflicts, "duplicates": duplicates}
+
+
+def import_passengers(trip, sheets: list[ImportSheet], conflict_resolutions: dict) -> tuple[list, dict]:
+    """Apply parsed sheets to `trip` with a fixed number of queries, independent of row count.
+
+    Returns ``(imported_buses, stats)`` where `stats` holds row counts and
+    per-phase timings in milliseconds.
+    """
+    timings = {}
+    started = time.perf_counter()
+
+    # --- resolve: one phone-keyed and one name-keyed lookup for the whole file ---
+    all_rows = [row for sheet in sheets for row in sheet.rows]
+    by_phone = _existing_trip_passengers(trip, "phone", {r.phone for r in all_rows if r.phone})
+    by_name = _existing_trip_passengers(trip, "name", {r.name for r in all_rows})
+
+    new_passengers = []
+    changed = {}
+    assignments = {}  # passenger object id() -> (passenger, imported bus sheet name)
+    sheet_counts = {}
+    for sheet in sheets:
+        for row in sheet.rows:
+            passenger = (by_phone.get(row.phone) if row.phone else None) or by_name.get(row.name)
+            if passenger is None:
+                passenger = Passenger(
+                    tenant_id=trip.tenant_id,
+                    name=row.name,
+                    phone=row.phone,
+                    extra_info=row.extra_info,
+                    note=row.note,
+                )
+                new_passengers.append(passenger)
+            else:
+                if conflict_resolutions.get(row.phone) == "update" and passenger.name != row.name:
+                    passenger.name = row.name
+                    changed[id(passenger)] = passenger
+                if row.note and not passenger.note:
+                    passenger.note = row.note
+                    changed[id(passenger)] = passenger
+                if row.extra_info and not passenger.extra_info:
+                    passenger.extra_info = row.extra_info
+                    changed[id(passenger)] = passenger
+
+            # Later rows must see passengers placed by earlier rows, as the per-row import did.
+            if row.phone:
+                by_phone.setdefault(row.phone, passenger)
+            by_name.setdefault(row.name, passenger)
+            assignments[id(passenger)] = (passenger, sheet.name)
+            sheet_counts[sheet.name] = sheet_counts.get(sheet.name, 0) + 1
+    timings["resolve_ms"] = _elapsed_ms(started)
+
+    # --- write: bulk statements only ---
+    started = time.perf_counter()
+    with transaction.atomic():
+        imported_buses = _upsert_imported_buses(trip, sheets)
+
+        Passenger.objects.bulk_create(new_passengers, batch_size=500)
+        existing_changed = [p for p in changed.values() if p.pk is not None]
+        if existing_changed:
+            now = timezone.now()
+            for passenger in existing_changed:
+                passenger.updated_at = now
+            Passenger.objects.bulk_update(
+                existing_changed, ["name", "note", "extra_info", "updated_at"], batch_size=500
+            )
+
+        PassengerBusAssignment.objects.bulk_create(
+            [
+                PassengerBusAssignment(
+                    passenger=passenger,
+                    trip=trip,
+                    trip_bus=None,
+                    imported_bus=imported_buses[sheet_name],
+                )
+                for passenger, sheet_name in assignments.values()
+            ],
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["passenger", "trip"],
+            update_fields=["trip_bus", "imported_bus", "updated_at"],
+        )
+        # Bulk writes skip post_save, so drop cached passenger lists explicitly.
+        invalidate_tenant("passengers", trip.tenant_id)
+    timings["write_ms"] = _elapsed_ms(started)
+
+    result_buses = [
+        {
+            "id": imported_buses[sheet.name].id,
+            "sheet_name": sheet.name,
+            "sequence": sheet.sequence,
+            "passenger_count": sheet_counts.get(sheet.name, 0),
+            "is_mapped": imported_buses[sheet.name].mapped_bus_id is not None,
+        }
+        for sheet in sheets
+    ]
+    stats = {
+        "rows": len(all_rows),
+        "created": len(new_passengers),
+        "updated": len(existing_changed),
+        "timings": timings,
+    }
+    return result_buses, stats
+
+
+def _upsert_imported_buses(trip, sheets: list[ImportSheet]) -> dict:
+    existing = {
+        bus.sheet_name: bus
+        for bus in ImportedBus.objects.filter(trip=trip, sheet_name__in=[sheet.name for sheet in sheets])
+    }
+    to_create = []
+    to_update = []
+    for sheet in sheets:
+        bus = existing.get(sheet.name)
+        if bus is None:
+            bus = ImportedBus(trip=trip, sheet_name=sheet.name, sequence=sheet.sequence)
+            to_create.append(bus)
+            existing[sheet.name] = bus
+        elif bus.sequence != sheet.sequence:
+            bus.sequence = sheet.sequence
+            bus.updated_at = timezone.now()
+            to_update.append(bus)
+    ImportedBus.objects.bulk_create(to_create)
+    if to_update:
+        ImportedBus.objects.bulk_update(to_update, ["sequence", "updated_at"])
+    return existing
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
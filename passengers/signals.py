@@ -1,40 +1,33 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
-from notifications.models import Notification
+from common.cache import register_cache_invalidation
+from common.signals import track_previous_values
+from notifications.services import queue_notification
 
 from .models import PassengerTransfer
 
+register_cache_invalidation("passengers.Passenger", ("passengers",), "tenant_id")
+register_cache_invalidation("passengers.PassengerBusAssignment", ("passengers",), "trip__tenant_id")
+
 
 @receiver(pre_save, sender=PassengerTransfer)
 def passenger_transfer_pre_save(sender, instance, **kwargs):
-    if instance.pk:
-        try:
-            old_instance = PassengerTransfer.objects.get(pk=instance.pk)
-            instance._old_to_trip_bus_id = old_instance.to_trip_bus_id
-            instance._old_from_trip_bus_id = old_instance.from_trip_bus_id
-        except PassengerTransfer.DoesNotExist:
-            instance._old_to_trip_bus_id = None
-            instance._old_from_trip_bus_id = None
-    else:
-        instance._old_to_trip_bus_id = None
-        instance._old_from_trip_bus_id = None
+    track_previous_values(instance, "trip_id", ("to_trip_bus_id", "from_trip_bus_id"))
 
 
 @receiver(post_save, sender=PassengerTransfer)
 def passenger_transfer_post_save(sender, instance, created, **kwargs):
     if instance.trip.status == 'doing':
-        old_to_trip_bus_id = getattr(instance, '_old_to_trip_bus_id', None)
-
         passenger_name = instance.passenger.name
 
         # If to_trip_bus changed, or it was just created
-        if created or old_to_trip_bus_id != instance.to_trip_bus_id:
+        if created or instance.has_changed("to_trip_bus_id"):
             if instance.to_trip_bus:
                 manager = instance.to_trip_bus.manager
                 driver = instance.to_trip_bus.driver
                 if manager:
-                    Notification.objects.create(
+                    queue_notification(
                         user=manager,
                         title="Hành khách chuyển đến",
                         message=f"Hành khách {passenger_name} vừa được chuyển SANG xe của bạn",
@@ -43,7 +36,7 @@ def passenger_transfer_post_save(sender, instance, created, **kwargs):
                         reference_id=str(instance.passenger.id)
                     )
                 if driver:
-                    Notification.objects.create(
+                    queue_notification(
                         user=driver,
                         title="Hành khách chuyển đến",
                         message=f"Có thêm thành viên {passenger_name} vào xe của bạn",
@@ -56,7 +49,7 @@ def passenger_transfer_post_save(sender, instance, created, **kwargs):
                 manager = instance.from_trip_bus.manager
                 driver = instance.from_trip_bus.driver
                 if manager:
-                    Notification.objects.create(
+                    queue_notification(
                         user=manager,
                         title="Hành khách chuyển đi",
                         message=f"Hành khách {passenger_name} đã chuyển KHỎI xe của bạn",
@@ -65,7 +58,7 @@ def passenger_transfer_post_save(sender, instance, created, **kwargs):
                         reference_id=str(instance.passenger.id)
                     )
                 if driver:
-                    Notification.objects.create(
+                    queue_notification(
                         user=driver,
                         title="Hành khách chuyển đi",
                         message=f"Hành khách {passenger_name} đã chuyển KHỎI xe của bạn",
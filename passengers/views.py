@@ -1,18 +1,29 @@
-import io
-import json
 import logging
+import time
+from itertools import chain
 
-import paho.mqtt.publish as publish
-from django.conf import settings
 from django.db import transaction
 from django.db.models import Prefetch
-from django.http import HttpResponse
+from django.utils import timezone
 from drf_spectacular.utils import extend_schema
 from rest_framework import generics, permissions, status
 from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from common import mqtt
+from common.cache import invalidate_tenant
+from common.conditional import ConditionalGetMixin
+from common.exports import (
+    Sheet,
+    SpreadsheetExportMixin,
+    TemplateDownloadMixin,
+    rows_per_key,
+    workbook_bytes,
+)
+from common.viewsets import CachedListMixin
+from core import outbox
+from core.jobs import BackgroundJobMixin, set_progress
 from core.permissions import (
     IsAdminOrTourManagerOrFleetLeadOrReadOnly,
     IsAdminOrTourManagerOrReadOnly,
@@ -30,6 +41,11 @@ from passengers.serializers import (
     PassengerSerializer,
     PassengerTransferSerializer,
 )
+from passengers.services import (
+    check_import,
+    import_passengers,
+    parse_import_sheets,
+)
 from trips.models import Trip, TripBus
 
 logger = logging.getLogger(__name__)
@@ -38,46 +54,26 @@ PASSENGER_COLUMNS = ["STT", "Họ và tên", "Số điện thoại", "Thông tin
 
 
 def publish_transfer_to_mqtt(payload: dict):
-    try:
-        if not settings.MQTT_URL:
-            logger.warning("MQTT_URL not configured, skipping transfer publish")
-            return
-
-        mqtt_url = settings.MQTT_URL.replace("wss://", "").replace("ws://", "")
-        if ":" in mqtt_url:
-            host, port = mqtt_url.rsplit(":", 1)
-            port = int(port)
-        else:
-            host = mqtt_url
-            port = 8883 if settings.MQTT_URL.startswith("wss") else 1883
-
-        auth = None
-        if settings.MQTT_USERNAME and settings.MQTT_PASSWORD:
-            auth = {
-                "username": settings.MQTT_USERNAME,
-                "password": settings.MQTT_PASSWORD,
-            }
+    topic = f"passenger-transfer/{payload.get('passenger')}"
+    if mqtt.publish(topic, payload):
+        logger.info("Queued passenger transfer for MQTT topic: %s", topic)
 
-        topic = f"passenger-transfer/{payload.get('passenger')}"
 
-        publish.single(
-            topic,
-            payload=json.dumps(payload),
-            hostname=host,
-            port=port,
-            auth=auth,
-            tls={} if settings.MQTT_URL.startswith("wss") else None,
-            transport="websockets" if settings.MQTT_URL.startswith("ws") else "tcp",
-        )
-
-        logger.info("Published passenger transfer to MQTT topic: %s", topic)
-    except Exception as exc:  # pragma: no cover - defensive log
-        logger.error("Failed to publish transfer to MQTT: %s", exc)
+def transfer_outbox_message(payload: dict):
+    """Outbox counterpart of publish_transfer_to_mqtt for use inside atomic blocks."""
+    return outbox.message(
+        f"passenger-transfer/{payload.get('passenger')}",
+        payload,
+        key=f"trip:{payload.get('trip')}",
+    )
 
 
-class PassengerListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
+class PassengerListCreateView(ConditionalGetMixin, CachedListMixin, TenantScopedMixin, generics.ListCreateAPIView):
     serializer_class = PassengerSerializer
     permission_classes = [IsAdminOrTourManagerOrReadOnly]
+    conditional_related = ("bus_assignments", "bus_assignments__trip")
+    cache_list = True
+    cache_prefix = "passengers"
 
     def get_queryset(self):
         trip_id = self.request.query_params.get("trip")
@@ -130,8 +126,9 @@ class PassengerListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class PassengerDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
+class PassengerDetailView(ConditionalGetMixin, TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PassengerSerializer
+    conditional_related = ("bus_assignments", "bus_assignments__trip")
     permission_classes = [IsAdminOrTourManagerOrReadOnly]
 
     def get_queryset(self):
@@ -201,7 +198,7 @@ class PassengerDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIVi
         return super().delete(request, *args, **kwargs)
 
 
-class PassengerTransferListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
+class PassengerTransferListCreateView(ConditionalGetMixin, TenantScopedMixin, generics.ListCreateAPIView):
     serializer_class = PassengerTransferSerializer
     permission_classes = [IsAdminOrTourManagerOrFleetLeadOrReadOnly]
     pagination_class = None
@@ -251,7 +248,7 @@ class PassengerTransferListCreateView(TenantScopedMixin, generics.ListCreateAPIV
         return super().post(request, *args, **kwargs)
 
 
-class PassengerTransferDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
+class PassengerTransferDetailView(ConditionalGetMixin, TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PassengerTransferSerializer
     permission_classes = [IsAdminOrTourManagerOrFleetLeadOrReadOnly]
 
@@ -314,7 +311,7 @@ class PassengerTransferDetailView(TenantScopedMixin, generics.RetrieveUpdateDest
         return super().delete(request, *args, **kwargs)
 
 
-class PassengerAssignmentListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
+class PassengerAssignmentListCreateView(ConditionalGetMixin, TenantScopedMixin, generics.ListCreateAPIView):
     serializer_class = PassengerAssignmentSerializer
     permission_classes = [IsAdminOrTourManagerOrReadOnly]
     pagination_class = None
@@ -354,7 +351,7 @@ class PassengerAssignmentListCreateView(TenantScopedMixin, generics.ListCreateAP
         return super().post(request, *args, **kwargs)
 
 
-class PassengerAssignmentDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
+class PassengerAssignmentDetailView(ConditionalGetMixin, TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PassengerAssignmentSerializer
     permission_classes = [IsAdminOrTourManagerOrReadOnly]
 
@@ -396,6 +393,10 @@ class PassengerImportCheckView(TenantScopedMixin, APIView):
 
     @extend_schema(
         summary="Check passengers import",
+        description=(
+            "Preview an import without writing: rows whose phone belongs to an existing passenger "
+            "with a different name (conflicts) and phones repeated across the file (duplicates)."
+        ),
         tags=["Passengers"],
     )
     def post(self, request, *args, **kwargs):
@@ -413,59 +414,10 @@ class PassengerImportCheckView(TenantScopedMixin, APIView):
         except Exception as e:
             return Response({"detail": f"Error reading Excel: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        valid_passengers = []
-        conflicts = []
-
-        for sheet_name in wb.sheetnames:
-            if sheet_name == "Quản lý xe":
-                continue
-
-            ws = wb[sheet_name]
-            rows = list(ws.iter_rows(values_only=True))
-            data_rows = rows[1:] if rows else []
-
-            for row in data_rows:
-                if not row or not any(row):
-                    continue
-                name = str(row[1]).strip() if len(row) > 1 and row[1] else ""
-                phone = str(row[2]).strip() if len(row) > 2 and row[2] else ""
-                extra_info = str(row[3]).strip() if len(row) > 3 and row[3] else ""
-                note = str(row[4]).strip() if len(row) > 4 and row[4] else ""
-
-                if not name:
-                    continue
-
-                row_data = {
-                    "name": name,
-                    "phone": phone if phone.lower() != 'none' else "",
-                    "extra_info": extra_info if extra_info.lower() != 'none' else "",
-                    "note": note if note.lower() != 'none' else "",
-                    "sheet_name": sheet_name
-                }
+        return Response(check_import(tenant_id, parse_import_sheets(wb)))
+
 
-                conflict_passenger = None
-                if row_data["phone"]:
-                    conflict_passenger = Passenger.objects.filter(tenant_id=tenant_id, phone=row_data["phone"]).first()
-
-                if conflict_passenger and conflict_passenger.name != name:
-                    conflicts.append({
-                        "imported": row_data,
-                        "existing": {
-                            "id": conflict_passenger.id,
-                            "name": conflict_passenger.name,
-                            "phone": conflict_passenger.phone,
-                        }
-                    })
-                else:
-                    valid_passengers.append(row_data)
-
-        return Response({
-            "valid_passengers": valid_passengers,
-            "conflicts": conflicts
-        })
-
-
-class PassengerImportView(TenantScopedMixin, APIView):
+class PassengerImportView(BackgroundJobMixin, TenantScopedMixin, APIView):
     """POST /api/v1/passengers/import/
 
     Multipart form with:
@@ -487,6 +439,10 @@ class PassengerImportView(TenantScopedMixin, APIView):
         tags=["Passengers"],
     )
     def post(self, request, *args, **kwargs):
+        queued = self.defer_to_job(request)
+        if queued is not None:
+            return queued
+
         uploaded_file = request.FILES.get("file")
         if not uploaded_file:
             return Response({"detail": "No file provided."}, status=status.HTTP_400_BAD_REQUEST)
@@ -546,131 +502,46 @@ class PassengerImportView(TenantScopedMixin, APIView):
         except Exception as exc:
             return Response({"detail": f"Cannot read Excel file: {exc}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        result_buses = []
+        started = time.perf_counter()
+        sheets = parse_import_sheets(wb)
+        parse_ms = round((time.perf_counter() - started) * 1000, 1)
+        set_progress(30)
 
-        with transaction.atomic():
-            for seq, sheet_name in enumerate(wb.sheetnames, start=1):
-                if sheet_name == "Quản lý xe":
-                    continue
-
-                ws = wb[sheet_name]
-                rows = list(ws.iter_rows(values_only=True))
-
-                # Skip header row (first row)
-                data_rows = rows[1:] if rows else []
-
-                # Filter out truly blank rows first (rows must have a name in col 1)
-                non_empty_rows = [
-                    r for r in data_rows
-                    if r and len(r) > 1 and r[1] and str(r[1]).strip()
-                ]
-
-                # Skip sheet entirely if no passengers with a name
-                if not non_empty_rows:
-                    continue
-
-                # Get or create ImportedBus for this sheet
-                imported_bus, _ = ImportedBus.objects.get_or_create(
-                    trip=trip,
-                    sheet_name=sheet_name,
-                    defaults={"sequence": seq},
-                )
-                imported_bus.sequence = seq
-                imported_bus.save(update_fields=["sequence"])
-
-                passenger_count = 0
-                for row in non_empty_rows:
-                    # Columns: STT | Họ và tên | Số điện thoại | Ghi chú
-                    if not row or not any(row):
-                        continue
-                    name = str(row[1]).strip() if len(row) > 1 and row[1] else ""
-                    phone = str(row[2]).strip() if len(row) > 2 and row[2] else ""
-                    phone = phone if phone.lower() != 'none' else ""
-                    extra_info = str(row[3]).strip() if len(row) > 3 and row[3] else ""
-                    extra_info = extra_info if extra_info.lower() != 'none' else ""
-                    note = str(row[4]).strip() if len(row) > 4 and row[4] else ""
-                    note = note if note.lower() != 'none' else ""
-
-                    if not name:
-                        continue
-
-                    passenger = None
-                    if phone and tenant_id:
-                        passenger = Passenger.objects.filter(
-                            tenant_id=tenant_id, phone=phone, bus_assignments__trip=trip
-                        ).first()
-                    if not passenger and tenant_id:
-                        passenger = Passenger.objects.filter(
-                            tenant_id=tenant_id, name=name, bus_assignments__trip=trip
-                        ).first()
-
-                    if not passenger:
-                        passenger = Passenger.objects.create(
-                            tenant_id=tenant_id,
-                            name=name,
-                            phone=phone,
-                            extra_info=extra_info,
-                            note=note,
-                        )
-                    else:
-                        # Apply conflict resolution
-                        res = conflict_resolutions.get(phone)
-                        if res == "update" and passenger.name != name:
-                            passenger.name = name
-                            passenger.save(update_fields=["name"])
-
-                        # Update note/extra_info if provided and previously blank
-                        fields_to_update = []
-                        if note and not passenger.note:
-                            passenger.note = note
-                            fields_to_update.append("note")
-                        if extra_info and not passenger.extra_info:
-                            passenger.extra_info = extra_info
-                            fields_to_update.append("extra_info")
-
-                        if fields_to_update:
-                            passenger.save(update_fields=fields_to_update)
-
-                    # Upsert assignment to imported_bus (draft)
-                    PassengerBusAssignment.objects.update_or_create(
-                        passenger=passenger,
-                        trip=trip,
-                        defaults={"trip_bus": None, "imported_bus": imported_bus},
-                    )
-                    passenger_count += 1
-
-                result_buses.append({
-                    "id": imported_bus.id,
-                    "sheet_name": sheet_name,
-                    "sequence": seq,
-                    "passenger_count": passenger_count,
-                    "is_mapped": imported_bus.mapped_bus_id is not None,
-                })
+        result_buses, stats = import_passengers(trip, sheets, conflict_resolutions)
+        timings = {"parse_ms": parse_ms, **stats.pop("timings")}
+        timings["total_ms"] = round(sum(timings.values()), 1)
 
         return Response(
             {
                 "trip_id": trip.id,
                 "trip_name": trip.name,
                 "imported_buses": result_buses,
+                "stats": stats,
+                "timings": timings,
             },
             status=status.HTTP_201_CREATED,
         )
 
 
-class PassengerExportView(TenantScopedMixin, APIView):
+class PassengerExportView(BackgroundJobMixin, SpreadsheetExportMixin, TenantScopedMixin, APIView):
     """GET /api/v1/passengers/export/?trip=<id>
 
-    Returns a .xlsx file where each sheet is a TripBus (or ImportedBus if unmapped).
+    Returns a .xlsx file where each sheet is a TripBus (or ImportedBus if unmapped),
+    or a single CSV with a bus column for ``&format=csv``.
     """
 
     permission_classes = [permissions.IsAuthenticated]
 
     @extend_schema(
         summary="Export passengers to Excel",
-        description="Download passengers grouped by bus as sheets in a .xlsx file.",
+        description="Download passengers grouped by bus as sheets in a .xlsx file, or as CSV with ?format=csv.",
         tags=["Passengers"],
     )
     def get(self, request, *args, **kwargs):
+        queued = self.defer_to_job(request)
+        if queued is not None:
+            return queued
+
         trip_id = request.query_params.get("trip")
 
         if not trip_id:
@@ -683,104 +554,80 @@ class PassengerExportView(TenantScopedMixin, APIView):
         except Trip.DoesNotExist:
             return Response({"detail": "Trip not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        import openpyxl  # lazy import
-        wb = openpyxl.Workbook()
-        wb.remove(wb.active)  # remove default empty sheet
+        return self.export_response(
+            request,
+            f"passengers_{trip.name.replace(' ', '_')}",
+            self.export_sheets(trip),
+            sheet_column="Xe",
+        )
 
-        # --- Sheets from TripBus (mapped buses) ---
-        trip_buses = TripBus.objects.filter(trip=trip).select_related("bus").order_by("bus__registration_number")
+    def export_sheets(self, trip):
+        """One sheet per TripBus, then per unmapped ImportedBus, then the unassigned passengers.
+
+        Each kind of sheet is fed by one query ordered like the sheets and split
+        with :func:`~common.exports.rows_per_key`, so rows stream into the file and
+        neither the query count nor memory grows with the size of the trip.
+        """
+        assignments = (
+            PassengerBusAssignment.objects.filter(trip=trip)
+            .select_related("passenger")
+            .only("trip_bus_id", "imported_bus_id", "passenger__name", "passenger__phone",
+                  "passenger__extra_info", "passenger__note")
+        )
 
-        for tb in trip_buses:
+        def numbered(rows):
+            for idx, a in enumerate(rows, start=1):
+                p = a.passenger
+                yield [idx, p.name, p.phone, p.extra_info, p.note]
+
+        # --- Sheets from TripBus (mapped buses) ---
+        trip_buses = list(
+            TripBus.objects.filter(trip=trip).select_related("bus").order_by("bus__registration_number", "id")
+        )
+        by_trip_bus = rows_per_key(
+            assignments.filter(trip_bus__in=[tb.id for tb in trip_buses])
+            .order_by("trip_bus__bus__registration_number", "trip_bus_id", "passenger__name", "id"),
+            "trip_bus_id",
+            [tb.id for tb in trip_buses],
+        )
+        for tb, (_, rows) in zip(trip_buses, by_trip_bus):
             sheet_title = (
                 getattr(tb.bus, "registration_number", None)
                 or getattr(tb.bus, "bus_code", None)
                 or f"Xe {tb.id}"
             )
-            # Excel sheet names must be <= 31 chars
-            sheet_title = sheet_title[:31]
-            ws = wb.create_sheet(title=sheet_title)
-            ws.append(PASSENGER_COLUMNS)
-            ws.column_dimensions['C'].number_format = '@'
-            assignments = (
-                PassengerBusAssignment.objects.filter(trip=trip, trip_bus=tb)
-                .select_related("passenger")
-                .order_by("passenger__name")
-            )
-            for idx, a in enumerate(assignments, start=1):
-                p = a.passenger
-                row_idx = idx + 1
-                ws.append([idx, p.name, p.phone, p.extra_info, p.note])
-                ws.cell(row=row_idx, column=3).number_format = '@'
+            yield Sheet(sheet_title, PASSENGER_COLUMNS, numbered(rows), text_columns=(3,))
 
         # --- Sheets from ImportedBus (unmapped draft buses) ---
-        unmapped_buses = ImportedBus.objects.filter(
-            trip=trip, mapped_bus__isnull=True
-        ).order_by("sequence")
-
-        for ib in unmapped_buses:
-            sheet_title = ib.sheet_name[:31]
-            ws = wb.create_sheet(title=sheet_title)
-            ws.append(PASSENGER_COLUMNS)
-            ws.column_dimensions['C'].number_format = '@'
-
-            assignments = (
-                PassengerBusAssignment.objects.filter(trip=trip, imported_bus=ib)
-                .select_related("passenger")
-                .order_by("passenger__name")
-            )
-            for idx, a in enumerate(assignments, start=1):
-                p = a.passenger
-                row_idx = idx + 1
-                ws.append([idx, p.name, p.phone, p.extra_info, p.note])
-                ws.cell(row=row_idx, column=3).number_format = '@'
+        unmapped_buses = list(ImportedBus.objects.filter(trip=trip, mapped_bus__isnull=True).order_by("sequence", "id"))
+        by_imported_bus = rows_per_key(
+            assignments.filter(imported_bus__in=[ib.id for ib in unmapped_buses])
+            .order_by("imported_bus__sequence", "imported_bus_id", "passenger__name", "id"),
+            "imported_bus_id",
+            [ib.id for ib in unmapped_buses],
+        )
+        for ib, (_, rows) in zip(unmapped_buses, by_imported_bus):
+            yield Sheet(ib.sheet_name, PASSENGER_COLUMNS, numbered(rows), text_columns=(3,))
 
         # Fallback sheet for passengers with no bus assignment
         unassigned = (
-            PassengerBusAssignment.objects.filter(
-                trip=trip, trip_bus__isnull=True, imported_bus__isnull=True
-            )
-            .select_related("passenger")
-            .order_by("passenger__name")
+            assignments.filter(trip_bus__isnull=True, imported_bus__isnull=True)
+            .order_by("passenger__name", "id")
+            .iterator()
         )
-        if unassigned.exists():
-            ws = wb.create_sheet(title="Chưa gán xe")
-            ws.append(PASSENGER_COLUMNS)
-            ws.column_dimensions['C'].number_format = '@'
-            for idx, a in enumerate(unassigned, start=1):
-                p = a.passenger
-                row_idx = idx + 1
-                ws.append([idx, p.name, p.phone, p.extra_info, p.note])
-                ws.cell(row=row_idx, column=3).number_format = '@'
-
-        if not wb.sheetnames:
-            wb.create_sheet(title="Sheet1")
-
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-
-        filename = f"passengers_{trip.name.replace(' ', '_')}.xlsx"
-        response = HttpResponse(
-            buf.read(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        response["Content-Disposition"] = f'attachment; filename="{filename}"'
-        return response
+        first = next(unassigned, None)
+        if first is not None:
+            yield Sheet("Chưa gán xe", PASSENGER_COLUMNS, numbered(chain([first], unassigned)), text_columns=(3,))
 
 
-class PassengerTemplateDownloadView(APIView):
+class PassengerTemplateDownloadView(TemplateDownloadMixin, APIView):
     """GET /api/v1/passengers/import/template/"""
 
     permission_classes = [permissions.IsAuthenticated]
+    template_filename = "passenger_import_template.xlsx"
 
-    @extend_schema(
-        summary="Download passenger import template",
-        description="Download a blank .xlsx template for importing passengers.",
-        tags=["Passengers"],
-    )
-    def get(self, request, *args, **kwargs):
-        import io
-
+    @staticmethod
+    def build_template() -> bytes:
         import openpyxl
 
         wb = openpyxl.Workbook()
@@ -798,16 +645,15 @@ class PassengerTemplateDownloadView(APIView):
         for row in range(2, 500):
             ws_xe2.cell(row=row, column=3).number_format = '@'
 
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
+        return workbook_bytes(wb)
 
-        response = HttpResponse(
-            buf.read(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        response["Content-Disposition"] = 'attachment; filename="passenger_import_template.xlsx"'
-        return response
+    @extend_schema(
+        summary="Download passenger import template",
+        description="Download a blank .xlsx template for importing passengers.",
+        tags=["Passengers"],
+    )
+    def get(self, request, *args, **kwargs):
+        return self.template_response(request)
 
 
 class ImportedBusListView(TenantScopedMixin, generics.ListAPIView):
@@ -881,7 +727,8 @@ class ImportedBusMapView(TenantScopedMixin, APIView):
             # Move all passenger assignments from draft to real trip_bus
             PassengerBusAssignment.objects.filter(
                 imported_bus=imported_bus
-            ).update(trip_bus=trip_bus)
+            ).update(trip_bus=trip_bus, updated_at=timezone.now())
+            invalidate_tenant("passengers", imported_bus.trip.tenant_id)
 
         serializer = ImportedBusSerializer(imported_bus)
         return Response(serializer.data, status=status.HTTP_200_OK)
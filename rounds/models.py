@@ -1,5 +1,7 @@
 from django.db import models
 
+from common.tracking import FieldTrackerMixin
+
 
 class Round(models.Model):
     class Status(models.TextChoices):
@@ -37,7 +39,9 @@ class Round(models.Model):
         return f"{self.trip.name} - {self.name}"
 
 
-class RoundBus(models.Model):
+class RoundBus(FieldTrackerMixin, models.Model):
+    tracked_fields = ("finalized_at", "checkout_finalized_at")
+
     id = models.BigAutoField(primary_key=True)
     trip_bus = models.ForeignKey(
         "trips.TripBus",
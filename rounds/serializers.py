@@ -3,6 +3,7 @@ from rest_framework.exceptions import ValidationError
 
 from fleet.models import Bus
 from rounds.models import Round, RoundBus
+from rounds.services import ensure_round_bus_matrix
 from trips.models import TripBus
 
 
@@ -95,8 +96,8 @@ class RoundSerializer(serializers.ModelSerializer):
             RoundBus.objects.filter(round=round_obj, trip_bus_id__in=to_remove).delete()
 
         to_add = desired_ids - current_ids
-        for trip_bus_id in to_add:
-            RoundBus.objects.get_or_create(round=round_obj, trip_bus_id=trip_bus_id)
+        if to_add:
+            ensure_round_bus_matrix(round_obj.trip, round_ids=[round_obj.pk], trip_bus_ids=to_add)
 
     def create(self, validated_data):
         request = self.context.get("request") if self.context else None
@@ -0,0 +1,128 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Q, Value, When
+from django.utils import timezone
+
+from common.cache import invalidate_tenant
+from rounds.models import Round, RoundBus
+
+
+def ensure_round_bus_matrix(trip, round_ids=None, trip_bus_ids=None) -> int:
+    """Create the missing RoundBus rows of `trip` with a single INSERT; returns how many were added.
+
+    Covers every round x trip bus pair by default. Pass `round_ids` and/or
+    `trip_bus_ids` to limit it to the rows that just changed (a new round, a
+    new trip bus, the buses picked for one round).
+    """
+    from trips.models import TripBus
+
+    if round_ids is None:
+        round_ids = Round.objects.filter(trip=trip).values_list("id", flat=True)
+    if trip_bus_ids is None:
+        trip_bus_ids = TripBus.objects.filter(trip=trip).values_list("id", flat=True)
+    round_ids, trip_bus_ids = list(round_ids), list(trip_bus_ids)
+    if not round_ids or not trip_bus_ids:
+        return 0
+
+    existing = set(
+        RoundBus.objects.filter(round_id__in=round_ids, trip_bus_id__in=trip_bus_ids).values_list(
+            "round_id", "trip_bus_id"
+        )
+    )
+    missing = [
+        RoundBus(round_id=round_id, trip_bus_id=trip_bus_id)
+        for round_id in round_ids
+        for trip_bus_id in trip_bus_ids
+        if (round_id, trip_bus_id) not in existing
+    ]
+    if not missing:
+        return 0
+
+    # ignore_conflicts keeps concurrent imports from failing on unique (round, trip_bus).
+    RoundBus.objects.bulk_create(missing, batch_size=500, ignore_conflicts=True)
+    # bulk_create skips post_save, so drop cached round lists explicitly.
+    invalidate_tenant("rounds", trip.tenant_id)
+    return len(missing)
+
+
+def sync_round_progress(round_obj: Round) -> Round:
+    """Ensure round timing/status reflect finalized buses, and start the next round when this one completes.
+
+    The trip's rounds are locked first, so concurrent finalizations of
+    different buses apply the DONE / next-round transition exactly once. The
+    bus counts are read after the lock is held: subqueries of the locking
+    SELECT would see the snapshot from before the wait. All round transitions
+    are then written with a single UPDATE.
+    """
+    from trips.models import Trip
+
+    actual_time_field = Round._meta.get_field("actual_time")
+    now = timezone.now()
+
+    with transaction.atomic():
+        rounds = list(
+            Round.objects.select_for_update(of=("self",))
+            .select_related("trip")
+            .filter(trip_id=round_obj.trip_id)
+            .order_by("sequence")
+            .only("id", "sequence", "status", "actual_time", "trip__tenant_id")
+        )
+        current = next((r for r in rounds if r.pk == round_obj.pk), None)
+        if current is None:
+            return round_obj
+        tenant_id = current.trip.tenant_id
+
+        aggregates = RoundBus.objects.filter(round_id=current.pk).aggregate(
+            total=Count("id"),
+            finalized=Count("id", filter=Q(finalized_at__isnull=False)),
+            latest_finalized=Max("finalized_at"),
+        )
+        total = aggregates["total"] or 0
+        finalized = aggregates["finalized"] or 0
+        latest_finalized = aggregates["latest_finalized"]
+
+        statuses: dict = {}
+        actual_time = current.actual_time
+        finish_trip = False
+        if total and finalized == total and latest_finalized:
+            # All buses closed: mark the round done and persist the real completion time.
+            actual_time = actual_time_field.to_python(latest_finalized)
+            if current.status != Round.Status.DONE:
+                statuses[current.pk] = Round.Status.DONE
+                # If no other round is in-progress for this trip, move the next planned round into doing.
+                if not any(r.status == Round.Status.DOING for r in rounds if r.pk != current.pk):
+                    next_round = next((r for r in rounds if r.sequence > current.sequence), None)
+                    if next_round is None:
+                        finish_trip = True
+                    elif next_round.status == Round.Status.PLANNED:
+                        statuses[next_round.pk] = Round.Status.DOING
+        else:
+            # Not yet fully finalized: reflect in-progress or planned state and clear any stale time.
+            next_status = Round.Status.DOING if finalized else Round.Status.PLANNED
+            if current.status != next_status:
+                statuses[current.pk] = next_status
+            actual_time = None
+
+        updates = {}
+        if statuses:
+            updates["status"] = Case(
+                *[When(pk=pk, then=Value(value)) for pk, value in statuses.items()],
+                default=F("status"),
+            )
+        if actual_time != current.actual_time:
+            updates["actual_time"] = Case(
+                When(pk=current.pk, then=Value(actual_time, output_field=actual_time_field)),
+                default=F("actual_time"),
+            )
+        if updates:
+            # update() skips auto_now; bump updated_at so ETag / Last-Modified validators change.
+            Round.objects.filter(pk__in={current.pk, *statuses}).update(**updates, updated_at=now)
+            invalidate_tenant("rounds", tenant_id)
+        if finish_trip:
+            Trip.objects.filter(pk=round_obj.trip_id).update(status=Trip.Status.DONE, updated_at=now)
+            invalidate_tenant("trips", tenant_id)
+
+    if updates:
+        round_obj.status = statuses.get(current.pk, current.status)
+        round_obj.actual_time = actual_time
+        round_obj.updated_at = now
+    return round_obj
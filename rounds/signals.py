@@ -1,7 +1,12 @@
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
-from notifications.services import notify_users_by_role
+from common.cache import register_cache_invalidation
+from common.signals import defer, track_previous_values
+from notifications.services import queue_role_notification
+
+register_cache_invalidation("rounds.Round", ("rounds",), "trip__tenant_id")
+register_cache_invalidation("rounds.RoundBus", ("rounds",), "round__trip__tenant_id")
 
 
 @receiver(post_save, sender="rounds.Round")
@@ -10,15 +15,15 @@ def create_round_buses_for_round(sender, instance, created, **kwargs):
     if not created:
         return
 
-    from rounds.models import RoundBus
-    from trips.models import TripBus
+    from rounds.services import ensure_round_bus_matrix
 
-    trip_buses = TripBus.objects.filter(trip=instance.trip)
-    for tb in trip_buses:
-        RoundBus.objects.get_or_create(
-            trip_bus=tb,
-            round=instance,
-        )
+    trip = instance.trip
+    # Inside batched_signals() all new rounds of the trip are synced in one go on exit.
+    defer(
+        ("round-bus-matrix", "round", trip.pk),
+        instance.pk,
+        lambda round_ids: ensure_round_bus_matrix(trip, round_ids=round_ids),
+    )
 
 
 @receiver(post_save, sender="trips.Trip")
@@ -29,32 +34,18 @@ def create_initial_round_for_trip(sender, instance, created, **kwargs):
 
 @receiver(pre_save, sender="rounds.RoundBus")
 def round_bus_pre_save(sender, instance, **kwargs):
-    if instance.pk:
-        from .models import RoundBus
-        try:
-            old_instance = RoundBus.objects.get(pk=instance.pk)
-            instance._old_finalized_at = old_instance.finalized_at
-            instance._old_checkout_finalized_at = old_instance.checkout_finalized_at
-        except RoundBus.DoesNotExist:
-            instance._old_finalized_at = None
-            instance._old_checkout_finalized_at = None
-    else:
-        instance._old_finalized_at = None
-        instance._old_checkout_finalized_at = None
+    track_previous_values(instance, "round_id", ("finalized_at", "checkout_finalized_at"))
 
 
 @receiver(post_save, sender="rounds.RoundBus")
 def round_bus_post_save(sender, instance, created, **kwargs):
-    old_finalized_at = getattr(instance, '_old_finalized_at', None)
-    old_checkout_finalized_at = getattr(instance, '_old_checkout_finalized_at', None)
-
     manager = instance.trip_bus.manager
     manager_name = manager.name if manager else "Ai đó"
     bus_reg = instance.trip_bus.bus.registration_number
     tenant_id = instance.round.trip.tenant_id
 
-    if instance.finalized_at and not old_finalized_at:
-        notify_users_by_role(
+    if instance.finalized_at and instance.has_changed("finalized_at"):
+        queue_role_notification(
             tenant_id=tenant_id,
             roles=['tour_manager'],
             title="Chốt sổ điểm danh lên xe",
@@ -63,8 +54,8 @@ def round_bus_post_save(sender, instance, created, **kwargs):
             reference_id=str(instance.round.id)
         )
 
-    if instance.checkout_finalized_at and not old_checkout_finalized_at:
-        notify_users_by_role(
+    if instance.checkout_finalized_at and instance.has_changed("checkout_finalized_at"):
+        queue_role_notification(
             tenant_id=tenant_id,
             roles=['tour_manager'],
             title="Chốt sổ điểm danh xuống xe",
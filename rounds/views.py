@@ -1,12 +1,21 @@
-import json
 import logging
 
-import paho.mqtt.publish as publish
-from django.conf import settings
-from django.db.models import Count, Max, Q
+from django.utils import timezone
 from drf_spectacular.utils import extend_schema
 from rest_framework import generics, permissions, status
 
+from common import mqtt
+from common.cache import invalidate_tenant
+from common.conditional import ConditionalGetMixin
+from common.exports import (
+    Sheet,
+    SpreadsheetExportMixin,
+    TemplateDownloadMixin,
+    workbook_bytes,
+)
+from common.signals import batched_signals
+from common.viewsets import CachedListMixin, CachedRetrieveMixin
+from core.jobs import BackgroundJobMixin
 from core.permissions import (
     IsAdminOrTourManagerOrFleetLeadOrReadOnly,
     IsAdminOrTourManagerOrReadOnly,
@@ -14,113 +23,15 @@ from core.permissions import (
 )
 from rounds.models import Round, RoundBus
 from rounds.serializers import RoundBusSerializer, RoundSerializer
+from rounds.services import ensure_round_bus_matrix, sync_round_progress
 
 logger = logging.getLogger(__name__)
 
 
 def publish_round_finalize_to_mqtt(payload: dict):
-    try:
-        if not settings.MQTT_URL:
-            logger.warning("MQTT_URL not configured, skipping round finalize publish")
-            return
-
-        mqtt_url = settings.MQTT_URL.replace("wss://", "").replace("ws://", "")
-        if ":" in mqtt_url:
-            host, port = mqtt_url.rsplit(":", 1)
-            port = int(port)
-        else:
-            host = mqtt_url
-            port = 8883 if settings.MQTT_URL.startswith("wss") else 1883
-
-        auth = None
-        if settings.MQTT_USERNAME and settings.MQTT_PASSWORD:
-            auth = {
-                "username": settings.MQTT_USERNAME,
-                "password": settings.MQTT_PASSWORD,
-            }
-
-        topic = f"round-finalize/{payload.get('round_bus')}"
-
-        publish.single(
-            topic,
-            payload=json.dumps(payload),
-            hostname=host,
-            port=port,
-            auth=auth,
-            tls={} if settings.MQTT_URL.startswith("wss") else None,
-            transport="websockets" if settings.MQTT_URL.startswith("ws") else "tcp",
-        )
-
-        logger.info("Published round finalize to MQTT topic: %s", topic)
-    except Exception as exc:  # pragma: no cover - defensive log
-        logger.error("Failed to publish round finalize to MQTT: %s", exc)
-
-
-def sync_round_progress(round_obj: Round, *, prev_status: str | None = None) -> Round:
-    """Ensure round timing/status reflect finalized buses, and start the next round when this one completes."""
-
-    aggregates = round_obj.round_buses.aggregate(
-        total=Count("id"),
-        finalized=Count("id", filter=Q(finalized_at__isnull=False)),
-        latest_finalized=Max("finalized_at"),
-    )
-
-    total = aggregates.get("total") or 0
-    finalized = aggregates.get("finalized") or 0
-    latest_finalized = aggregates.get("latest_finalized")
-
-    updates: dict = {}
-
-    status_changed_to_done = False
-
-    if total and finalized == total and latest_finalized:
-        # All buses closed: mark the round done and persist the real completion time.
-        if round_obj.actual_time != latest_finalized:
-            updates["actual_time"] = latest_finalized
-        if round_obj.status != Round.Status.DONE:
-            updates["status"] = Round.Status.DONE
-            status_changed_to_done = prev_status != Round.Status.DONE
-    else:
-        # Not yet fully finalized: reflect in-progress or planned state and clear any stale time.
-        next_status = Round.Status.DOING if finalized else Round.Status.PLANNED
-        if round_obj.status != next_status:
-            updates["status"] = next_status
-        if round_obj.actual_time is not None:
-            updates["actual_time"] = None
-
-    if updates:
-        Round.objects.filter(pk=round_obj.pk).update(**updates)
-        for field, value in updates.items():
-            setattr(round_obj, field, value)
-
-    if status_changed_to_done:
-        # If no other round is in-progress for this trip, move the next planned round into doing.
-        has_doing = (
-            Round.objects.filter(
-                trip=round_obj.trip,
-                status=Round.Status.DOING,
-            )
-            .exclude(pk=round_obj.pk)
-            .exists()
-        )
-
-        if not has_doing:
-            next_round = (
-                Round.objects.filter(
-                    trip=round_obj.trip,
-                    sequence__gt=round_obj.sequence,
-                )
-                .order_by("sequence")
-                .first()
-            )
-            if next_round and next_round.status == Round.Status.PLANNED:
-                Round.objects.filter(pk=next_round.pk).update(status=Round.Status.DOING)
-                next_round.status = Round.Status.DOING
-            elif not next_round:
-                from trips.models import Trip
-                Trip.objects.filter(pk=round_obj.trip_id).update(status=Trip.Status.DONE)
-
-    return round_obj
+    topic = f"round-finalize/{payload.get('round_bus')}"
+    if mqtt.publish(topic, payload):
+        logger.info("Queued round finalize for MQTT topic: %s", topic)
 
 
 class RoundReorderView(generics.GenericAPIView):
@@ -186,15 +97,21 @@ class RoundReorderView(generics.GenericAPIView):
             for item in planned_items_to_update:
                 rid = item.get("id")
                 new_seq = item.get("sequence")
-                Round.objects.filter(pk=rid).update(sequence=new_seq)
+                Round.objects.filter(pk=rid).update(sequence=new_seq, updated_at=timezone.now())
+
+            if planned_items_to_update:
+                invalidate_tenant("rounds", rounds_qs.first().trip.tenant_id)
 
         return Response({"detail": "Reordered successfully."}, status=status.HTTP_200_OK)
 
 
-class RoundListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
+class RoundListCreateView(ConditionalGetMixin, CachedListMixin, TenantScopedMixin, generics.ListCreateAPIView):
 
     serializer_class = RoundSerializer
     permission_classes = [IsAdminOrTourManagerOrReadOnly]
+    conditional_related = ("round_buses", "round_buses__trip_bus")
+    cache_list = True
+    cache_prefix = "rounds"
 
     def get_queryset(self):
         qs = Round.objects.select_related("trip").prefetch_related(
@@ -233,9 +150,12 @@ class RoundListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
         return response
 
 
-class RoundDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
+class RoundDetailView(CachedRetrieveMixin, TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = RoundSerializer
     permission_classes = [IsAdminOrTourManagerOrReadOnly]
+    cache_retrieve = True
+    cache_prefix = "rounds"
+    cache_tenant_field = "trip__tenant_id"
 
     def get_queryset(self):
         qs = Round.objects.select_related("trip").prefetch_related(
@@ -296,7 +216,7 @@ class RoundDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
-class RoundBusListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
+class RoundBusListCreateView(ConditionalGetMixin, TenantScopedMixin, generics.ListCreateAPIView):
     serializer_class = RoundBusSerializer
     permission_classes = [IsAdminOrTourManagerOrReadOnly]
 
@@ -336,10 +256,10 @@ class RoundBusListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
 
     def perform_create(self, serializer):
         obj = serializer.save()
-        sync_round_progress(obj.round, prev_status=obj.round.status)
+        sync_round_progress(obj.round)
 
 
-class RoundBusDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
+class RoundBusDetailView(ConditionalGetMixin, TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = RoundBusSerializer
     permission_classes = [IsAdminOrTourManagerOrFleetLeadOrReadOnly]
 
@@ -388,10 +308,8 @@ class RoundBusDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIVie
     def perform_update(self, serializer):
         prev_finalized_at = getattr(serializer.instance, "finalized_at", None)
         prev_checkout_finalized_at = getattr(serializer.instance, "checkout_finalized_at", None)
-        round_obj = serializer.instance.round
-        prev_round_status = getattr(round_obj, "status", None)
         obj = serializer.save()
-        sync_round_progress(obj.round, prev_status=prev_round_status)
+        sync_round_progress(obj.round)
         if prev_finalized_at != obj.finalized_at or prev_checkout_finalized_at != obj.checkout_finalized_at:
             payload = {
                 "round_bus": obj.id,
@@ -410,15 +328,14 @@ class RoundBusDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIVie
 
     def perform_destroy(self, instance):
         round_obj = instance.round
-        prev_round_status = getattr(round_obj, "status", None)
         super().perform_destroy(instance)
-        sync_round_progress(round_obj, prev_status=prev_round_status)
+        sync_round_progress(round_obj)
 
 
 ROUND_COLUMNS = ["STT", "Tên chặng", "Địa điểm", "Thời gian đến dự kiến (DD/MM/YYYY HH:MM)", "Thứ tự"]
 
 
-class RoundImportView(TenantScopedMixin, generics.GenericAPIView):
+class RoundImportView(BackgroundJobMixin, TenantScopedMixin, generics.GenericAPIView):
     """POST /api/v1/rounds/import/?trip=<trip_id>"""
 
     permission_classes = [permissions.IsAuthenticated]
@@ -432,6 +349,10 @@ class RoundImportView(TenantScopedMixin, generics.GenericAPIView):
         tags=["Rounds"],
     )
     def post(self, request, *args, **kwargs):  # noqa: C901
+        queued = self.defer_to_job(request)
+        if queued is not None:
+            return queued
+
         from rest_framework.response import Response
 
         trip_id = request.query_params.get("trip")
@@ -553,7 +474,8 @@ class RoundImportView(TenantScopedMixin, generics.GenericAPIView):
                 status=status.HTTP_409_CONFLICT
             )
 
-        with transaction.atomic():
+        # New rounds get their RoundBus rows in one INSERT when the batch exits, not one per row.
+        with transaction.atomic(), batched_signals():
             # Sắp xếp theo ngày rồi theo thứ tự nhập
             parsed_rounds.sort(key=lambda x: (x["round_date"], x["raw_seq"]))
 
@@ -571,6 +493,7 @@ class RoundImportView(TenantScopedMixin, generics.GenericAPIView):
                 r.save(update_fields=["sequence"])
 
             processed_round_ids = set()
+            created_round_ids = []
             for r_data in parsed_rounds:
                 name = r_data["name"]
                 location = r_data["location"]
@@ -610,6 +533,7 @@ class RoundImportView(TenantScopedMixin, generics.GenericAPIView):
                         status=Round.Status.PLANNED
                     )
                     processed_round_ids.add(new_r.id)
+                    created_round_ids.append(new_r.id)
                     imported_count += 1
 
             # Re-normalize sequences for leftovers
@@ -624,23 +548,30 @@ class RoundImportView(TenantScopedMixin, generics.GenericAPIView):
                 r.sequence = max_seq_by_date[r.round_date]
                 r.save(update_fields=["sequence"])
 
+            # Only the rounds created here; existing rounds keep the buses they were given.
+            ensure_round_bus_matrix(trip, round_ids=created_round_ids)
+
         if imported_count == 0 and action == "skip":
             return Response({"detail": "Đã bỏ qua các chặng trùng lặp. Không có chặng mới nào được cập nhật."}, status=status.HTTP_201_CREATED)
 
         return Response({"detail": f"Đã import thành công {imported_count} chặng."}, status=status.HTTP_201_CREATED)
 
 
-class RoundExportView(TenantScopedMixin, generics.GenericAPIView):
+class RoundExportView(BackgroundJobMixin, SpreadsheetExportMixin, TenantScopedMixin, generics.GenericAPIView):
     """GET /api/v1/rounds/export/?trip=<trip_id>"""
 
     permission_classes = [permissions.IsAuthenticated]
 
     @extend_schema(
         summary="Export rounds to Excel",
-        description="Download all rounds for a trip as a .xlsx file.",
+        description="Download all rounds for a trip as a .xlsx file, or as CSV with ?format=csv.",
         tags=["Rounds"],
     )
     def get(self, request, *args, **kwargs):
+        queued = self.defer_to_job(request)
+        if queued is not None:
+            return queued
+
         from rest_framework.response import Response
 
         trip_id = request.query_params.get("trip")
@@ -655,43 +586,43 @@ class RoundExportView(TenantScopedMixin, generics.GenericAPIView):
         except Trip.DoesNotExist:
             return Response({"detail": "Trip not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        import io
-
-        import openpyxl
-        from django.http import HttpResponse
+        def rows():
+            rounds = Round.objects.filter(trip=trip).order_by("sequence")
+            for idx, rnd in enumerate(rounds.iterator(), start=1):
+                estimate_time_str = rnd.estimate_time.strftime("%d/%m/%Y %H:%M") if rnd.estimate_time else ""
+                yield [idx, rnd.name, rnd.location, estimate_time_str, rnd.sequence]
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Rounds"
-        ws.append(ROUND_COLUMNS)
-
-        rounds = Round.objects.filter(trip=trip).order_by("sequence")
-        for idx, rnd in enumerate(rounds, start=1):
-            estimate_time_str = rnd.estimate_time.strftime("%d/%m/%Y %H:%M") if rnd.estimate_time else ""
-            ws.append([
-                idx,
-                rnd.name,
-                rnd.location,
-                estimate_time_str,
-                rnd.sequence
-            ])
-
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-
-        response = HttpResponse(
-            buf.read(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        return self.export_response(
+            request, f"rounds_{trip.name.replace(' ', '_')}", [Sheet("Rounds", ROUND_COLUMNS, rows())]
         )
-        response["Content-Disposition"] = f'attachment; filename="rounds_{trip.name.replace(" ", "_")}.xlsx"'
-        return response
 
 
-class RoundTemplateDownloadView(generics.GenericAPIView):
+class RoundTemplateDownloadView(TemplateDownloadMixin, generics.GenericAPIView):
     """GET /api/v1/rounds/import/template/"""
 
     permission_classes = [permissions.IsAuthenticated]
+    template_filename = "round_import_template.xlsx"
+
+    @staticmethod
+    def build_template(start_date, end_date) -> bytes:
+        from datetime import timedelta
+
+        import openpyxl
+
+        wb = openpyxl.Workbook()
+        # Remove default sheet
+        wb.remove(wb.active)
+
+        # Calculate days
+        num_days = (end_date - start_date).days + 1
+        for i in range(num_days):
+            current_date = start_date + timedelta(days=i)
+            sheet_name = current_date.strftime("%d-%m-%Y")
+            ws = wb.create_sheet(title=sheet_name)
+            ws.append(ROUND_COLUMNS)
+            ws.append([1, "Tập trung và xuất phát", "", "", 1])
+
+        return workbook_bytes(wb)
 
     @extend_schema(
         summary="Download round import template",
@@ -714,35 +645,8 @@ class RoundTemplateDownloadView(generics.GenericAPIView):
             from rest_framework.response import Response
             return Response({"detail": "Không tìm thấy chuyến đi."}, status=status.HTTP_404_NOT_FOUND)
 
-        import io
-        from datetime import timedelta
-
-        import openpyxl
-        from django.http import HttpResponse
-
-        wb = openpyxl.Workbook()
-        # Remove default sheet
-        wb.remove(wb.active)
-
-        # Calculate days
-        num_days = (trip.end_date - trip.start_date).days + 1
-        for i in range(num_days):
-            current_date = trip.start_date + timedelta(days=i)
-            sheet_name = current_date.strftime("%d-%m-%Y")
-            ws = wb.create_sheet(title=sheet_name)
-            ws.append(ROUND_COLUMNS)
-            ws.append([1, "Tập trung và xuất phát", "", "", 1])
-
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-
-        response = HttpResponse(
-            buf.read(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        response["Content-Disposition"] = 'attachment; filename="round_import_template.xlsx"'
-        return response
+        # The template only depends on the trip's days, so trips sharing a date range share the bytes.
+        return self.template_response(request, trip.start_date, trip.end_date)
 
 
 class RoundBulkDeleteView(RoundListCreateView):
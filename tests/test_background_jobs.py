@@ -0,0 +1,115 @@
+import io
+
+import openpyxl
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from core.models import Job
+from fleet.models import Bus
+from passengers.models import Passenger
+from trips.models import Trip
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
+@pytest.fixture(autouse=True)
+def keep_test_connection(monkeypatch):
+    # On PostgreSQL closing the test's transactional connection breaks every later query.
+    def close():
+        raise AssertionError("the worker closed the caller's connection")
+
+    monkeypatch.setattr(connection, "close", close)
+
+
+@pytest.fixture
+def trip(db):
+    tenant = Tenant.objects.create(name="Jobs Tenant")
+    return Trip.objects.create(name="Trip", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant)
+
+
+@pytest.fixture
+def user(trip):
+    return User.objects.create_user(username="ops", email="ops@example.com", password="x", tenant=trip.tenant)
+
+
+@pytest.fixture
+def api_client(user):
+    api = APIClient()
+    api.force_authenticate(user=user)
+    return api
+
+
+def passenger_workbook():
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Xe 1"
+    ws.append(["STT", "Họ và tên", "Số điện thoại", "Thông tin thêm", "Ghi chú"])
+    ws.append([1, "An", "0900000001", "", ""])
+    ws.append([2, "Bình", "0900000002", "", ""])
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    buf.name = "passengers.xlsx"
+    return buf
+
+
+def run_workers():
+    call_command("run_workers", "--once", stdout=io.StringIO())
+
+
+def test_import_runs_off_request_and_reports_result(trip, api_client):
+    resp = api_client.post(
+        reverse("passenger-import") + "?async=1",
+        {"file": passenger_workbook(), "trip_id": str(trip.id)},
+        format="multipart",
+    )
+    assert resp.status_code == 202
+    assert not Passenger.objects.exists()
+
+    status_url = resp.data["status_url"]
+    assert api_client.get(status_url).data["status"] == Job.Status.QUEUED
+
+    run_workers()
+
+    job = api_client.get(status_url).data
+    assert job["status"] == Job.Status.SUCCEEDED
+    assert job["progress"] == 100
+    assert job["result"]["imported_buses"][0]["passenger_count"] == 2
+    assert Passenger.objects.filter(tenant=trip.tenant).count() == 2
+
+
+def test_export_result_file_is_downloadable_by_owner_only(trip, api_client):
+    Bus.objects.create(registration_number="51B-12345", bus_code="B1", capacity=45, tenant=trip.tenant)
+
+    resp = api_client.get(reverse("bus-export"), {"async": 1})
+    assert resp.status_code == 202
+    run_workers()
+
+    job = api_client.get(resp.data["status_url"]).data
+    assert job["status"] == Job.Status.SUCCEEDED
+    download = api_client.get(job["download_url"])
+    assert download.status_code == 200
+    assert download["Content-Disposition"].endswith('filename="buses.xlsx"')
+    ws = openpyxl.load_workbook(io.BytesIO(b"".join(download.streaming_content))).active
+    assert ws.cell(row=2, column=2).value == "51B-12345"
+
+    stranger = User.objects.create_user(username="other", email="other@example.com", password="x", tenant=trip.tenant)
+    other = APIClient()
+    other.force_authenticate(user=stranger)
+    assert other.get(resp.data["status_url"]).status_code == 404
+
+
+def test_failed_view_marks_job_failed(trip, api_client):
+    resp = api_client.post(reverse("passenger-import") + "?async=1", {"trip_id": "999999"}, format="multipart")
+    run_workers()
+
+    job = api_client.get(resp.data["status_url"]).data
+    assert job["status"] == Job.Status.FAILED
+    assert job["error"] == "No file provided."
@@ -0,0 +1,76 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Tenant, User
+from common.signals import batched_signals
+from fleet.models import Bus
+from notifications.models import Notification
+from rounds.models import Round, RoundBus
+from trips.models import Trip, TripBus
+
+
+@pytest.fixture
+def trip(db):
+    tenant = Tenant.objects.create(name="Batch Tenant")
+    trip = Trip.objects.create(name="Đà Lạt", start_date="2026-05-01", end_date="2026-05-03", tenant=tenant)
+    for i in range(5):
+        bus = Bus.objects.create(registration_number=f"51B-6{i:04d}", bus_code=f"S{i}", capacity=45, tenant=tenant)
+        TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+    return trip
+
+
+@pytest.fixture
+def lead(trip):
+    return User.objects.create_user(
+        username="lead", email="lead@example.com", password="x", tenant=trip.tenant, name="Lead"
+    )
+
+
+def tripbus_selects(queries):
+    return [q for q in queries if q["sql"].startswith("SELECT") and '"trips_tripbus"' in q["sql"].split("FROM")[1]]
+
+
+def test_batch_reads_previous_values_once_and_coalesces_notifications(trip, lead):
+    trip_buses = list(TripBus.objects.filter(trip=trip).select_related("bus", "trip"))
+
+    with CaptureQueriesContext(connection) as queries, batched_signals():
+        for trip_bus in trip_buses:
+            trip_bus.manager = lead
+            trip_bus.save(update_fields=["manager"])
+        assert not Notification.objects.filter(user=lead).exists()
+
+    # Previous values come from the loaded instances, not from a re-read.
+    assert tripbus_selects(queries) == []
+    notification = Notification.objects.get(user=lead)
+    assert notification.title == "Phân công trưởng xe"
+    assert notification.message.count("\n") == len(trip_buses) - 1
+    assert notification.reference_id == str(trip.id)
+
+    # Saving again without a change does not notify.
+    with batched_signals():
+        trip_buses[0].save()
+    assert Notification.objects.filter(user=lead).count() == 1
+
+
+def test_new_rounds_get_round_buses_on_exit(trip):
+    with batched_signals():
+        rounds = [Round.objects.create(trip=trip, name=f"R{i}", location="A", sequence=i) for i in range(1, 4)]
+        assert not RoundBus.objects.filter(round__in=rounds).exists()
+    assert RoundBus.objects.filter(round__in=rounds).count() == 3 * 5
+
+
+def test_failed_batch_drops_deferred_work(trip, lead):
+    trip_bus = TripBus.objects.filter(trip=trip).first()
+    with pytest.raises(RuntimeError), batched_signals():
+        trip_bus.manager = lead
+        trip_bus.save()
+        raise RuntimeError("import aborted")
+    assert not Notification.objects.filter(user=lead).exists()
+
+
+def test_single_saves_outside_a_batch_are_unchanged(trip, lead):
+    trip_bus = TripBus.objects.filter(trip=trip).first()
+    trip_bus.manager = lead
+    trip_bus.save()
+    assert Notification.objects.filter(user=lead, title="Phân công trưởng xe").count() == 1
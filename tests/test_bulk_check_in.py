@@ -0,0 +1,90 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from core.models import OutboxMessage
+from fleet.models import Bus
+from passengers.models import Passenger
+from rounds.models import Round, RoundBus
+from transactions.models import Transaction
+from trips.models import Trip, TripBus
+
+
+@pytest.fixture
+def roster(db):
+    tenant = Tenant.objects.create(name="Check-in Tenant")
+    trip = Trip.objects.create(
+        name="Trip", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant
+    )
+    buses = [
+        Bus.objects.create(registration_number=f"51B-0000{i}", bus_code=f"B{i}", capacity=45, tenant=tenant)
+        for i in range(2)
+    ]
+    trip_buses = [
+        TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="") for bus in buses
+    ]
+    rnd = Round.objects.create(trip=trip, name="R1", location="A", sequence=1)
+    round_buses = [RoundBus.objects.get(round=rnd, trip_bus=tb) for tb in trip_buses]
+    passengers = [Passenger.objects.create(tenant=tenant, name=f"P{i}") for i in range(40)]
+
+    user = User.objects.create_user(
+        username="lead", email="lead@example.com", password="x", tenant=tenant, is_staff=True
+    )
+    api = APIClient()
+    api.force_authenticate(user=user)
+    return api, round_buses, passengers
+
+
+def test_bulk_check_in_reports_per_passenger_results(roster, django_capture_on_commit_callbacks):
+    api, (round_bus, other_bus), passengers = roster
+    already_on_other_bus = passengers[0]
+    Transaction.objects.create(passenger=already_on_other_bus, round_bus=other_bus, check_in=timezone.now())
+
+    payload = {
+        "round_bus": round_bus.id,
+        "passenger_ids": [p.id for p in passengers] + [passengers[1].id, 999999],
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        with CaptureQueriesContext(connection) as queries:
+            resp = api.post(reverse("transaction-bulk-check-in"), payload, format="json")
+
+    assert resp.status_code == 200
+    assert resp.data["created"] == 39
+    assert resp.data["conflicts"] == 1
+
+    results = {r["passenger"]: r for r in resp.data["results"]}
+    assert len(resp.data["results"]) == 41
+    assert results[already_on_other_bus.id]["status"] == "conflict"
+    assert "51B-00001" in results[already_on_other_bus.id]["detail"]
+    assert results[999999]["status"] == "not_found"
+    assert results[passengers[5].id]["status"] == "created"
+
+    assert Transaction.objects.filter(round_bus=round_bus).count() == 39
+    assert OutboxMessage.objects.count() == 39
+    # The roster size must not drive the number of queries.
+    assert len(queries) < 15
+
+
+def test_bulk_check_in_requires_round_bus_and_passengers(roster):
+    api, _, _ = roster
+    resp = api.post(reverse("transaction-bulk-check-in"), {"passenger_ids": [1]}, format="json")
+    assert resp.status_code == 400
+
+    resp = api.post(reverse("transaction-bulk-check-in"), {"round_bus": 999999, "passenger_ids": [1]}, format="json")
+    assert resp.status_code == 404
+
+
+@pytest.mark.parametrize("passenger_ids", ["123", {"1": 2}, [1, "x"], 5])
+def test_bulk_check_in_rejects_anything_but_a_list_of_ids(roster, passenger_ids):
+    api, (round_bus, _), _ = roster
+    resp = api.post(
+        reverse("transaction-bulk-check-in"),
+        {"round_bus": round_bus.id, "passenger_ids": passenger_ids},
+        format="json",
+    )
+    assert resp.status_code == 400
+    assert not Transaction.objects.filter(round_bus=round_bus).exists()
@@ -0,0 +1,93 @@
+import pytest
+from django.core.cache import cache
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from accounts.models import Tenant, User
+from common.cache import cache_stats
+from common.viewsets import CachedModelViewSet
+from core.permissions import TenantScopedMixin
+from fleet.models import Bus
+
+
+class BusSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Bus
+        fields = ["id", "registration_number", "bus_code", "capacity", "tenant"]
+
+
+class BusCachedViewSet(TenantScopedMixin, CachedModelViewSet):
+    serializer_class = BusSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        return self.apply_tenant_filter(Bus.objects.all(), "tenant_id")
+
+
+@pytest.fixture
+def locmem_cache(settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+@pytest.fixture
+def tenants(db):
+    users = []
+    for name in ("A", "B"):
+        tenant = Tenant.objects.create(name=f"Tenant {name}")
+        Bus.objects.create(registration_number=f"51B-{name}", bus_code=f"BUS-{name}", capacity=45, tenant=tenant)
+        users.append(
+            User.objects.create_user(
+                username=f"user{name}", email=f"{name}@example.com", password="x", tenant=tenant, is_staff=True
+            )
+        )
+    return users
+
+
+def _list(user):
+    request = APIRequestFactory().get("/buses/")
+    force_authenticate(request, user=user)
+    return BusCachedViewSet.as_view({"get": "list"}, basename="bus-cache-test")(request)
+
+
+def _create(user, **data):
+    request = APIRequestFactory().post("/buses/", data, format="json")
+    force_authenticate(request, user=user)
+    return BusCachedViewSet.as_view({"post": "create"}, basename="bus-cache-test")(request)
+
+
+def test_write_only_invalidates_owning_tenant(locmem_cache, tenants, django_capture_on_commit_callbacks):
+    user_a, user_b = tenants
+    assert len(_list(user_a).data["data"]) == 1
+    assert len(_list(user_b).data["data"]) == 1
+    cache.set("unrelated-key", "keep", None)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = _create(user_a, registration_number="51B-A2", bus_code="BUS-A2", capacity=30, tenant=user_a.tenant_id)
+    assert resp.status_code == 201
+
+    # Tenant A sees the new bus, tenant B is still served from cache, other keys survive.
+    assert len(_list(user_a).data["data"]) == 2
+    assert len(_list(user_b).data["data"]) == 1
+    assert cache.get("unrelated-key") == "keep"
+
+    stats = cache_stats()["bus-cache-test"]
+    assert stats == {"hits": 1, "misses": 3, "invalidations": 2}
+
+
+def test_list_cache_key_tracks_query_params(locmem_cache, tenants):
+    user_a, _ = tenants
+    view = BusCachedViewSet()
+    factory = APIRequestFactory()
+
+    def key(query):
+        request = Request(factory.get("/buses/", query))
+        request.user = user_a
+        return view.list_cache_key(request)
+
+    assert key({"page": 1, "limit": 10}) == key({"limit": 10, "page": 1})
+    assert key({"page": 1}) != key({"page": 2})
+    assert key({"page": 1, "search": ""}) == key({"page": 1})
@@ -0,0 +1,76 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from fleet.models import Bus
+from passengers.models import Passenger, PassengerBusAssignment
+from trips.models import Trip, TripBus
+
+
+@pytest.fixture
+def trip(db):
+    tenant = Tenant.objects.create(name="Conditional Tenant")
+    trip = Trip.objects.create(name="Trip", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant)
+    for i in range(3):
+        passenger = Passenger.objects.create(tenant=tenant, name=f"P{i}")
+        PassengerBusAssignment.objects.create(passenger=passenger, trip=trip)
+    return trip
+
+
+@pytest.fixture
+def api_client(trip):
+    user = User.objects.create_user(
+        username="manager", email="manager@example.com", password="x", tenant=trip.tenant, is_staff=True
+    )
+    api = APIClient()
+    api.force_authenticate(user=user)
+    return api
+
+
+def test_passenger_list_answers_304_until_data_changes(trip, api_client, django_assert_max_num_queries):
+    url = reverse("passenger-list-create")
+    first = api_client.get(url, {"trip": trip.id})
+    assert first.status_code == 200
+    etag = first["ETag"]
+    # max(updated_at) does not move when a passenger leaves the list, so lists rely on the ETag alone.
+    assert not first.has_header("Last-Modified")
+
+    with django_assert_max_num_queries(2):
+        resp = api_client.get(url, {"trip": trip.id}, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 304
+
+    # A different page or filter never matches the same validator.
+    assert api_client.get(url, {"trip": trip.id, "page": 1}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    # Touching a nested assignment changes the validator.
+    PassengerBusAssignment.objects.first().save()
+    assert api_client.get(url, {"trip": trip.id}, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_trip_bus_detail_tracks_nested_bus(trip, api_client):
+    bus = Bus.objects.create(registration_number="51B-11111", bus_code="X1", capacity=45, tenant=trip.tenant)
+    trip_bus = TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+    url = reverse("tripbus-detail", args=[trip_bus.id])
+
+    etag = api_client.get(url)["ETag"]
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    bus.registration_number = "51B-22222"
+    bus.save()
+    resp = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp.data["registration_number"] == "51B-22222"
+
+
+def test_last_modified_only_on_plain_details(trip, api_client):
+    assignment = PassengerBusAssignment.objects.first()
+    detail = api_client.get(reverse("passenger-assignment-detail", args=[assignment.id]))
+    assert detail.status_code == 200
+    assert detail["Last-Modified"]
+
+    bus = Bus.objects.create(registration_number="51B-33333", bus_code="X3", capacity=45, tenant=trip.tenant)
+    trip_bus = TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+    nested = api_client.get(reverse("tripbus-detail", args=[trip_bus.id]))
+    assert nested.status_code == 200
+    assert not nested.has_header("Last-Modified")
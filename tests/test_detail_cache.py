@@ -0,0 +1,65 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from trips.models import Trip
+
+
+@pytest.fixture
+def locmem_cache(settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+@pytest.fixture
+def clients(db):
+    result = []
+    for name in ("A", "B"):
+        tenant = Tenant.objects.create(name=f"Tenant {name}")
+        trip = Trip.objects.create(name=f"Trip {name}", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant)
+        user = User.objects.create_user(
+            username=f"manager{name}", email=f"{name}@example.com", password="x", tenant=tenant, is_staff=True
+        )
+        api = APIClient()
+        api.force_authenticate(user=user)
+        result.append((api, trip))
+    return result
+
+
+def test_trip_detail_is_cached_per_tenant(locmem_cache, clients):
+    (api_a, trip_a), (api_b, _) = clients
+    url = reverse("trip-detail", args=[trip_a.id])
+
+    first = api_a.get(url)
+    assert first.status_code == 200
+
+    with CaptureQueriesContext(connection) as queries:
+        cached = api_a.get(url)
+    assert cached.data == first.data
+    assert not [q for q in queries if "trips_trip" in q["sql"]]
+
+    # Another tenant never sees tenant A's cached body.
+    assert api_b.get(url).status_code == 404
+
+
+def test_trip_detail_conditional_get(locmem_cache, clients, django_capture_on_commit_callbacks):
+    (api_a, trip_a), _ = clients
+    url = reverse("trip-detail", args=[trip_a.id])
+
+    etag = api_a.get(url)["ETag"]
+    assert api_a.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        trip_a.name = "Renamed"
+        trip_a.save()
+
+    resp = api_a.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert resp.status_code == 200
+    assert resp.data["name"] == "Renamed"
+    assert resp["ETag"] != etag
@@ -0,0 +1,67 @@
+import pytest
+from django.core import mail
+
+from accounts.models import Tenant, User
+from notifications import services
+from notifications.services import deliver_pending, fan_out_notifications
+
+
+@pytest.fixture
+def users(db):
+    tenant = Tenant.objects.create(name="Email Tenant")
+    return [
+        User.objects.create_user(
+            username=f"mail{i}", email=f"mail{i}@example.com", tenant=tenant, receive_email_notifications=True
+        )
+        for i in range(25)
+    ]
+
+
+@pytest.fixture
+def spies(monkeypatch):
+    counts = {"render": 0, "connections": 0, "calls": 0}
+    render_to_string = services.render_to_string
+    get_connection = services.get_connection
+
+    def counting_render(*args, **kwargs):
+        counts["render"] += 1
+        return render_to_string(*args, **kwargs)
+
+    def counting_connection(*args, **kwargs):
+        counts["connections"] += 1
+        connection = get_connection(*args, **kwargs)
+        send_messages = connection.send_messages
+
+        def counting_send(messages):
+            counts["calls"] += 1
+            return send_messages(messages)
+
+        connection.send_messages = counting_send
+        return connection
+
+    monkeypatch.setattr(services, "render_to_string", counting_render)
+    monkeypatch.setattr(services, "get_connection", counting_connection)
+    monkeypatch.setattr(services, "EMAIL_MESSAGES_PER_CALL", 10)
+    return counts
+
+
+def test_batch_renders_once_and_reuses_one_connection(users, spies):
+    fan_out_notifications(users, "Chốt sổ", "Xe 51B đã chốt sổ")
+    fan_out_notifications(users[:5], "Đổi xe", "Hành khách đã đổi xe")
+
+    deliver_pending()
+
+    assert len(mail.outbox) == 30
+    assert spies == {"render": 2, "connections": 1, "calls": 3}
+    first = mail.outbox[0]
+    assert first.subject == "[GoTrip] Chốt sổ"
+    assert first.alternatives[0][1] == "text/html"
+
+
+def test_users_without_email_notifications_get_no_mail(users, spies):
+    User.objects.filter(pk__in=[u.pk for u in users[1:]]).update(receive_email_notifications=False)
+    fan_out_notifications(users[:3], "Tiêu đề", "Nội dung")
+
+    deliver_pending()
+
+    assert [m.to for m in mail.outbox] == [["mail0@example.com"]]
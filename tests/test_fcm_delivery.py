@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from firebase_admin import messaging
+
+from accounts.models import Tenant, User
+from notifications import fcm
+from notifications.models import FCMDevice, Notification
+from notifications.services import deliver_pending, fan_out_notifications
+
+
+@pytest.fixture
+def transport(settings):
+    settings.FCM_TRANSPORT = "fake"
+    transport = fcm.get_transport()
+    transport.calls.clear()
+    transport.invalid_tokens.clear()
+    return transport
+
+
+@pytest.fixture
+def users(db):
+    tenant = Tenant.objects.create(name="Push Tenant")
+    users = [
+        User.objects.create_user(username=f"push{i}", email=f"push{i}@example.com", tenant=tenant)
+        for i in range(3)
+    ]
+    FCMDevice.objects.bulk_create(
+        FCMDevice(user=users[i % 3], token=f"token-{i:04d}") for i in range(900)
+    )
+    return users
+
+
+def test_pushes_are_multicast_in_chunks_and_dead_tokens_pruned_once(transport, users):
+    transport.invalid_tokens.update({"token-0000", "token-0450", "token-0899"})
+    fan_out_notifications(users, "Chốt sổ", "Xe 51B đã chốt sổ")
+
+    with CaptureQueriesContext(connection) as queries:
+        delivered, pending = deliver_pending()
+
+    assert (delivered, pending) == (3, False)
+    assert [len(tokens) for tokens, _, _ in transport.calls] == [500, 400]
+    assert transport.sent == 900
+    deletes = [q for q in queries if q["sql"].startswith('DELETE FROM "notifications_fcmdevice"')]
+    assert len(deletes) == 1
+    assert FCMDevice.objects.count() == 897
+    assert not Notification.objects.filter(delivered_at__isnull=True).exists()
+
+
+def test_users_without_device_notifications_get_no_push(transport, users):
+    User.objects.filter(pk=users[0].pk).update(receive_device_notifications=False)
+    fan_out_notifications(User.objects.filter(pk__in=[u.pk for u in users]), "Tiêu đề", "Nội dung")
+
+    deliver_pending()
+
+    assert transport.sent == 600
+    assert not any(token in {"token-0000", "token-0003"} for tokens, _, _ in transport.calls for token in tokens)
+
+
+def test_firebase_transport_reports_only_dead_tokens(monkeypatch):
+    responses = [
+        SimpleNamespace(success=True, exception=None),
+        SimpleNamespace(success=False, exception=messaging.UnregisteredError("gone")),
+        SimpleNamespace(success=False, exception=messaging.QuotaExceededError("slow down")),
+    ]
+    sent = []
+
+    def send_each_for_multicast(message):
+        sent.append(message)
+        return SimpleNamespace(responses=responses, success_count=1)
+
+    monkeypatch.setattr(messaging, "send_each_for_multicast", send_each_for_multicast)
+
+    invalid = fcm.FirebaseTransport().send_multicast(["a", "b", "c"], "Tiêu đề", "Nội dung")
+
+    assert invalid == {"b"}
+    assert sent[0].tokens == ["a", "b", "c"]
@@ -0,0 +1,87 @@
+from datetime import datetime, timezone
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Tenant, User
+from fleet.models import Bus
+from notifications.models import Notification
+from rounds.models import Round, RoundBus
+from trips.models import Trip, TripBus
+
+
+@pytest.fixture
+def trip(db):
+    tenant = Tenant.objects.create(name="Tracker Tenant")
+    trip = Trip.objects.create(name="Huế", start_date="2026-06-01", end_date="2026-06-03", tenant=tenant)
+    bus = Bus.objects.create(registration_number="51B-80000", bus_code="T0", capacity=45, tenant=tenant)
+    TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+    Round.objects.create(trip=trip, name="R1", location="A", sequence=1)
+    return trip
+
+
+@pytest.fixture
+def lead(trip):
+    return User.objects.create_user(
+        username="tracker", email="tracker@example.com", password="x", tenant=trip.tenant, name="Lead"
+    )
+
+
+def selects_from(queries, table):
+    return [q for q in queries if q["sql"].startswith("SELECT") and f'"{table}"' in q["sql"].split("FROM")[1]]
+
+
+def test_has_changed_follows_loaded_and_saved_values(trip, lead):
+    trip_bus = TripBus.objects.get(trip=trip)
+    assert not trip_bus.has_changed("manager_id")
+
+    trip_bus.manager = lead
+    assert trip_bus.has_changed("manager_id")
+    trip_bus.save(update_fields=["manager"])
+    assert not trip_bus.has_changed("manager_id")
+
+    unsaved = TripBus(trip=trip, bus=trip_bus.bus)
+    assert unsaved.has_changed("manager_id")
+
+
+def test_refresh_from_db_resets_the_snapshot(trip, lead):
+    trip_bus = TripBus.objects.get(trip=trip)
+    TripBus.objects.filter(pk=trip_bus.pk).update(manager=lead, driver=lead)
+
+    trip_bus.refresh_from_db(fields=["manager"])
+    assert not trip_bus.has_changed("manager_id")
+    assert trip_bus.driver_id is None and not trip_bus.has_changed("driver_id")
+
+    trip_bus.refresh_from_db()
+    assert trip_bus.driver_id == lead.id
+    assert not trip_bus.has_changed("driver_id")
+
+
+def test_receivers_read_untracked_instances_once(trip, lead):
+    loaded = TripBus.objects.get(trip=trip)
+    TripBus.objects.filter(pk=loaded.pk).update(manager=lead)
+    # Built by hand with the stored manager: nothing changed, so nobody is notified again.
+    detached = TripBus(pk=loaded.pk, trip=trip, bus=loaded.bus, manager=lead)
+    with CaptureQueriesContext(connection) as queries:
+        detached.save(update_fields=["manager"])
+    assert len(selects_from(queries, "trips_tripbus")) == 1
+    assert not Notification.objects.filter(user=lead).exists()
+
+
+def test_assigning_a_loaded_trip_bus_does_not_reread_it(trip, lead):
+    trip_bus = TripBus.objects.get(trip=trip)
+    trip_bus.manager = lead
+    with CaptureQueriesContext(connection) as queries:
+        trip_bus.save()
+    assert selects_from(queries, "trips_tripbus") == []
+    assert Notification.objects.filter(user=lead, title="Phân công trưởng xe").count() == 1
+
+
+def test_finalizing_a_loaded_round_bus_does_not_reread_it(trip):
+    round_bus = RoundBus.objects.get(round__trip=trip)
+    round_bus.finalized_at = datetime(2026, 6, 1, 8, tzinfo=timezone.utc)
+    with CaptureQueriesContext(connection) as queries:
+        round_bus.save(update_fields=["finalized_at"])
+    assert selects_from(queries, "rounds_roundbus") == []
+    assert not round_bus.has_changed("finalized_at")
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from fleet.models import Bus
+from passengers.models import Passenger
+from rounds.models import Round, RoundBus
+from transactions.models import Transaction
+from trips.models import Trip, TripBus
+
+
+@pytest.fixture
+def transactions(db):
+    tenant = Tenant.objects.create(name="Keyset Tenant")
+    trip = Trip.objects.create(name="Trip", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant)
+    bus = Bus.objects.create(registration_number="51B-33333", bus_code="K1", capacity=45, tenant=tenant)
+    trip_bus = TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+    rnd = Round.objects.create(trip=trip, name="R1", location="A", sequence=1)
+    round_bus = RoundBus.objects.get(round=rnd, trip_bus=trip_bus)
+
+    base = timezone.now()
+    created = []
+    for i in range(25):
+        passenger = Passenger.objects.create(tenant=tenant, name=f"P{i}")
+        # Pairs share a check_in so the id tie-breaker is exercised.
+        created.append(
+            Transaction.objects.create(
+                passenger=passenger, round_bus=round_bus, check_in=base - timedelta(minutes=i // 2)
+            )
+        )
+
+    user = User.objects.create_user(
+        username="lead", email="lead@example.com", password="x", tenant=tenant, is_staff=True
+    )
+    api = APIClient()
+    api.force_authenticate(user=user)
+    return api, created
+
+
+def test_cursor_pages_walk_every_row_once_without_count(transactions):
+    api, created = transactions
+    url = reverse("transaction-list-create")
+
+    seen = []
+    with CaptureQueriesContext(connection) as queries:
+        resp = api.get(url, {"pagination": "cursor", "limit": 10})
+    assert not [q for q in queries if "COUNT(" in q["sql"].upper()]
+    assert set(resp.data["pagination"]) == {"limit", "next", "previous"}
+
+    while True:
+        seen.extend(row["id"] for row in resp.data["data"])
+        next_link = resp.data["pagination"]["next"]
+        if not next_link:
+            break
+        resp = api.get(next_link)
+
+    expected = [t.id for t in sorted(created, key=lambda t: (t.check_in, t.id), reverse=True)]
+    assert seen == expected
+
+
+def test_cursor_count_is_opt_in_and_page_mode_is_default(transactions):
+    api, created = transactions
+    url = reverse("transaction-list-create")
+
+    resp = api.get(url, {"pagination": "cursor", "with_count": 1})
+    assert resp.data["pagination"]["total_items"] == len(created)
+
+    resp = api.get(url)
+    assert resp.data["pagination"]["total_items"] == len(created)
+    assert resp.data["pagination"]["page"] == 1
+
+
+def test_cursor_splits_ties_across_pages_and_walks_back(transactions):
+    api, created = transactions
+    url = reverse("transaction-list-create")
+    expected = [t.id for t in sorted(created, key=lambda t: (t.check_in, t.id), reverse=True)]
+
+    # An odd limit puts rows sharing a check_in on different pages.
+    pages = [api.get(url, {"pagination": "cursor", "limit": 3})]
+    while pages[-1].data["pagination"]["next"]:
+        pages.append(api.get(pages[-1].data["pagination"]["next"]))
+    assert [row["id"] for page in pages for row in page.data["data"]] == expected
+    assert pages[0].data["pagination"]["previous"] is None
+
+    resp = pages[-1]
+    back = []
+    while resp.data["pagination"]["previous"]:
+        resp = api.get(resp.data["pagination"]["previous"])
+        back.append([row["id"] for row in resp.data["data"]])
+    assert back == [[row["id"] for row in page.data["data"]] for page in reversed(pages[:-1])]
+    assert resp.data["pagination"]["next"]
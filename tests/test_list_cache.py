@@ -0,0 +1,61 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from passengers.models import Passenger, PassengerBusAssignment
+from trips.models import Trip
+
+
+@pytest.fixture
+def locmem_cache(settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+@pytest.fixture
+def trip(db):
+    tenant = Tenant.objects.create(name="List Cache Tenant")
+    trip = Trip.objects.create(name="Trip", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant)
+    for i in range(15):
+        passenger = Passenger.objects.create(tenant=tenant, name=f"P{i:02d}")
+        PassengerBusAssignment.objects.create(passenger=passenger, trip=trip)
+    return trip
+
+
+@pytest.fixture
+def api_client(trip):
+    user = User.objects.create_user(
+        username="manager", email="manager@example.com", password="x", tenant=trip.tenant, is_staff=True
+    )
+    api = APIClient()
+    api.force_authenticate(user=user)
+    return api
+
+
+def test_passenger_list_cache_is_per_page_and_invalidated_on_write(
+    locmem_cache, trip, api_client, django_capture_on_commit_callbacks
+):
+    url = reverse("passenger-list-create")
+    first = api_client.get(url, {"trip": trip.id, "page": 1})
+    second = api_client.get(url, {"trip": trip.id, "page": 2})
+    assert [p["name"] for p in first.data["data"]][:1] == ["P00"]
+    assert [p["name"] for p in second.data["data"]] == [f"P{i}" for i in range(10, 15)]
+
+    with CaptureQueriesContext(connection) as queries:
+        cached = api_client.get(url, {"page": 1, "trip": trip.id})
+    assert cached.data == first.data
+    # Only the conditional-GET validator aggregate touches the database.
+    assert len(queries) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Passenger.objects.filter(name="P00").first().delete()
+
+    refreshed = api_client.get(url, {"trip": trip.id, "page": 1})
+    assert refreshed.data["data"][0]["name"] == "P01"
+    assert refreshed.data["pagination"]["total_items"] == 14
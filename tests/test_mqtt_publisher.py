@@ -0,0 +1,89 @@
+import paho.mqtt.client as paho
+
+from common.mqtt import MQTTPublisher, parse_broker_url
+
+
+class FakeClient:
+    def __init__(self):
+        self.messages = []
+        self.stopped = False
+
+    def publish(self, topic, payload=None, qos=0):
+        self.messages.append((topic, payload, qos))
+        info = paho.MQTTMessageInfo(len(self.messages))
+        info.rc = paho.MQTT_ERR_SUCCESS
+        info._published = True  # pylint: disable=protected-access
+        return info
+
+    def loop_stop(self):
+        self.stopped = True
+
+    def disconnect(self):
+        pass
+
+
+def make_publisher(monkeypatch, **kwargs):
+    publisher = MQTTPublisher("ws://broker.local:8083", **kwargs)
+    client = FakeClient()
+
+    def build_client():
+        publisher._connected.set()  # pylint: disable=protected-access
+        return client
+
+    monkeypatch.setattr(publisher, "_build_client", build_client)
+    return publisher, client
+
+
+def test_parse_broker_url():
+    assert parse_broker_url("wss://mqtt.toolhub.app:8084") == {
+        "host": "mqtt.toolhub.app", "port": 8084, "tls": True, "transport": "websockets",
+    }
+    assert parse_broker_url("ws://localhost") == {
+        "host": "localhost", "port": 1883, "tls": False, "transport": "websockets",
+    }
+    assert parse_broker_url("mqtt.example.com")["port"] == 1883
+
+
+def test_publisher_reuses_one_client_and_tracks_metrics(monkeypatch):
+    publisher, client = make_publisher(monkeypatch)
+
+    for i in range(5):
+        assert publisher.publish(f"transactions/{i}", {"id": i})
+    assert publisher.flush(timeout=2)
+
+    assert [m[0] for m in client.messages] == [f"transactions/{i}" for i in range(5)]
+    assert client.messages[0][1] == '{"id": 0}'
+    metrics = publisher.metrics()
+    assert metrics["published"] == 5
+    assert metrics["queue_depth"] == 0
+    publisher.stop()
+
+
+def test_publisher_drops_when_queue_full(monkeypatch):
+    publisher, _ = make_publisher(monkeypatch, max_queue_size=1)
+    monkeypatch.setattr(publisher, "_drain", lambda: None)
+
+    assert publisher.publish("a", "1")
+    assert not publisher.publish("b", "2")
+    assert publisher.metrics()["dropped"] == 1
+
+
+def test_restart_after_worker_death_tears_down_old_client(monkeypatch):
+    publisher = MQTTPublisher("ws://broker.local:8083")
+    clients = []
+
+    def build_client():
+        clients.append(FakeClient())
+        publisher._connected.set()  # pylint: disable=protected-access
+        return clients[-1]
+
+    monkeypatch.setattr(publisher, "_build_client", build_client)
+    monkeypatch.setattr(publisher, "_drain", lambda: None)  # the worker exits at once
+
+    publisher.publish("a", "1")
+    publisher._worker.join()  # pylint: disable=protected-access
+    publisher.publish("b", "2")
+
+    assert len(clients) == 2
+    assert clients[0].stopped
+    assert not clients[1].stopped
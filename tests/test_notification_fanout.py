@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+import pytest
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Role, Tenant, User
+from core.models import OutboxMessage
+from fleet.models import Bus
+from notifications import services
+from notifications.models import Notification
+from rounds.models import Round, RoundBus
+from trips.models import Trip, TripBus
+
+
+@pytest.fixture
+def round_bus(db):
+    tenant = Tenant.objects.create(name="Fan-out Tenant")
+    trip = Trip.objects.create(name="Trip", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant)
+    bus = Bus.objects.create(registration_number="51B-90001", bus_code="F1", capacity=45, tenant=tenant)
+    trip_bus = TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+    rnd = Round.objects.create(trip=trip, name="R1", location="A", sequence=1)
+    return RoundBus.objects.get(round=rnd, trip_bus=trip_bus)
+
+
+@pytest.fixture
+def managers(round_bus):
+    role, _ = Role.objects.get_or_create(name="tour_manager")
+    return [
+        User.objects.create_user(
+            username=f"manager{i}",
+            email=f"manager{i}@example.com",
+            tenant=round_bus.round.trip.tenant,
+            role=role,
+            receive_email_notifications=i % 2 == 0,
+        )
+        for i in range(20)
+    ]
+
+
+@pytest.fixture
+def no_delivery(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("push/email must not be sent on the request path")
+
+    monkeypatch.setattr(services.fcm, "send_pushes", fail)
+    monkeypatch.setattr(services, "send_email_notifications", fail)
+
+
+def test_finalize_creates_notifications_with_one_insert(round_bus, managers, no_delivery,
+                                                        django_capture_on_commit_callbacks):
+    round_bus.finalized_at = timezone.now()
+    with django_capture_on_commit_callbacks(execute=True), CaptureQueriesContext(connection) as queries:
+        round_bus.save()
+
+    inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "notifications_notification"')]
+    assert len(inserts) == 1
+    notifications = Notification.objects.filter(title="Chốt sổ điểm danh lên xe")
+    assert notifications.count() == len(managers)
+    assert not notifications.filter(delivered_at__isnull=False).exists()
+    assert OutboxMessage.objects.filter(topic__startswith="notifications/user_").count() == len(managers)
+
+
+def test_worker_delivers_pending_notifications_once(managers):
+    services.fan_out_notifications(managers, "Tiêu đề", "Nội dung")
+
+    call_command("deliver_notifications", "--once", "--batch-size", "7")
+
+    assert not Notification.objects.filter(delivered_at__isnull=True).exists()
+    assert sorted(m.to[0] for m in mail.outbox) == sorted(u.email for u in managers if u.receive_email_notifications)
+
+    call_command("deliver_notifications", "--once")
+    assert len(mail.outbox) == 10
+
+
+def test_failed_send_keeps_the_claim_until_it_goes_stale(managers, monkeypatch):
+    services.fan_out_notifications(managers, "Tiêu đề", "Nội dung")
+
+    def smtp_down(emails):
+        list(emails)
+        raise ConnectionError("SMTP down")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(services, "send_email_notifications", smtp_down)
+        with pytest.raises(ConnectionError):
+            services.deliver_pending()
+
+    assert not Notification.objects.filter(claimed_at__isnull=True).exists()
+    assert not Notification.objects.filter(delivered_at__isnull=False).exists()
+    # Another worker does not pick up the claimed batch while the claim is fresh ...
+    assert services.deliver_pending() == (0, False)
+    assert mail.outbox == []
+    # ... but does once it is stale.
+    assert services.deliver_pending(claim_timeout=timedelta(0)) == (len(managers), False)
+    assert not Notification.objects.filter(delivered_at__isnull=True).exists()
+    assert len(mail.outbox) == 10
@@ -0,0 +1,65 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from notifications.models import Notification
+from notifications.services import fan_out_notifications
+
+
+@pytest.fixture(autouse=True)
+def locmem_cache(settings):
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@pytest.fixture
+def user(db):
+    tenant = Tenant.objects.create(name="Badge Tenant")
+    return User.objects.create_user(username="badge", email="badge@example.com", tenant=tenant)
+
+
+@pytest.fixture
+def api(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+def summary(api, **params):
+    response = api.get(reverse("notification-summary"), params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_summary_counter_follows_create_and_read(
+    api, user, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        fan_out_notifications([user] * 3, "Tiêu đề", "Nội dung")
+
+    first = summary(api)
+    assert first["unread_count"] == 3
+    assert len(first["latest"]) == 3
+
+    # Cached counter: a badge-only poll does not touch the notifications table.
+    with django_assert_num_queries(0):
+        assert summary(api, limit=0) == {"unread_count": 3, "latest": []}
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Notification.objects.create(user=user, title="Mới", message="Thông báo mới")
+    assert summary(api, limit=0)["unread_count"] == 4
+
+    notification = Notification.objects.filter(user=user).first()
+    with django_capture_on_commit_callbacks(execute=True):
+        api.post(reverse("notification-mark-as-read", args=[notification.pk]))
+        api.post(reverse("notification-mark-as-read", args=[notification.pk]))
+    assert summary(api, limit=0)["unread_count"] == 3
+
+    with django_capture_on_commit_callbacks(execute=True):
+        api.post(reverse("notification-mark-all-as-read"))
+    assert summary(api, limit=0)["unread_count"] == 0
+
+
+def test_summary_limit_is_validated(api):
+    response = api.get(reverse("notification-summary"), {"limit": "abc"})
+    assert response.status_code == 400
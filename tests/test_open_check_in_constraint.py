@@ -0,0 +1,114 @@
+import pytest
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from fleet.models import Bus
+from passengers.models import Passenger
+from rounds.models import Round, RoundBus
+from transactions.models import Transaction
+from trips.models import Trip, TripBus
+
+
+@pytest.fixture
+def setup(db):
+    tenant = Tenant.objects.create(name="Constraint Tenant")
+    trip = Trip.objects.create(
+        name="Trip", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant
+    )
+    trip_buses = [
+        TripBus.objects.create(
+            trip=trip,
+            bus=Bus.objects.create(registration_number=f"29A-0000{i}", bus_code=f"C{i}", capacity=30, tenant=tenant),
+            driver_name="",
+            driver_tel="",
+        )
+        for i in range(2)
+    ]
+    rnd = Round.objects.create(trip=trip, name="R1", location="A", sequence=1)
+    round_buses = [RoundBus.objects.get(round=rnd, trip_bus=tb) for tb in trip_buses]
+    passenger = Passenger.objects.create(tenant=tenant, name="P")
+
+    user = User.objects.create_user(
+        username="lead", email="lead@example.com", password="x", tenant=tenant, is_staff=True
+    )
+    api = APIClient()
+    api.force_authenticate(user=user)
+    return api, trip, trip_buses, round_buses, passenger
+
+
+def test_round_is_copied_from_round_bus(setup):
+    _, _, _, (rb, _), passenger = setup
+    txn = Transaction.objects.create(passenger=passenger, round_bus=rb, check_in=timezone.now())
+    assert txn.round_id == rb.round_id
+
+
+def test_database_rejects_second_open_check_in_in_same_round(setup):
+    _, _, _, (rb_a, rb_b), passenger = setup
+    Transaction.objects.create(passenger=passenger, round_bus=rb_a, check_in=timezone.now())
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        Transaction.objects.create(passenger=passenger, round_bus=rb_b, check_in=timezone.now())
+
+    # A closed check-in does not block a new one.
+    Transaction.objects.update(check_out=timezone.now())
+    Transaction.objects.create(passenger=passenger, round_bus=rb_b, check_in=timezone.now())
+
+
+def test_create_returns_conflict_detail(setup):
+    api, _, _, (rb_a, rb_b), passenger = setup
+    Transaction.objects.create(passenger=passenger, round_bus=rb_a, check_in=timezone.now())
+
+    resp = api.post(
+        reverse("transaction-list-create"),
+        {"passenger": passenger.id, "round_bus": rb_b.id, "check_in": timezone.now().isoformat()},
+        format="json",
+    )
+    assert resp.status_code == 400
+    assert resp.data["detail"] == "Hành khách đã điểm danh ở xe 29A-00000"
+    assert Transaction.objects.count() == 1
+
+
+def test_switch_bus_rolls_back_on_conflict(setup):
+    api, trip, (tb_a, tb_b), (rb_a, rb_b), passenger = setup
+    other = Passenger.objects.create(tenant=trip.tenant, name="Other")
+    blocking = Transaction.objects.create(passenger=passenger, round_bus=rb_a, check_in=timezone.now())
+    unrelated = Transaction.objects.create(passenger=other, round_bus=rb_a, check_in=timezone.now())
+
+    resp = api.post(
+        reverse("transaction-switch-bus"),
+        {
+            "passenger_id": passenger.id,
+            "from_txn_id": unrelated.id,
+            "target_round_bus_id": rb_b.id,
+            "target_trip_bus_id": tb_b.id,
+            "trip_id": trip.id,
+        },
+        format="json",
+    )
+    assert resp.status_code == 400
+    unrelated.refresh_from_db()
+    blocking.refresh_from_db()
+    assert unrelated.check_out is None
+    assert blocking.check_out is None
+
+
+def test_switch_bus_moves_open_check_in(setup):
+    api, trip, (tb_a, tb_b), (rb_a, rb_b), passenger = setup
+    txn = Transaction.objects.create(passenger=passenger, round_bus=rb_a, check_in=timezone.now())
+
+    resp = api.post(
+        reverse("transaction-switch-bus"),
+        {
+            "passenger_id": passenger.id,
+            "from_txn_id": txn.id,
+            "target_round_bus_id": rb_b.id,
+            "target_trip_bus_id": tb_b.id,
+            "trip_id": trip.id,
+        },
+        format="json",
+    )
+    assert resp.status_code == 200
+    assert Transaction.objects.get(passenger=passenger, check_out__isnull=True).round_bus_id == rb_b.id
@@ -0,0 +1,206 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from common import mqtt
+from core import outbox
+from core.models import OutboxMessage
+from fleet.models import Bus
+from passengers.models import Passenger
+from rounds.models import Round, RoundBus
+from transactions.models import Transaction
+from trips.models import Trip, TripBus
+
+
+@pytest.fixture
+def broker(settings):
+    settings.MQTT_URL = "memory://"
+    publisher = mqtt.get_publisher()
+    publisher.messages.clear()
+    publisher.available = True
+    return publisher
+
+
+@pytest.fixture
+def round_bus(db):
+    tenant = Tenant.objects.create(name="Outbox Tenant")
+    trip = Trip.objects.create(
+        name="Trip", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant
+    )
+    bus = Bus.objects.create(registration_number="51B-00001", bus_code="B1", capacity=45, tenant=tenant)
+    trip_bus = TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+    rnd = Round.objects.create(trip=trip, name="R1", location="A", sequence=1)
+    return RoundBus.objects.get(round=rnd, trip_bus=trip_bus)
+
+
+@pytest.fixture
+def api_client(round_bus):
+    user = User.objects.create_user(
+        username="lead", email="lead@example.com", password="x", tenant=round_bus.round.trip.tenant, is_staff=True
+    )
+    api = APIClient()
+    api.force_authenticate(user=user)
+    return api
+
+
+def test_bulk_check_out_goes_through_outbox(broker, round_bus, api_client, django_capture_on_commit_callbacks):
+    tenant = round_bus.round.trip.tenant
+    txns = [
+        Transaction.objects.create(
+            passenger=Passenger.objects.create(tenant=tenant, name=f"P{i}"),
+            round_bus=round_bus,
+            check_in=timezone.now(),
+        )
+        for i in range(3)
+    ]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = api_client.post(
+            reverse("transaction-bulk-check-out"),
+            {"transaction_ids": [t.id for t in txns], "check_out": timezone.now().isoformat()},
+            format="json",
+        )
+    assert resp.status_code == 200
+
+    # Nothing reaches the broker on the request path.
+    assert broker.messages == []
+    assert OutboxMessage.objects.filter(published_at__isnull=True).count() == 1
+
+    call_command("relay_outbox", "--once")
+
+    [(topic, payload, _)] = broker.messages
+    assert topic == f"transactions-batch/{round_bus.id}"
+    event = json.loads(payload)
+    assert event["event"] == "bulk_check_out"
+    assert event["trip"] == round_bus.round.trip_id
+    assert sorted(event["transactions"]) == sorted(t.id for t in txns)
+    assert not OutboxMessage.objects.filter(published_at__isnull=True).exists()
+    assert not Transaction.objects.filter(check_out__isnull=True).exists()
+
+
+def test_bulk_check_out_skips_closed_rows_and_supports_per_row_events(
+    broker, round_bus, api_client, django_capture_on_commit_callbacks
+):
+    tenant = round_bus.round.trip.tenant
+    closed_at = timezone.now() - timezone.timedelta(hours=1)
+    closed = Transaction.objects.create(
+        passenger=Passenger.objects.create(tenant=tenant, name="Closed"),
+        round_bus=round_bus,
+        check_in=closed_at,
+        check_out=closed_at,
+    )
+    open_txn = Transaction.objects.create(
+        passenger=Passenger.objects.create(tenant=tenant, name="Open"),
+        round_bus=round_bus,
+        check_in=timezone.now(),
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = api_client.post(
+            reverse("transaction-bulk-check-out"),
+            {
+                "transaction_ids": [closed.id, open_txn.id],
+                "check_out": timezone.now().isoformat(),
+                "per_row_events": True,
+            },
+            format="json",
+        )
+    assert resp.status_code == 200
+    assert resp.data["updated"] == 1
+
+    closed.refresh_from_db()
+    assert closed.check_out == closed_at
+
+    call_command("relay_outbox", "--once")
+    assert [m[0] for m in broker.messages] == [f"transactions/{open_txn.id}"]
+
+
+def test_bulk_check_out_rejects_invalid_datetime(api_client):
+    resp = api_client.post(
+        reverse("transaction-bulk-check-out"),
+        {"transaction_ids": [1], "check_out": "not-a-date"},
+        format="json",
+    )
+    assert resp.status_code == 400
+
+
+def test_rolled_back_transaction_leaves_no_outbox_rows(db, broker, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                outbox.enqueue("transactions/1", {"id": 1}, key="trip:1")
+                raise RuntimeError("rollback")
+
+    assert not OutboxMessage.objects.exists()
+
+
+def test_relay_preserves_per_key_order_when_broker_fails(db, broker, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        outbox.enqueue_many([
+            outbox.message("t/1", {"n": 1}, key="trip:1"),
+            outbox.message("t/2", {"n": 2}, key="trip:1"),
+        ])
+
+    broker.available = False
+    call_command("relay_outbox", "--once")
+    assert OutboxMessage.objects.filter(published_at__isnull=True).count() == 2
+    assert OutboxMessage.objects.get(topic="t/1").attempts == 1
+    assert OutboxMessage.objects.get(topic="t/2").attempts == 0
+
+    broker.available = True
+    call_command("relay_outbox", "--once")
+    assert [m[0] for m in broker.messages] == ["t/1", "t/2"]
+
+
+def test_messages_are_inserted_in_the_callers_transaction(db, broker):
+    with transaction.atomic():
+        outbox.enqueue("transactions/1", {"id": 1}, key="trip:1")
+        # Written with the business rows, not after commit.
+        assert OutboxMessage.objects.filter(topic="transactions/1").exists()
+
+
+def test_poison_message_is_dead_lettered_and_unblocks_its_key(db, broker, monkeypatch):
+    outbox.enqueue_many([
+        outbox.message("t/poison", {"n": 1}, key="user:1"),
+        outbox.message("t/next", {"n": 2}, key="user:1"),
+    ])
+    publish_sync = broker.publish_sync
+
+    def failing_publish(topic, payload, qos=0, timeout=5.0):
+        if topic == "t/poison":
+            raise ValueError("cannot encode payload")
+        return publish_sync(topic, payload, qos, timeout)
+
+    monkeypatch.setattr(broker, "publish_sync", failing_publish)
+
+    call_command("relay_outbox", "--once", "--max-attempts", "2")
+    assert broker.messages == []
+    call_command("relay_outbox", "--once", "--max-attempts", "2")
+
+    poison = OutboxMessage.objects.get(topic="t/poison")
+    assert poison.dead_at is not None
+    assert poison.attempts == 2
+    assert "cannot encode payload" in poison.last_error
+    assert [m[0] for m in broker.messages] == ["t/next"]
+
+
+def test_bulk_check_out_returns_complete_rows(round_bus):
+    from transactions.services import bulk_check_out
+
+    tenant = round_bus.round.trip.tenant
+    txn = Transaction.objects.create(
+        passenger=Passenger.objects.create(tenant=tenant, name="P"), round_bus=round_bus, check_in=timezone.now()
+    )
+    check_out = timezone.now()
+
+    [updated] = bulk_check_out([txn.id], check_out)
+
+    assert updated.check_out == check_out
+    assert updated.round_id == round_bus.round_id
+    assert bulk_check_out([txn.id], timezone.now()) == []
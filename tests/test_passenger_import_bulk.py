@@ -0,0 +1,123 @@
+import io
+import json
+
+import openpyxl
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from passengers.models import ImportedBus, Passenger, PassengerBusAssignment
+from trips.models import Trip
+
+
+@pytest.fixture
+def trip(db):
+    tenant = Tenant.objects.create(name="Import Tenant")
+    return Trip.objects.create(name="Trip", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant)
+
+
+@pytest.fixture
+def api_client(trip):
+    user = User.objects.create_user(
+        username="importer", email="importer@example.com", password="x", tenant=trip.tenant
+    )
+    api = APIClient()
+    api.force_authenticate(user=user)
+    return api
+
+
+def workbook(sheets: dict) -> io.BytesIO:
+    wb = openpyxl.Workbook()
+    wb.remove(wb.active)
+    for title, rows in sheets.items():
+        ws = wb.create_sheet(title)
+        ws.append(["STT", "Họ và tên", "Số điện thoại", "Thông tin thêm", "Ghi chú"])
+        for i, row in enumerate(rows, start=1):
+            ws.append([i, *row])
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    buf.name = "passengers.xlsx"
+    return buf
+
+
+def post_import(api, trip, buf, **extra):
+    return api.post(reverse("passenger-import"), {"file": buf, "trip_id": str(trip.id), **extra}, format="multipart")
+
+
+def rows(count, offset=0):
+    return [[f"Khách {i}", f"09{i:08d}", "", ""] for i in range(offset, offset + count)]
+
+
+def test_query_count_does_not_grow_with_rows(trip, api_client):
+    other_trip = Trip.objects.create(name="Trip 2", start_date="2026-06-01", end_date="2026-06-02", tenant=trip.tenant)
+
+    with CaptureQueriesContext(connection) as small:
+        resp = post_import(api_client, trip, workbook({"Xe 1": rows(3), "Xe 2": rows(3, 3)}))
+    assert resp.status_code == 201
+
+    # Stay under SQLite's per-statement batch size so only the row count differs.
+    with CaptureQueriesContext(connection) as large:
+        resp = post_import(api_client, other_trip, workbook({"Xe 1": rows(50), "Xe 2": rows(50, 50)}))
+    assert resp.status_code == 201
+
+    assert len(large) == len(small)
+    assert PassengerBusAssignment.objects.filter(trip=other_trip).count() == 100
+    assert set(resp.data["timings"]) == {"parse_ms", "resolve_ms", "write_ms", "total_ms"}
+    assert resp.data["stats"] == {"rows": 100, "created": 100, "updated": 0}
+
+
+def test_reimport_matches_existing_passengers_and_moves_assignments(trip, api_client):
+    post_import(api_client, trip, workbook({"Xe 1": [["An", "0900000001", "", ""], ["Bình", "", "", ""]]}))
+
+    resp = post_import(
+        api_client,
+        trip,
+        workbook({
+            "Xe 2": [
+                ["An Nguyễn", "0900000001", "VIP", "Ghế đầu"],
+                ["Bình", "", "", "Ăn chay"],
+                # Same phone twice in one file resolves to one passenger.
+                ["An Nguyễn", "0900000001", "", ""],
+            ],
+        }),
+        conflict_resolutions=json.dumps({"0900000001": "update"}),
+    )
+    assert resp.status_code == 201
+    assert resp.data["imported_buses"][0]["passenger_count"] == 3
+    assert resp.data["stats"]["created"] == 0
+
+    an = Passenger.objects.get(phone="0900000001")
+    assert (an.name, an.extra_info, an.note) == ("An Nguyễn", "VIP", "Ghế đầu")
+    assert Passenger.objects.get(name="Bình").note == "Ăn chay"
+    assert Passenger.objects.count() == 2
+
+    xe2 = ImportedBus.objects.get(trip=trip, sheet_name="Xe 2")
+    assert set(PassengerBusAssignment.objects.filter(trip=trip).values_list("imported_bus", flat=True)) == {xe2.id}
+
+
+def test_check_resolves_phones_in_one_query_and_reports_duplicates(trip, api_client, django_assert_max_num_queries):
+    Passenger.objects.create(tenant=trip.tenant, name="Chị Ba", phone="0911111111")
+    buf = workbook({
+        "Xe 1": [*rows(200), ["Ba", "0911111111", "", ""]],
+        "Xe 2": [["Khách 7 (lặp)", "0900000007", "", ""]],
+    })
+
+    with django_assert_max_num_queries(3):
+        resp = api_client.post(reverse("passenger-import-check"), {"file": buf}, format="multipart")
+    assert resp.status_code == 200
+
+    assert [c["existing"]["name"] for c in resp.data["conflicts"]] == ["Chị Ba"]
+    assert len(resp.data["valid_passengers"]) == 201
+    assert resp.data["duplicates"] == [
+        {
+            "phone": "0900000007",
+            "rows": [
+                {"sheet_name": "Xe 1", "row": 9, "name": "Khách 7"},
+                {"sheet_name": "Xe 2", "row": 2, "name": "Khách 7 (lặp)"},
+            ],
+        }
+    ]
@@ -0,0 +1,78 @@
+import gzip
+import json
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from accounts.models import Tenant, User
+from notifications.models import Notification
+
+
+@pytest.fixture
+def user(db):
+    tenant = Tenant.objects.create(name="Prune Tenant")
+    return User.objects.create_user(username="prune", email="prune@example.com", tenant=tenant)
+
+
+def make(user, days_ago=0, is_read=False, title="Chốt sổ", reference_id="1", delivered=True):
+    notification = Notification.objects.create(
+        user=user, title=title, message="Xe 51B đã chốt sổ", reference_type="ROUND", reference_id=reference_id,
+        is_read=is_read,
+    )
+    created_at = timezone.now() - timedelta(days=days_ago)
+    Notification.objects.filter(pk=notification.pk).update(
+        created_at=created_at, delivered_at=created_at if delivered else None
+    )
+    return notification
+
+
+def test_prunes_old_read_notifications_in_batches_and_archives_them(user, tmp_path, capsys):
+    old_read = [make(user, days_ago=100, is_read=True, reference_id=str(i)) for i in range(5)]
+    old_unread = make(user, days_ago=100, reference_id="unread")
+    recent_read = make(user, days_ago=1, is_read=True, reference_id="recent")
+    archive = tmp_path / "notifications.jsonl.gz"
+
+    call_command("prune_notifications", "--days", "30", "--batch-size", "2", "--archive", str(archive))
+
+    remaining = set(Notification.objects.values_list("id", flat=True))
+    assert remaining == {old_unread.id, recent_read.id}
+    with gzip.open(archive, "rt", encoding="utf-8") as f:
+        archived = [json.loads(line) for line in f]
+    assert sorted(row["id"] for row in archived) == [n.id for n in old_read]
+    assert "Archived and deleted 5 read notification(s)" in capsys.readouterr().out
+
+
+def test_collapses_identical_notifications_per_reference(user):
+    first = make(user, days_ago=3, is_read=True)
+    make(user, days_ago=2)
+    newest = make(user, days_ago=1, is_read=True)
+    other_reference = make(user, reference_id="2")
+    other_title = make(user, title="Chốt sổ xuống xe")
+
+    call_command("prune_notifications")
+
+    assert set(Notification.objects.values_list("id", flat=True)) == {newest.id, other_reference.id, other_title.id}
+    newest.refresh_from_db()
+    assert newest.repeat_count == 3
+    assert newest.is_read is False
+    assert not Notification.objects.filter(pk=first.pk).exists()
+
+    call_command("prune_notifications")
+    newest.refresh_from_db()
+    assert newest.repeat_count == 3
+
+
+def test_compaction_skips_undelivered_and_old_rows(user):
+    old = make(user, days_ago=20, is_read=True)
+    delivered = make(user, days_ago=2, is_read=True)
+    undelivered = make(user, days_ago=1, delivered=False)
+
+    call_command("prune_notifications", "--compact-days", "7")
+    assert set(Notification.objects.values_list("id", flat=True)) == {old.id, delivered.id, undelivered.id}
+
+    call_command("prune_notifications", "--compact-days", "30")
+    assert set(Notification.objects.values_list("id", flat=True)) == {delivered.id, undelivered.id}
+    delivered.refresh_from_db()
+    assert delivered.repeat_count == 2
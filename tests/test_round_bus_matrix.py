@@ -0,0 +1,61 @@
+import pytest
+
+from accounts.models import Tenant
+from fleet.models import Bus
+from rounds.models import Round, RoundBus
+from rounds.services import ensure_round_bus_matrix
+from trips.models import Trip, TripBus
+
+
+@pytest.fixture
+def trip(db):
+    tenant = Tenant.objects.create(name="Matrix Tenant")
+    return Trip.objects.create(name="Trip", start_date="2026-05-01", end_date="2026-05-03", tenant=tenant)
+
+
+def add_bus(trip, i):
+    bus = Bus.objects.create(registration_number=f"51B-7{i:04d}", bus_code=f"M{i}", capacity=45, tenant=trip.tenant)
+    return TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+
+
+def test_signals_materialize_round_buses_with_one_insert(trip, django_assert_num_queries):
+    rounds = [Round.objects.create(trip=trip, name=f"R{i}", location="A", sequence=i) for i in range(1, 6)]
+    bus = Bus.objects.create(registration_number="51B-70000", bus_code="M0", capacity=45, tenant=trip.tenant)
+
+    # INSERT trip bus, then SELECT rounds, SELECT existing pairs and one bulk INSERT.
+    with django_assert_num_queries(4):
+        trip_bus = TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+    assert RoundBus.objects.filter(trip_bus=trip_bus).count() == len(rounds)
+
+
+def test_ensure_matrix_fills_gaps_once(trip):
+    trip_buses = [add_bus(trip, i) for i in range(3)]
+    rounds = [Round.objects.create(trip=trip, name=f"R{i}", location="A", sequence=i) for i in range(1, 5)]
+    RoundBus.objects.filter(round=rounds[0]).delete()
+    RoundBus.objects.filter(trip_bus=trip_buses[2]).delete()
+
+    assert ensure_round_bus_matrix(trip) == 3 + 3
+    assert ensure_round_bus_matrix(trip) == 0
+    assert RoundBus.objects.filter(round__trip=trip).count() == len(rounds) * len(trip_buses)
+
+
+def test_adding_a_trip_bus_keeps_buses_a_round_dropped(trip):
+    from accounts.models import User
+    from trips.serializers import TripSerializer
+
+    trip_buses = [add_bus(trip, i) for i in range(2)]
+    rnd = Round.objects.create(trip=trip, name="R1", location="A", sequence=1)
+    RoundBus.objects.filter(round=rnd, trip_bus=trip_buses[0]).delete()
+    driver = User.objects.create_user(username="driver", email="driver@example.com", tenant=trip.tenant, name="Tài xế")
+    new_bus = Bus.objects.create(registration_number="51B-79999", bus_code="MN", capacity=45, tenant=trip.tenant)
+
+    assignments = [
+        {"bus": bus, "manager": driver, "driver": driver}
+        for bus in [trip_bus.bus for trip_bus in trip_buses] + [new_bus]
+    ]
+    TripSerializer()._sync_trip_buses(trip, assignments)
+
+    assert set(RoundBus.objects.filter(round=rnd).values_list("trip_bus__bus_id", flat=True)) == {
+        trip_buses[1].bus_id,
+        new_bus.id,
+    }
@@ -0,0 +1,99 @@
+import codecs
+import csv
+import io
+
+import openpyxl
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from fleet.models import Bus
+from passengers.models import ImportedBus, Passenger, PassengerBusAssignment
+from trips.models import Trip, TripBus
+
+
+@pytest.fixture
+def trip(db):
+    tenant = Tenant.objects.create(name="Export Tenant")
+    trip = Trip.objects.create(name="Hạ Long", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant)
+    bus = Bus.objects.create(registration_number="51B-55555", bus_code="E1", capacity=45, tenant=tenant)
+    trip_bus = TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+    draft = ImportedBus.objects.create(trip=trip, sheet_name="Xe nháp", sequence=2)
+
+    for name, phone, kwargs in [
+        ("An", "0901000001", {"trip_bus": trip_bus}),
+        ("Bình", "0901000002", {"trip_bus": trip_bus}),
+        ("Chi", "0901000003", {"imported_bus": draft}),
+    ]:
+        passenger = Passenger.objects.create(tenant=tenant, name=name, phone=phone)
+        PassengerBusAssignment.objects.create(passenger=passenger, trip=trip, **kwargs)
+    return trip
+
+
+@pytest.fixture
+def api_client(trip):
+    user = User.objects.create_user(username="exporter", email="exporter@example.com", password="x", tenant=trip.tenant)
+    api = APIClient()
+    api.force_authenticate(user=user)
+    return api
+
+
+def test_passenger_xlsx_is_streamed_from_write_only_workbook(trip, api_client):
+    resp = api_client.get(reverse("passenger-export"), {"trip": trip.id})
+    assert resp.status_code == 200
+    assert resp.streaming
+
+    wb = openpyxl.load_workbook(io.BytesIO(b"".join(resp.streaming_content)))
+    assert wb.sheetnames == ["51B-55555", "Xe nháp"]
+    phone = wb["51B-55555"].cell(row=2, column=3)
+    assert (phone.value, phone.number_format) == ("0901000001", "@")
+    assert wb["Xe nháp"].cell(row=2, column=2).value == "Chi"
+
+
+def test_passenger_csv_streams_one_table_with_bus_column(trip, api_client):
+    resp = api_client.get(reverse("passenger-export"), {"trip": trip.id, "format": "csv"})
+    assert resp.status_code == 200
+    assert resp["Content-Type"].startswith("text/csv")
+
+    text = b"".join(resp.streaming_content).decode()
+    assert text.startswith(codecs.BOM_UTF8.decode())
+    rows = list(csv.reader(io.StringIO(text.lstrip(codecs.BOM_UTF8.decode()))))
+    assert rows[0] == ["Xe", "STT", "Họ và tên", "Số điện thoại", "Thông tin thêm", "Ghi chú"]
+    assert [r[:3] for r in rows[1:]] == [["51B-55555", "1", "An"], ["51B-55555", "2", "Bình"], ["Xe nháp", "1", "Chi"]]
+
+
+def test_csv_errors_still_render_as_json(api_client):
+    resp = api_client.get(reverse("passenger-export"), {"format": "csv"})
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == "trip query param required."
+
+
+@pytest.mark.parametrize("extra_buses", [0, 8])
+def test_passenger_export_query_count_is_constant(trip, api_client, extra_buses, django_assert_num_queries):
+    for i in range(extra_buses):
+        bus = Bus.objects.create(registration_number=f"51B-9{i:04d}", bus_code=f"N{i}", capacity=30, tenant=trip.tenant)
+        trip_bus = TripBus.objects.create(trip=trip, bus=bus, driver_name="", driver_tel="")
+        draft = ImportedBus.objects.create(trip=trip, sheet_name=f"Nháp {i}", sequence=10 + i)
+        for j, kwargs in enumerate([{"trip_bus": trip_bus}, {"imported_bus": draft}]):
+            passenger = Passenger.objects.create(tenant=trip.tenant, name=f"K{i}-{j}")
+            PassengerBusAssignment.objects.create(passenger=passenger, trip=trip, **kwargs)
+
+    # Trip lookup, trip buses and their assignments, unmapped imported buses and theirs, unassigned.
+    with django_assert_num_queries(6):
+        resp = api_client.get(reverse("passenger-export"), {"trip": trip.id})
+        wb = openpyxl.load_workbook(io.BytesIO(b"".join(resp.streaming_content)))
+    assert len(wb.sheetnames) == 2 + 2 * extra_buses
+    for i in range(extra_buses):
+        assert [row[1] for row in wb[f"51B-9{i:04d}"].iter_rows(min_row=2, values_only=True)] == [f"K{i}-0"]
+        assert [row[1] for row in wb[f"Nháp {i}"].iter_rows(min_row=2, values_only=True)] == [f"K{i}-1"]
+
+
+def test_unassigned_passengers_get_their_own_sheet(trip, api_client):
+    passenger = Passenger.objects.create(tenant=trip.tenant, name="Dũng")
+    PassengerBusAssignment.objects.create(passenger=passenger, trip=trip)
+
+    resp = api_client.get(reverse("passenger-export"), {"trip": trip.id})
+    wb = openpyxl.load_workbook(io.BytesIO(b"".join(resp.streaming_content)))
+    assert wb.sheetnames == ["51B-55555", "Xe nháp", "Chưa gán xe"]
+    assert wb["Chưa gán xe"].cell(row=2, column=2).value == "Dũng"
@@ -0,0 +1,64 @@
+import io
+
+import openpyxl
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import Tenant, User
+from common import exports
+from passengers.views import PassengerTemplateDownloadView
+from trips.models import Trip
+
+
+@pytest.fixture(autouse=True)
+def fresh_template_cache():
+    exports._cached_template.cache_clear()
+    yield
+    exports._cached_template.cache_clear()
+
+
+@pytest.fixture
+def api_client(db):
+    tenant = Tenant.objects.create(name="Template Tenant")
+    user = User.objects.create_user(username="tpl", email="tpl@example.com", password="x", tenant=tenant)
+    api = APIClient()
+    api.force_authenticate(user=user)
+    api.tenant = tenant
+    return api
+
+
+def test_template_is_built_once_and_revalidated_with_etag(api_client, monkeypatch):
+    builds = []
+    original = PassengerTemplateDownloadView.build_template
+    monkeypatch.setattr(
+        PassengerTemplateDownloadView, "build_template", staticmethod(lambda: builds.append(1) or original())
+    )
+    url = reverse("passenger-template")
+
+    first = api_client.get(url)
+    assert first.status_code == 200
+    assert openpyxl.load_workbook(io.BytesIO(first.content)).sheetnames == ["Xe 1", "Xe 2"]
+    etag = first["ETag"]
+
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    assert api_client.get(url).content == first.content
+    assert len(builds) == 1
+
+    # Another process rebuilds the bytes (new save timestamps) but agrees on the ETag.
+    exports._cached_template.cache_clear()
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+def test_round_template_is_keyed_by_trip_dates(api_client):
+    tenant = api_client.tenant
+    short = Trip.objects.create(name="A", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant)
+    same_dates = Trip.objects.create(name="B", start_date="2026-05-01", end_date="2026-05-02", tenant=tenant)
+    longer = Trip.objects.create(name="C", start_date="2026-05-01", end_date="2026-05-04", tenant=tenant)
+    url = reverse("round-template")
+
+    etags = {trip.name: api_client.get(url, {"trip": trip.id})["ETag"] for trip in (short, same_dates, longer)}
+    assert etags["A"] == etags["B"] != etags["C"]
+
+    wb = openpyxl.load_workbook(io.BytesIO(api_client.get(url, {"trip": longer.id}).content))
+    assert wb.sheetnames == ["01-05-2026", "02-05-2026", "03-05-2026", "04-05-2026"]
@@ -370,3 +370,9 @@ MQTT_URL = os.getenv("MQTT_URL", "")
 MQTT_USERNAME = os.getenv("MQTT_USERNAME", "")
 MQTT_PASSWORD = os.getenv("MQTT_PASSWORD", "")
 MQTT_TRANSACTIONS_TOPIC = os.getenv("MQTT_TRANSACTIONS_TOPIC", "transactions/#")
+MQTT_PUBLISH_QUEUE_SIZE = int(os.getenv("MQTT_PUBLISH_QUEUE_SIZE", "1000"))
+MQTT_KEEPALIVE = int(os.getenv("MQTT_KEEPALIVE", "60"))
+
+# Push delivery: "firebase", or "fake" to record pushes offline (tests, load tests)
+FCM_TRANSPORT = os.getenv("FCM_TRANSPORT", "firebase")
+FCM_FAKE_LATENCY = float(os.getenv("FCM_FAKE_LATENCY", "0"))
@@ -16,17 +16,18 @@ Including another URLconf
 """
 
 import os
-from django.http import FileResponse
+
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
+from django.http import FileResponse
 from django.urls import include, path
 from django.views.generic.base import RedirectView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
 from core.dashboard import DashboardOverviewAPIView
 from core.health import health_check
-from core.views import IndexPageAPIView
+from core.views import IndexPageAPIView, JobDetailView, JobDownloadView
 from tour_management.csrf import get_csrf_token
 
 api_patterns = [
@@ -36,6 +37,8 @@ api_patterns = [
         DashboardOverviewAPIView.as_view(),
         name="dashboard-overview",
     ),
+    path("jobs/<int:pk>/", JobDetailView.as_view(), name="job-detail"),
+    path("jobs/<int:pk>/download/", JobDownloadView.as_view(), name="job-download"),
 ]
 
 urlpatterns = [
@@ -0,0 +1,71 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_round(apps, schema_editor):
+    Transaction = apps.get_model("transactions", "Transaction")
+    RoundBus = apps.get_model("rounds", "RoundBus")
+    Transaction.objects.update(
+        round_id=Subquery(RoundBus.objects.filter(id=OuterRef("round_bus_id")).values("round_id")[:1])
+    )
+
+
+def close_duplicate_open_check_ins(apps, schema_editor):
+    """Older double-booked check-ins are checked out when the newer one started."""
+    Transaction = apps.get_model("transactions", "Transaction")
+    open_txns = Transaction.objects.filter(check_out__isnull=True).order_by(
+        "passenger_id", "round_id", "-check_in", "-id"
+    )
+    stale = []
+    latest = {}
+    for txn in open_txns.only("id", "passenger_id", "round_id", "check_in").iterator():
+        key = (txn.passenger_id, txn.round_id)
+        if key in latest:
+            txn.check_out = latest[key]
+            stale.append(txn)
+        else:
+            latest[key] = txn.check_in
+    Transaction.objects.bulk_update(stale, ["check_out"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("rounds", "0007_alter_round_options_alter_round_unique_together"),
+        ("transactions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="round",
+            field=models.ForeignKey(
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="rounds.round",
+            ),
+        ),
+        migrations.RunPython(backfill_round, migrations.RunPython.noop),
+        migrations.RunPython(close_duplicate_open_check_ins, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="transaction",
+            name="round",
+            field=models.ForeignKey(
+                editable=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="transactions",
+                to="rounds.round",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="transaction",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("check_out__isnull", True)),
+                fields=("passenger", "round"),
+                name="uniq_open_check_in_per_round",
+            ),
+        ),
+    ]
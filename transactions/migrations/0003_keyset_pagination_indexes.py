@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-17 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('passengers', '0011_alter_passengerbusassignment_trip_bus'),
+        ('rounds', '0007_alter_round_options_alter_round_unique_together'),
+        ('transactions', '0002_transaction_round_and_open_check_in_constraint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['-check_in', '-id'], name='transaction_check_in_keyset'),
+        ),
+    ]
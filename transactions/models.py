@@ -13,6 +13,13 @@ class Transaction(models.Model):
         on_delete=models.CASCADE,
         related_name="transactions",
     )
+    # Copy of round_bus.round so the database can enforce one open check-in per round.
+    round = models.ForeignKey(
+        "rounds.Round",
+        on_delete=models.CASCADE,
+        related_name="transactions",
+        editable=False,
+    )
     check_in = models.DateTimeField()
     check_out = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -22,7 +29,23 @@ class Transaction(models.Model):
         ordering = ["-check_in"]
         indexes = [
             models.Index(fields=["passenger", "round_bus"]),
+            models.Index(fields=["-check_in", "-id"], name="transaction_check_in_keyset"),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["passenger", "round"],
+                condition=models.Q(check_out__isnull=True),
+                name="uniq_open_check_in_per_round",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if self.round_bus_id and (update_fields is None or "round_bus" in update_fields):
+            self.round_id = self.round_bus.round_id
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "round"}
+        super().save(*args, **kwargs)
 
     def __str__(self) -> str:
         return f"{self.passenger} - {self.round_bus}"
@@ -0,0 +1,127 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from core import outbox
+from transactions.models import Transaction
+from transactions.serializers import TransactionSerializer
+
+
+def transaction_outbox_message(transaction_data, trip_id):
+    """Outbox message on the per-transaction topic used by publish_transaction_to_mqtt."""
+    return outbox.message(
+        f"transactions/{transaction_data['id']}",
+        transaction_data,
+        key=f"trip:{trip_id}",
+    )
+
+
+def bulk_check_out(transaction_ids, check_out) -> list[Transaction]:
+    """Check out every still-open transaction in `transaction_ids` with one UPDATE.
+
+    The open rows are locked first so a concurrent check-out cannot close them
+    twice; the updated rows are then re-read so callers get every field.
+    """
+    if not transaction_ids:
+        return []
+
+    with transaction.atomic():
+        ids = list(
+            Transaction.objects.select_for_update()
+            .filter(id__in=transaction_ids, check_out__isnull=True)
+            .values_list("id", flat=True)
+        )
+        if not ids:
+            return []
+        Transaction.objects.filter(id__in=ids).update(check_out=check_out, updated_at=timezone.now())
+        return list(Transaction.objects.filter(id__in=ids).order_by("id"))
+
+
+def open_check_in_conflict(passenger_id, round_bus_id, exclude_id=None) -> Transaction | None:
+    """The open check-in that keeps `passenger_id` off `round_bus_id`'s round."""
+    qs = Transaction.objects.filter(
+        passenger_id=passenger_id, round__round_buses__id=round_bus_id, check_out__isnull=True
+    )
+    if exclude_id is not None:
+        qs = qs.exclude(id=exclude_id)
+    return qs.select_related("round_bus__trip_bus__bus").first()
+
+
+def conflict_detail(txn: Transaction | None) -> str:
+    bus_label = txn.round_bus.trip_bus.bus.registration_number if txn else ""
+    return f"Hành khách đã điểm danh ở xe {bus_label or 'khác'}"
+
+
+def bulk_check_in(round_bus, passenger_ids, check_in):
+    """Check a roster of passengers in to `round_bus` with one lookup and one INSERT.
+
+    Returns ``(created, conflicts)`` where `conflicts` maps a passenger id to the
+    open transaction that already holds them somewhere in the same round. The
+    partial unique constraint is the real guard: if a concurrent scan slips in
+    between the lookup and the INSERT, the lookup is simply redone.
+    """
+    for attempt in range(3):
+        open_txns = (
+            Transaction.objects.filter(
+                passenger_id__in=passenger_ids,
+                round_id=round_bus.round_id,
+                check_out__isnull=True,
+            )
+            .select_related("round_bus__trip_bus__bus")
+        )
+        conflicts = {txn.passenger_id: txn for txn in open_txns}
+
+        try:
+            with transaction.atomic():
+                created = Transaction.objects.bulk_create([
+                    Transaction(
+                        passenger_id=passenger_id,
+                        round_bus=round_bus,
+                        round_id=round_bus.round_id,
+                        check_in=check_in,
+                    )
+                    for passenger_id in passenger_ids
+                    if passenger_id not in conflicts
+                ])
+        except IntegrityError:
+            if attempt == 2:
+                raise
+            continue
+        return created, conflicts
+
+
+def check_out_outbox_messages(updated: list[Transaction], check_out, per_row: bool = False):
+    """Build one aggregated event per round bus (or one per row in compatibility mode)."""
+    from rounds.models import RoundBus
+
+    trip_by_round_bus = dict(
+        RoundBus.objects.filter(id__in={t.round_bus_id for t in updated}).values_list("id", "round__trip_id")
+    )
+
+    if per_row:
+        return [
+            transaction_outbox_message(TransactionSerializer(t).data, trip_by_round_bus.get(t.round_bus_id))
+            for t in updated
+        ]
+
+    grouped = defaultdict(list)
+    for txn in updated:
+        grouped[txn.round_bus_id].append(txn)
+
+    messages = []
+    for round_bus_id, txns in grouped.items():
+        trip_id = trip_by_round_bus.get(round_bus_id)
+        messages.append(outbox.message(
+            f"transactions-batch/{round_bus_id}",
+            {
+                "event": "bulk_check_out",
+                "round_bus": round_bus_id,
+                "trip": trip_id,
+                "check_out": check_out.isoformat(),
+                "transactions": [t.id for t in txns],
+                "passengers": [t.passenger_id for t in txns],
+            },
+            key=f"trip:{trip_id}",
+        ))
+    return messages
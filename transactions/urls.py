@@ -1,6 +1,7 @@
 from django.urls import path
 
 from transactions.views import (
+    BulkCheckInView,
     BulkCheckOutView,
     SwitchBusView,
     TransactionDetailView,
@@ -9,6 +10,11 @@ from transactions.views import (
 )
 
 urlpatterns = [
+    path(
+        "transactions/bulk-check-in/",
+        BulkCheckInView.as_view(),
+        name="transaction-bulk-check-in",
+    ),
     path(
         "transactions/bulk-check-out/",
         BulkCheckOutView.as_view(),
@@ -1,15 +1,16 @@
-import json
 import logging
 
-import paho.mqtt.publish as publish
-from django.conf import settings
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from drf_spectacular.utils import extend_schema
-from rest_framework import generics, status
+from rest_framework import generics, serializers, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from common import mqtt
+from common.pagination import SelectablePagination
+from core import outbox
 from core.permissions import (
     IsAdminOrFleetLeadOrReadOnly,
     IsAdminOrTourManagerOrFleetLeadOrReadOnly,
@@ -18,50 +19,33 @@ from core.permissions import (
 from passengers.models import PassengerTransfer
 from transactions.models import Transaction
 from transactions.serializers import TransactionSerializer
+from transactions.services import (
+    bulk_check_in,
+    bulk_check_out,
+    check_out_outbox_messages,
+    conflict_detail,
+    open_check_in_conflict,
+    transaction_outbox_message,
+)
 
 logger = logging.getLogger(__name__)
 
 
 def publish_transaction_to_mqtt(transaction_data):
     """Publish transaction data to MQTT broker"""
-    try:
-        if not settings.MQTT_URL:
-            logger.warning("MQTT_URL not configured, skipping publish")
-            return
-
-        # Parse MQTT URL (format: wss://mqtt.toolhub.app:8084)
-        mqtt_url = settings.MQTT_URL.replace("wss://", "").replace("ws://", "")
-        if ":" in mqtt_url:
-            host, port = mqtt_url.rsplit(":", 1)
-            port = int(port)
-        else:
-            host = mqtt_url
-            port = 8883 if settings.MQTT_URL.startswith("wss") else 1883
-
-        topic = f"transactions/{transaction_data['id']}"
-
-        auth = None
-        if settings.MQTT_USERNAME and settings.MQTT_PASSWORD:
-            auth = {
-                "username": settings.MQTT_USERNAME,
-                "password": settings.MQTT_PASSWORD,
-            }
-
-        publish.single(
-            topic,
-            payload=json.dumps(transaction_data),
-            hostname=host,
-            port=port,
-            auth=auth,
-            tls={} if settings.MQTT_URL.startswith("wss") else None,
-            transport="websockets" if settings.MQTT_URL.startswith("ws") else "tcp",
-        )
-
+    topic = f"transactions/{transaction_data['id']}"
+    if mqtt.publish(topic, transaction_data):
         logger.info(
-            f"Published transaction {transaction_data['id']} to MQTT topic: {topic}"
+            f"Queued transaction {transaction_data['id']} for MQTT topic: {topic}"
         )
-    except Exception as e:
-        logger.error(f"Failed to publish to MQTT: {e}")
+
+
+def check_in_conflict_response(passenger_id, round_bus_id, exclude_id=None):
+    """400 for a write rejected by the one-open-check-in-per-round constraint, else None."""
+    existing_txn = open_check_in_conflict(passenger_id, round_bus_id, exclude_id=exclude_id)
+    if existing_txn is None:
+        return None
+    return Response({"detail": conflict_detail(existing_txn)}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class SwitchBusView(APIView):
@@ -105,55 +89,44 @@ class SwitchBusView(APIView):
                 if not target_rb:
                     return Response({"detail": "RoundBus not found"}, status=status.HTTP_404_NOT_FOUND)
 
-                # Race condition check: Ensure no other active check-in exists for this passenger in this round
-                existing_txn = Transaction.objects.filter(
-                    passenger_id=passenger_id,
-                    round_bus__round_id=target_rb.round_id,
-                    check_out__isnull=True
-                )
-                if from_txn_id:
-                    existing_txn = existing_txn.exclude(id=from_txn_id)
-
-                existing_txn = existing_txn.select_related('round_bus__trip_bus').first()
-
-                if existing_txn:
-                    bus_label = existing_txn.round_bus.trip_bus.license_plate or "khác"
-                    return Response(
-                        {"detail": f"Hành khách đã điểm danh ở xe {bus_label}"},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
                 # 1. Check out old transaction if provided
+                messages = []
                 if from_txn_id:
                     txn = Transaction.objects.filter(id=from_txn_id).first()
                     if txn and not txn.check_out:
                         txn.check_out = now
                         txn.save(update_fields=["check_out"])
-                        publish_transaction_to_mqtt(TransactionSerializer(txn).data)
-
-                # 2. Create new transaction
-                new_txn = Transaction.objects.create(
-                    passenger_id=passenger_id,
-                    round_bus_id=target_round_bus_id,
-                    check_in=now,
-                )
-                publish_transaction_to_mqtt(TransactionSerializer(new_txn).data)
+                        messages.append(transaction_outbox_message(TransactionSerializer(txn).data, trip_id))
+
+                # 2. Create new transaction; the open check-in constraint rejects double-booking
+                try:
+                    with transaction.atomic():
+                        new_txn = Transaction.objects.create(
+                            passenger_id=passenger_id,
+                            round_bus=target_rb,
+                            check_in=now,
+                        )
+                except IntegrityError:
+                    existing_txn = open_check_in_conflict(passenger_id, target_rb.id)
+                    transaction.set_rollback(True)
+                    return Response({"detail": conflict_detail(existing_txn)}, status=status.HTTP_400_BAD_REQUEST)
+                messages.append(transaction_outbox_message(TransactionSerializer(new_txn).data, trip_id))
 
                 # 3. Handle transfer
                 transfer_action = request.data.get("transfer_action")
                 existing_transfer_id = request.data.get("existing_transfer_id")
 
                 from passengers.serializers import PassengerTransferSerializer
-                from passengers.views import publish_transfer_to_mqtt
+                from passengers.views import transfer_outbox_message
 
                 if transfer_action == "delete" and existing_transfer_id:
                     PassengerTransfer.objects.filter(id=existing_transfer_id).delete()
-                    publish_transfer_to_mqtt({
+                    messages.append(transfer_outbox_message({
                         "id": existing_transfer_id,
                         "passenger": str(passenger_id),
                         "trip": str(trip_id),
                         "deleted": True
-                    })
+                    }))
                 elif transfer_action == "upsert":
                     transfer, created = PassengerTransfer.objects.update_or_create(
                         passenger_id=passenger_id,
@@ -163,7 +136,9 @@ class SwitchBusView(APIView):
                             "from_trip_bus_id": from_trip_bus_id or None,
                         }
                     )
-                    publish_transfer_to_mqtt(PassengerTransferSerializer(transfer).data)
+                    messages.append(transfer_outbox_message(PassengerTransferSerializer(transfer).data))
+
+                outbox.enqueue_many(messages)
 
             return Response({"success": True}, status=status.HTTP_200_OK)
 
@@ -199,19 +174,22 @@ class UndoTransferView(APIView):
             return Response({"detail": "Missing required fields"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
+            from passengers.views import transfer_outbox_message
+
             with transaction.atomic():
+                messages = []
+
                 # 1. Delete all transactions for this passenger in the round
-                txns = list(Transaction.objects.filter(
+                txn_ids = list(Transaction.objects.filter(
                     passenger_id=passenger_id,
                     round_bus__round_id=round_id
-                ))
-                for txn in txns:
-                    txn_id = txn.id
-                    txn.delete()
-                    publish_transaction_to_mqtt({
+                ).values_list("id", flat=True))
+                Transaction.objects.filter(id__in=txn_ids).delete()
+                for txn_id in txn_ids:
+                    messages.append(transaction_outbox_message({
                         "id": txn_id,
                         "deleted": True
-                    })
+                    }, trip_id))
 
                 # 2. Delete the passenger transfer for the trip
                 transfers = list(PassengerTransfer.objects.filter(
@@ -219,17 +197,15 @@ class UndoTransferView(APIView):
                     trip_id=trip_id
                 ))
                 for tr in transfers:
-                    tr_id = tr.id
-                    tr_passenger_id = str(tr.passenger_id)
-                    tr_trip_id = str(tr.trip_id)
-                    tr.delete()
-                    from passengers.views import publish_transfer_to_mqtt
-                    publish_transfer_to_mqtt({
-                        "id": tr_id,
-                        "passenger": tr_passenger_id,
-                        "trip": tr_trip_id,
+                    messages.append(transfer_outbox_message({
+                        "id": tr.id,
+                        "passenger": str(tr.passenger_id),
+                        "trip": str(tr.trip_id),
                         "deleted": True
-                    })
+                    }))
+                    tr.delete()
+
+                outbox.enqueue_many(messages)
 
             return Response({"success": True}, status=status.HTTP_200_OK)
 
@@ -238,17 +214,121 @@ class UndoTransferView(APIView):
             return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class BulkCheckInView(TenantScopedMixin, APIView):
+    permission_classes = [IsAdminOrFleetLeadOrReadOnly]
+
+    @extend_schema(
+        summary="Bulk check in passengers",
+        description=(
+            "Check a list of passengers in to one round bus. Passengers that already have an "
+            "open check-in anywhere in the same round are reported as conflicts instead of failing "
+            "the whole request."
+        ),
+        request={
+            "type": "object",
+            "properties": {
+                "round_bus": {"type": "integer"},
+                "passenger_ids": {"type": "array", "items": {"type": "integer"}},
+                "check_in": {"type": "string", "format": "date-time"},
+            },
+            "required": ["round_bus", "passenger_ids"],
+        },
+        responses={200: {"description": "Per-passenger results"}},
+        tags=["Transactions"],
+    )
+    def post(self, request, *args, **kwargs):
+        round_bus_id = request.data.get("round_bus")
+        passenger_ids = request.data.get("passenger_ids") or []
+        check_in = request.data.get("check_in")
+
+        if not round_bus_id or not passenger_ids:
+            return Response({"detail": "Missing required fields"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # A bare string would otherwise be iterated digit by digit.
+            passenger_ids = serializers.ListField(child=serializers.IntegerField()).run_validation(passenger_ids)
+        except serializers.ValidationError:
+            return Response({"detail": "Invalid passenger_ids"}, status=status.HTTP_400_BAD_REQUEST)
+        # dict.fromkeys drops repeated scans while keeping the roster order.
+        passenger_ids = list(dict.fromkeys(passenger_ids))
+
+        check_in_at = timezone.now()
+        if check_in:
+            check_in_at = parse_datetime(str(check_in))
+            if check_in_at is None:
+                return Response({"detail": "Invalid check_in datetime"}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(check_in_at):
+                check_in_at = timezone.make_aware(check_in_at)
+
+        from passengers.models import Passenger
+        from rounds.models import RoundBus
+
+        round_bus = self.apply_tenant_filter(
+            RoundBus.objects.select_related("round"), "round__trip__tenant_id"
+        ).filter(id=round_bus_id).first()
+        if not round_bus:
+            return Response({"detail": "RoundBus not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        known_ids = set(
+            self.apply_tenant_filter(Passenger.objects.filter(id__in=passenger_ids), "tenant_id")
+            .values_list("id", flat=True)
+        )
+
+        with transaction.atomic():
+            created, conflicts = bulk_check_in(
+                round_bus, [pk for pk in passenger_ids if pk in known_ids], check_in_at
+            )
+            created_data = TransactionSerializer(created, many=True).data
+            outbox.enqueue_many([
+                transaction_outbox_message(data, round_bus.round.trip_id) for data in created_data
+            ])
+
+        created_by_passenger = {data["passenger"]: data for data in created_data}
+        results = []
+        for passenger_id in passenger_ids:
+            if passenger_id in created_by_passenger:
+                results.append({
+                    "passenger": passenger_id,
+                    "status": "created",
+                    "transaction": created_by_passenger[passenger_id],
+                })
+            elif passenger_id in conflicts:
+                existing = conflicts[passenger_id]
+                results.append({
+                    "passenger": passenger_id,
+                    "status": "conflict",
+                    "transaction_id": existing.id,
+                    "detail": conflict_detail(existing),
+                })
+            else:
+                results.append({
+                    "passenger": passenger_id,
+                    "status": "not_found",
+                    "detail": "Không tìm thấy hành khách",
+                })
+
+        return Response(
+            {"created": len(created_data), "conflicts": len(conflicts), "results": results},
+            status=status.HTTP_200_OK,
+        )
+
+
 class BulkCheckOutView(APIView):
     permission_classes = [IsAdminOrTourManagerOrFleetLeadOrReadOnly]
 
     @extend_schema(
         summary="Bulk check out transactions",
-        description="Update multiple transactions with a check_out time simultaneously.",
+        description=(
+            "Check out every open transaction in one UPDATE and emit one aggregated "
+            "'transactions-batch/<round_bus>' event per round bus. Pass per_row_events=true "
+            "to also get the legacy per-transaction 'transactions/<id>' events instead."
+        ),
         request={
             "type": "object",
             "properties": {
                 "transaction_ids": {"type": "array", "items": {"type": "integer"}},
                 "check_out": {"type": "string", "format": "date-time"},
+                "per_row_events": {"type": "boolean"},
             },
             "required": ["transaction_ids", "check_out"],
         },
@@ -258,29 +338,38 @@ class BulkCheckOutView(APIView):
     def post(self, request, *args, **kwargs):
         transaction_ids = request.data.get("transaction_ids", [])
         check_out = request.data.get("check_out")
+        per_row = str(request.data.get("per_row_events", "")).lower() in ("1", "true")
 
         if not transaction_ids or not check_out:
             return Response({"detail": "Missing required fields"}, status=status.HTTP_400_BAD_REQUEST)
 
+        check_out_at = parse_datetime(str(check_out))
+        if check_out_at is None:
+            return Response({"detail": "Invalid check_out datetime"}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(check_out_at):
+            check_out_at = timezone.make_aware(check_out_at)
+
         try:
+            ids = [int(pk) for pk in transaction_ids]
             with transaction.atomic():
-                txns = list(Transaction.objects.filter(id__in=transaction_ids))
-                for txn in txns:
-                    if not txn.check_out:
-                        txn.check_out = check_out
-                        txn.save(update_fields=["check_out"])
-                        publish_transaction_to_mqtt(TransactionSerializer(txn).data)
+                updated = bulk_check_out(ids, check_out_at)
+                outbox.enqueue_many(check_out_outbox_messages(updated, check_out_at, per_row=per_row))
 
-            return Response({"success": True, "updated": len(txns)}, status=status.HTTP_200_OK)
+            return Response({"success": True, "updated": len(updated)}, status=status.HTTP_200_OK)
 
         except Exception as e:
             logger.error(f"Failed to bulk check out: {e}")
             return Response({"detail": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class TransactionPagination(SelectablePagination):
+    cursor_ordering = ("-check_in", "-id")
+
+
 class TransactionListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
     serializer_class = TransactionSerializer
     permission_classes = [IsAdminOrFleetLeadOrReadOnly]
+    pagination_class = TransactionPagination
 
     def get_queryset(self):
         qs = Transaction.objects.select_related(
@@ -290,7 +379,10 @@ class TransactionListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
 
     @extend_schema(
         summary="List transactions",
-        description="Returns transactions, scoped by tenant via passenger's trip.",
+        description=(
+            "Returns transactions, scoped by tenant via passenger's trip. "
+            "Pass pagination=cursor for keyset paging on (check_in, id); add with_count=1 for the total."
+        ),
         responses={200: TransactionSerializer},
         tags=["Transactions"],
     )
@@ -308,31 +400,14 @@ class TransactionListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
         tags=["Transactions"],
     )
     def post(self, request, *args, **kwargs):
-        passenger_id = request.data.get("passenger")
-        round_bus_id = request.data.get("round_bus")
-        check_out = request.data.get("check_out")
-
-        if passenger_id and round_bus_id and not check_out:
-            # We are creating a new check-in transaction. Check for race conditions.
-            from rounds.models import RoundBus
+        try:
             with transaction.atomic():
-                rb = RoundBus.objects.filter(id=round_bus_id).select_related('round').first()
-                if rb:
-                    existing_txn = Transaction.objects.filter(
-                        passenger_id=passenger_id,
-                        round_bus__round_id=rb.round_id,
-                        check_out__isnull=True
-                    ).select_related('round_bus__trip_bus').first()
-
-                    if existing_txn:
-                        bus_label = existing_txn.round_bus.trip_bus.license_plate or "khác"
-                        return Response(
-                            {"detail": f"Hành khách đã điểm danh ở xe {bus_label}"},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
                 response = super().post(request, *args, **kwargs)
-        else:
-            response = super().post(request, *args, **kwargs)
+        except IntegrityError:
+            conflict = check_in_conflict_response(request.data.get("passenger"), request.data.get("round_bus"))
+            if conflict is None:
+                raise
+            return conflict
 
         # Publish to MQTT after successful creation
         if response.status_code == 201:
@@ -371,7 +446,7 @@ class TransactionDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPI
         tags=["Transactions"],
     )
     def put(self, request, *args, **kwargs):
-        response = super().put(request, *args, **kwargs)
+        response = self.update_or_conflict(super().put, request, *args, **kwargs)
 
         # Publish to MQTT after successful update
         if response.status_code == 200:
@@ -390,7 +465,7 @@ class TransactionDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPI
         tags=["Transactions"],
     )
     def patch(self, request, *args, **kwargs):
-        response = super().patch(request, *args, **kwargs)
+        response = self.update_or_conflict(super().patch, request, *args, **kwargs)
 
         # Publish to MQTT after successful update
         if response.status_code == 200:
@@ -398,6 +473,21 @@ class TransactionDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPI
 
         return response
 
+    def update_or_conflict(self, update, request, *args, **kwargs):
+        try:
+            with transaction.atomic():
+                return update(request, *args, **kwargs)
+        except IntegrityError:
+            instance = self.get_object()
+            conflict = check_in_conflict_response(
+                request.data.get("passenger", instance.passenger_id),
+                request.data.get("round_bus", instance.round_bus_id),
+                exclude_id=instance.id,
+            )
+            if conflict is None:
+                raise
+            return conflict
+
     @extend_schema(
         summary="Delete transaction",
         description="Delete a transaction by ID.",
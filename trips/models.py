@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.db import models
 
+from common.tracking import FieldTrackerMixin
+
 
 class Trip(models.Model):
     class Status(models.TextChoices):
@@ -33,7 +35,9 @@ class Trip(models.Model):
         return self.name
 
 
-class TripBus(models.Model):
+class TripBus(FieldTrackerMixin, models.Model):
+    tracked_fields = ("manager_id", "driver_id")
+
     id = models.BigAutoField(primary_key=True)
     manager = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -3,7 +3,9 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from accounts.models import Tenant
+from common.signals import batched_signals
 from fleet.models import Bus
+from rounds.services import ensure_round_bus_matrix
 from trips.models import Trip, TripBus
 
 
@@ -96,6 +98,11 @@ class TripSerializer(serializers.ModelSerializer):
             child.fields["driver"].queryset = User.objects.select_related("role")
 
     def _sync_trip_buses(self, trip: Trip, assignments: list[dict]) -> None:
+        # Coalesce assignment notifications and RoundBus creation for the whole edit.
+        with batched_signals():
+            self._apply_trip_bus_assignments(trip, assignments)
+
+    def _apply_trip_bus_assignments(self, trip: Trip, assignments: list[dict]) -> None:
         # Remove buses no longer attached
         current_bus_ids = set(
             TripBus.objects.filter(trip=trip).values_list("bus_id", flat=True)
@@ -119,9 +126,10 @@ class TripSerializer(serializers.ModelSerializer):
             trip_bus.save(update_fields=["manager", "driver", "driver_name"])
 
         to_add = desired_bus_ids - current_bus_ids
+        added_trip_bus_ids = []
         for bus_id in to_add:
             assignment = assignment_map[bus_id]
-            TripBus.objects.get_or_create(
+            trip_bus, _ = TripBus.objects.get_or_create(
                 trip=trip,
                 bus_id=bus_id,
                 defaults={
@@ -134,6 +142,10 @@ class TripSerializer(serializers.ModelSerializer):
                     "description": "",
                 },
             )
+            added_trip_bus_ids.append(trip_bus.pk)
+        if added_trip_bus_ids:
+            # Only the new buses: rounds that dropped an existing bus keep it dropped.
+            ensure_round_bus_matrix(trip, trip_bus_ids=added_trip_bus_ids)
 
     def create(self, validated_data):
         bus_assignments = validated_data.pop("bus_assignments", [])
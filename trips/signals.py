@@ -5,7 +5,13 @@ whenever a TripBus is created.
 from django.db.models.signals import post_save, pre_save
 from django.dispatch import receiver
 
-from notifications.models import Notification
+from common.cache import register_cache_invalidation
+from common.signals import defer, track_previous_values
+from notifications.services import queue_notification
+
+register_cache_invalidation("trips.Trip", ("trips", "rounds", "passengers"), "tenant_id")
+register_cache_invalidation("trips.TripBus", ("trips", "rounds"), "trip__tenant_id")
+register_cache_invalidation("fleet.Bus", ("trips", "rounds"), "tenant_id")
 
 
 @receiver(post_save, sender="trips.TripBus")
@@ -14,40 +20,27 @@ def create_round_buses_for_trip_bus(sender, instance, created, **kwargs):
     if not created:
         return
 
-    from rounds.models import Round, RoundBus
+    from rounds.services import ensure_round_bus_matrix
 
-    rounds = Round.objects.filter(trip=instance.trip)
-    for rnd in rounds:
-        RoundBus.objects.get_or_create(
-            trip_bus=instance,
-            round=rnd,
-        )
+    trip = instance.trip
+    # Inside batched_signals() all new buses of the trip are synced in one go on exit.
+    defer(
+        ("round-bus-matrix", "trip_bus", trip.pk),
+        instance.pk,
+        lambda trip_bus_ids: ensure_round_bus_matrix(trip, trip_bus_ids=trip_bus_ids),
+    )
 
 
 @receiver(pre_save, sender="trips.TripBus")
 def trip_bus_pre_save(sender, instance, **kwargs):
-    if instance.pk:
-        from .models import TripBus
-        try:
-            old_instance = TripBus.objects.get(pk=instance.pk)
-            instance._old_manager_id = old_instance.manager_id
-            instance._old_driver_id = old_instance.driver_id
-        except TripBus.DoesNotExist:
-            instance._old_manager_id = None
-            instance._old_driver_id = None
-    else:
-        instance._old_manager_id = None
-        instance._old_driver_id = None
+    track_previous_values(instance, "trip_id", ("manager_id", "driver_id"))
 
 
 @receiver(post_save, sender="trips.TripBus")
 def trip_bus_assignment_notification(sender, instance, created, **kwargs):
-    old_manager_id = getattr(instance, '_old_manager_id', None)
-    old_driver_id = getattr(instance, '_old_driver_id', None)
-
-    if created or old_manager_id != instance.manager_id:
+    if created or instance.has_changed("manager_id"):
         if instance.manager:
-            Notification.objects.create(
+            queue_notification(
                 user=instance.manager,
                 title="Phân công trưởng xe",
                 message=f"Bạn đã được phân công làm trưởng xe {instance.bus.registration_number} cho chuyến {instance.trip.name}",
@@ -56,9 +49,9 @@ def trip_bus_assignment_notification(sender, instance, created, **kwargs):
                 reference_id=str(instance.trip.id)
             )
 
-    if created or old_driver_id != instance.driver_id:
+    if created or instance.has_changed("driver_id"):
         if instance.driver:
-            Notification.objects.create(
+            queue_notification(
                 user=instance.driver,
                 title="Phân công lái xe",
                 message=f"Bạn đã được phân công lái xe {instance.bus.registration_number} cho chuyến {instance.trip.name}",
@@ -2,14 +2,26 @@ from drf_spectacular.utils import extend_schema
 from rest_framework import generics, permissions
 from rest_framework.views import APIView
 
+from common.conditional import ConditionalGetMixin
+from common.exports import (
+    Sheet,
+    SpreadsheetExportMixin,
+    TemplateDownloadMixin,
+    workbook_bytes,
+)
+from common.viewsets import CachedListMixin, CachedRetrieveMixin
+from core.jobs import BackgroundJobMixin
 from core.permissions import IsAdminOrTourManagerOrReadOnly, TenantScopedMixin
 from trips.models import Trip, TripBus
 from trips.serializers import TripBusSerializer, TripSerializer
 
 
-class TripListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
+class TripListCreateView(ConditionalGetMixin, CachedListMixin, TenantScopedMixin, generics.ListCreateAPIView):
     serializer_class = TripSerializer
     permission_classes = [IsAdminOrTourManagerOrReadOnly]
+    conditional_related = ("trip_buses", "trip_buses__bus")
+    cache_list = True
+    cache_prefix = "trips"
 
     def get_queryset(self):
         qs = Trip.objects.select_related("tenant").prefetch_related(
@@ -40,10 +52,12 @@ class TripListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class TripDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
+class TripDetailView(CachedRetrieveMixin, TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = TripSerializer
     from core.permissions import IsAdminOrTourManagerOrFleetLeadOrReadOnly
     permission_classes = [IsAdminOrTourManagerOrFleetLeadOrReadOnly]
+    cache_retrieve = True
+    cache_prefix = "trips"
 
     def get_queryset(self):
         qs = Trip.objects.select_related("tenant").prefetch_related(
@@ -119,9 +133,10 @@ class TripDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
         return super().delete(request, *args, **kwargs)
 
 
-class TripBusListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
+class TripBusListCreateView(ConditionalGetMixin, TenantScopedMixin, generics.ListCreateAPIView):
     serializer_class = TripBusSerializer
     permission_classes = [IsAdminOrTourManagerOrReadOnly]
+    conditional_related = ("bus",)
 
     def get_queryset(self):
         qs = TripBus.objects.select_related("trip", "bus", "manager", "driver")
@@ -171,9 +186,10 @@ class TripBusListCreateView(TenantScopedMixin, generics.ListCreateAPIView):
         return super().post(request, *args, **kwargs)
 
 
-class TripBusDetailView(TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
+class TripBusDetailView(ConditionalGetMixin, TenantScopedMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = TripBusSerializer
     permission_classes = [IsAdminOrTourManagerOrReadOnly]
+    conditional_related = ("bus",)
 
     def get_queryset(self):
         qs = TripBus.objects.select_related("trip", "bus", "manager", "driver")
@@ -268,7 +284,7 @@ class TripBusBulkDeleteView(TripBusListCreateView):
 TRIPBUS_COLUMNS = ["STT", "Biển số", "Mã xe", "Sức chứa", "Mô tả"]
 
 
-class TripBusImportView(TenantScopedMixin, APIView):
+class TripBusImportView(BackgroundJobMixin, TenantScopedMixin, APIView):
     """POST /api/v1/trip-buses/import/?trip=<id>"""
     permission_classes = [permissions.IsAuthenticated]
     from rest_framework.parsers import MultiPartParser
@@ -280,6 +296,10 @@ class TripBusImportView(TenantScopedMixin, APIView):
         tags=["TripBuses"],
     )
     def post(self, request, *args, **kwargs):
+        queued = self.defer_to_job(request)
+        if queued is not None:
+            return queued
+
         trip_id = request.query_params.get("trip")
         if not trip_id:
             from rest_framework import status
@@ -317,7 +337,9 @@ class TripBusImportView(TenantScopedMixin, APIView):
             from rest_framework.response import Response
             return Response({"detail": "Trip not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        with transaction.atomic():
+        from common.signals import batched_signals
+
+        with transaction.atomic(), batched_signals():
             for row in data_rows:
                 if not row or len(row) < 4:
                     continue
@@ -359,88 +381,57 @@ class TripBusImportView(TenantScopedMixin, APIView):
         return Response({"detail": f"Imported {imported_count} buses successfully."}, status=status.HTTP_201_CREATED)
 
 
-class TripBusExportView(TenantScopedMixin, APIView):
+class TripBusExportView(BackgroundJobMixin, SpreadsheetExportMixin, TenantScopedMixin, APIView):
     """GET /api/v1/trip-buses/export/?trip=<id>"""
     permission_classes = [permissions.IsAuthenticated]
 
     @extend_schema(
         summary="Export trip buses to Excel",
-        description="Download trip buses as a .xlsx file. Requires 'trip' query param.",
+        description="Download trip buses as a .xlsx file (or CSV with ?format=csv). Requires 'trip' query param.",
         tags=["TripBuses"],
     )
     def get(self, request, *args, **kwargs):
+        queued = self.defer_to_job(request)
+        if queued is not None:
+            return queued
+
         trip_id = request.query_params.get("trip")
         if not trip_id:
             from rest_framework import status
             from rest_framework.response import Response
             return Response({"detail": "trip parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        import io
-
-        import openpyxl
-        from django.http import HttpResponse
-
         from trips.models import TripBus
 
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "TripBuses"
-        ws.append(TRIPBUS_COLUMNS)
+        def rows():
+            qs = TripBus.objects.filter(trip_id=trip_id).select_related("bus").order_by("bus__registration_number")
+            for idx, trip_bus in enumerate(qs.iterator(), start=1):
+                bus = trip_bus.bus
+                description = trip_bus.description or bus.description
+                yield [idx, bus.registration_number, bus.bus_code, bus.capacity, description]
 
-        qs = TripBus.objects.filter(trip_id=trip_id).select_related("bus").order_by("bus__registration_number")
-        # Apply tenant filter implicitly via trip?
-        # Actually TripBus doesn't have tenant_id directly, but Trip does.
-        # It's fine to just filter by trip_id, assuming user has access to this trip.
-
-        for idx, trip_bus in enumerate(qs, start=1):
-            bus = trip_bus.bus
-            ws.append([
-                idx,
-                bus.registration_number,
-                bus.bus_code,
-                bus.capacity,
-                trip_bus.description or bus.description
-            ])
-
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-
-        response = HttpResponse(
-            buf.read(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        response["Content-Disposition"] = 'attachment; filename="trip_buses.xlsx"'
-        return response
+        return self.export_response(request, "trip_buses", [Sheet("TripBuses", TRIPBUS_COLUMNS, rows())])
 
 
-class TripBusTemplateDownloadView(APIView):
+class TripBusTemplateDownloadView(TemplateDownloadMixin, APIView):
     """GET /api/v1/trip-buses/import/template/"""
     permission_classes = [permissions.IsAuthenticated]
+    template_filename = "trip_bus_import_template.xlsx"
 
-    @extend_schema(
-        summary="Download trip bus import template",
-        description="Download a blank .xlsx template for importing trip buses.",
-        tags=["TripBuses"],
-    )
-    def get(self, request, *args, **kwargs):
-        import io
-
+    @staticmethod
+    def build_template() -> bytes:
         import openpyxl
-        from django.http import HttpResponse
 
         wb = openpyxl.Workbook()
         ws = wb.active
         ws.title = "Sheet1"
         ws.append(TRIPBUS_COLUMNS)
+        return workbook_bytes(wb)
 
-        buf = io.BytesIO()
-        wb.save(buf)
-        buf.seek(0)
-
-        response = HttpResponse(
-            buf.read(),
-            content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
-        response["Content-Disposition"] = 'attachment; filename="trip_bus_import_template.xlsx"'
-        return response
+    @extend_schema(
+        summary="Download trip bus import template",
+        description="Download a blank .xlsx template for importing trip buses.",
+        tags=["TripBuses"],
+    )
+    def get(self, request, *args, **kwargs):
+        return self.template_response(request)